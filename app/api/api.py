@@ -1,11 +1,24 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, users, rides, bookings, vehicles, messages
+from app.api.endpoints import (
+    auth,
+    users,
+    rides,
+    bookings,
+    vehicles,
+    messages,
+    metrics,
+    events,
+    places,
+)
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(rides.router, tags=["rides"])
 api_router.include_router(bookings.router, tags=["bookings"])
+api_router.include_router(places.router, tags=["places"])
 api_router.include_router(vehicles.router, tags=["vehicles"])
 api_router.include_router(messages.router, tags=["messages"])
+api_router.include_router(events.router, tags=["events"])
+api_router.include_router(metrics.router, tags=["metrics"])
@@ -1,21 +1,51 @@
 import datetime
 import time
-from collections.abc import AsyncGenerator
+import zoneinfo
+from collections.abc import AsyncGenerator, Iterable, Sequence
+from typing import Literal
 
 import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import (
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketException,
+    status,
+)
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select, and_, func, or_
+from sqlalchemy import select, and_, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import attributes, joinedload, make_transient_to_detached
 
 from app.core import config, security
+from app.core.cache import ride_search_cache, user_cache
+from app.core.etag import etag_matches, make_etag
+from app.core.events import Event, event_hub
+from app.core.pagination import decode_cursor
+from app.core.places import normalize_place, place_index
+from app.core.revocation import revoked_tokens
 from app.core.session import async_session
-from app.models import User, Vehicle, Ride, Booking
-from app.schemas.requests import RideCreateRequest
+from app.core.single_flight import single_flight
+from app.models import User, Vehicle, Ride, RideStop, Booking
+from app.schemas.requests import (
+    MAX_BULK_RIDES,
+    BaseRideRequest,
+    ItinerarySearchRequest,
+    MessageCreateRequest,
+    NearbyRideSearchRequest,
+    RideBookingsBatchRequest,
+    RideBulkCreateRequest,
+    RideCreateRequest,
+    RideScheduleCreateRequest,
+    RideSearchRequest,
+)
 from app.schemas.responses import UserPublicResponse
 
 reusable_oauth2 = OAuth2PasswordBearer(tokenUrl="auth/access-token")
+optional_oauth2 = OAuth2PasswordBearer(tokenUrl="auth/access-token", auto_error=False)
+USER_COLUMNS = User.__mapper__.column_attrs
 
 
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
@@ -23,9 +53,35 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
-async def get_current_user(
+async def use_replica(session: AsyncSession = Depends(get_session)) -> None:
+    """Lets a read-only endpoint read from a replica, see `RoutingSession`"""
+    session.info["use_replica"] = True
+
+
+async def identify_reader(
+    session: AsyncSession = Depends(get_session),
+    token: str | None = Depends(optional_oauth2),
+) -> None:
+    """Routes reads of a recent writer to the primary on public endpoints
+
+    The token only picks the database, it grants nothing, so unlike
+    `get_current_token_payload` a bad one is ignored and revocations are not
+    checked.
+    """
+    if token is None:
+        return
+    try:
+        payload = jwt.decode(
+            token, config.settings.SECRET_KEY, algorithms=[security.JWT_ALGORITHM]
+        )
+    except jwt.InvalidTokenError:
+        return
+    session.info["user_id"] = security.JWTTokenPayload(**payload).sub
+
+
+async def get_current_token_payload(
     session: AsyncSession = Depends(get_session), token: str = Depends(reusable_oauth2)
-) -> User:
+) -> security.JWTTokenPayload:
     try:
         payload = jwt.decode(
             token, config.settings.SECRET_KEY, algorithms=[security.JWT_ALGORITHM]
@@ -50,38 +106,230 @@ async def get_current_user(
             detail="Could not validate credentials, token expired or not yet valid",
         )
 
+    await revoked_tokens.sync(session)
+    if await revoked_tokens.is_revoked(session, token_data.jti):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials, token revoked",
+        )
+    return token_data
+
+
+async def get_current_user(
+    session: AsyncSession = Depends(get_session),
+    token_data: security.JWTTokenPayload = Depends(get_current_token_payload),
+) -> User:
+    # routes reads of recent writers to the primary, see `RoutingSession`
+    session.info["user_id"] = token_data.sub
+    cached_user = user_cache.get(token_data.sub)
+    if cached_user is not None:
+        # attach a copy to the request session without loading it again
+        user = User(**cached_user)
+        make_transient_to_detached(user)
+        return await session.merge(user, load=False)
+
     result = await session.execute(select(User).where(User.id == token_data.sub))
     user = result.scalars().first()
 
     if not user:
         raise HTTPException(status_code=404, detail="User not found.")
+    user_cache.set(
+        user.id, {column.key: getattr(user, column.key) for column in USER_COLUMNS}
+    )
     return user
 
 
+async def invalidate_cached_user(user_id: int) -> None:
+    """Drops the user from `user_cache` of every worker, call after commit"""
+    user_cache.invalidate(user_id)
+    await event_hub.publish(Event("user_cache.invalidated", {"id": user_id}), [])
+
+
+event_hub.on("user_cache.invalidated", lambda data: user_cache.invalidate(data["id"]))
+
+
+async def invalidate_ride_searches(routes: Iterable[tuple[int, int]]) -> None:
+    """Drops cached searches of the routes in every worker, call after commit
+
+    Routes are (departure place id, arrival place id) tags of
+    `ride_search_cache`.
+    """
+    routes = {tuple(route) for route in routes}
+    if not routes:
+        return
+    for route in routes:
+        ride_search_cache.invalidate_tag(route)
+    await event_hub.publish(
+        Event("ride_search_cache.invalidated", {"routes": sorted(routes)}), []
+    )
+
+
+def _invalidate_routes(data: dict) -> None:
+    for route in data["routes"]:
+        ride_search_cache.invalidate_tag(tuple(route))
+
+
+event_hub.on("ride_search_cache.invalidated", _invalidate_routes)
+
+
+async def get_websocket_user(
+    websocket: WebSocket,
+    token: str | None = None,
+    session: AsyncSession = Depends(get_session),
+) -> User:
+    """`get_current_user` of WebSocket endpoints
+
+    Browsers cannot set headers of WebSocket handshake, so the access token
+    may be passed in `token` query parameter as well as in Authorization.
+    """
+    if token is None:
+        scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer":
+            token = None
+    if not token:
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated"
+        )
+    try:
+        token_data = await get_current_token_payload(session, token)
+        return await get_current_user(session, token_data)
+    except HTTPException as exc:
+        raise WebSocketException(
+            code=status.WS_1008_POLICY_VIOLATION, reason=exc.detail
+        )
+
+
+async def _check_user_vehicles(
+    session: AsyncSession, user: User, vehicle_ids: Iterable[int | None]
+) -> None:
+    """Checks vehicles of rides belong to the user, by one query"""
+    vehicle_ids = {vehicle_id for vehicle_id in vehicle_ids if vehicle_id is not None}
+    if not vehicle_ids:
+        return
+    query = select(Vehicle.id).where(
+        and_(
+            Vehicle.id.in_(vehicle_ids),
+            Vehicle.owner_id == user.id,
+        )
+    )
+    missing = vehicle_ids - set((await session.scalars(query)).all())
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"User vehicle with id <{min(missing)}> not found",
+        )
+
+
+def _check_coordinates(ride_create: BaseRideRequest) -> None:
+    for point in ["departure", "arrival"]:
+        lat = getattr(ride_create, f"{point}_lat")
+        lon = getattr(ride_create, f"{point}_lon")
+        if (lat is None) != (lon is None):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Both {point} latitude and longitude are required",
+            )
+
+
+def _check_ride_stops(ride_create: RideCreateRequest) -> None:
+    """Checks stops depart in order of the route, before the ride arrival"""
+    if not ride_create.stops:
+        return
+    departures = [
+        ride_create.departure_at,
+        *(stop.departure_at for stop in ride_create.stops),
+    ]
+    for position, (previous, current) in enumerate(
+        zip(departures, departures[1:]), start=1
+    ):
+        if current <= previous:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Stop <{position}> departs before the previous one",
+            )
+    if departures[-1] >= ride_create.arrival_at:
+        raise HTTPException(
+            status_code=400, detail="Ride arrives before the last stop departure"
+        )
+
+
 async def check_valid_vehicle(
     ride_create: RideCreateRequest,
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ) -> RideCreateRequest:
-    if ride_create.vehicle_id is not None:
-        query = select(Vehicle).where(
-            and_(
-                Vehicle.id == ride_create.vehicle_id,
-                Vehicle.owner_id == current_user.id,
-            )
+    _check_coordinates(ride_create)
+    _check_ride_stops(ride_create)
+    await _check_user_vehicles(session, current_user, [ride_create.vehicle_id])
+    return ride_create
+
+
+async def check_valid_bulk_rides(
+    rides_create: RideBulkCreateRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> list[RideCreateRequest]:
+    for ride in rides_create.rides:
+        _check_coordinates(ride)
+        _check_ride_stops(ride)
+    await _check_user_vehicles(
+        session, current_user, [ride.vehicle_id for ride in rides_create.rides]
+    )
+    return rides_create.rides
+
+
+async def get_scheduled_rides(
+    schedule: RideScheduleCreateRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> list[RideCreateRequest]:
+    """Rides of the schedule days, past departures are skipped"""
+    if schedule.end_date < schedule.start_date:
+        raise HTTPException(
+            status_code=400, detail="Schedule end date is before start date"
         )
-        vehicle = await session.scalar(query)
-        if vehicle is None:
-            raise HTTPException(
-                status_code=400,
-                detail=f"User vehicle with id <{ride_create.vehicle_id}> not found",
+    _check_coordinates(schedule)
+    try:
+        time_zone = zoneinfo.ZoneInfo(schedule.time_zone)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(
+            status_code=400, detail=f"Unknown time zone <{schedule.time_zone}>"
+        )
+
+    now = datetime.datetime.now(tz=time_zone)
+    day = max(schedule.start_date, now.date())
+    weekdays = set(schedule.weekdays)
+    duration = datetime.timedelta(minutes=schedule.duration_minutes)
+    # fields of the schedule common to all its rides
+    ride_fields = schedule.model_dump(include=set(BaseRideRequest.model_fields))
+    rides = []
+    while day <= schedule.end_date:
+        departure_at = datetime.datetime.combine(
+            day, schedule.departure_time, tzinfo=time_zone
+        )
+        if day.isoweekday() in weekdays and departure_at > now:
+            if len(rides) == MAX_BULK_RIDES:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Schedule has more than {MAX_BULK_RIDES} rides",
+                )
+            rides.append(
+                RideCreateRequest(
+                    **ride_fields,
+                    departure_at=departure_at,
+                    arrival_at=departure_at + duration,
+                )
             )
+        day += datetime.timedelta(days=1)
+    if not rides:
+        raise HTTPException(status_code=400, detail="Schedule has no rides")
 
-    return ride_create
+    await _check_user_vehicles(session, current_user, [schedule.vehicle_id])
+    return rides
 
 
-async def get_valid_ride(ride_id: int, session: AsyncSession = Depends(get_session)):
-    query = select(Ride).where(Ride.id == ride_id)
+async def _get_valid_ride(session: AsyncSession, ride_id: int, *options) -> Ride:
+    query = select(Ride).options(*options).where(Ride.id == ride_id)
     ride = await session.scalar(query)
     if ride is None:
         raise HTTPException(
@@ -90,6 +338,53 @@ async def get_valid_ride(ride_id: int, session: AsyncSession = Depends(get_sessi
     return ride
 
 
+async def get_valid_ride(ride_id: int, session: AsyncSession = Depends(get_session)):
+    return await _get_valid_ride(session, ride_id)
+
+
+async def _load_ride_detailed(session: AsyncSession, ride_id: int) -> Ride:
+    ride = await _get_valid_ride(
+        session, ride_id, joinedload(Ride.driver), joinedload(Ride.vehicle)
+    )
+    # stops are loaded only for multi-stop rides, most rides have none
+    stops = []
+    if len(ride.segments_taken) > 1:
+        query = (
+            select(RideStop)
+            .where(RideStop.ride_id == ride.id)
+            .order_by(RideStop.position)
+        )
+        stops = (await session.scalars(query)).all()
+    attributes.set_committed_value(ride, "stops", stops)
+    return ride
+
+
+@single_flight("ride_id", "replica")
+async def _load_shared_ride_detailed(
+    ride_id: int, replica: bool, session: AsyncSession
+) -> Ride:
+    return await _load_ride_detailed(session, ride_id)
+
+
+async def get_valid_ride_detailed(
+    ride_id: int, session: AsyncSession = Depends(get_session)
+) -> Ride:
+    """Ride with driver and vehicle for `RideDetailedResponse`
+
+    Concurrent reads of the same ride from the same database, the primary or
+    the replicas, share one load and followers merge the ride into their own
+    sessions. Reads of recent writers are not shared, they must see their
+    writes.
+    """
+    if session.sync_session.is_recent_writer():
+        return await _load_ride_detailed(session, ride_id)
+    replica = bool(session.info.get("use_replica"))
+    ride = await _load_shared_ride_detailed(ride_id, replica, session)
+    if ride in session:
+        return ride
+    return await session.merge(ride, load=False)
+
+
 async def get_valid_ride_for_booking(
     ride: Ride = Depends(get_valid_ride),
     session: AsyncSession = Depends(get_session),
@@ -103,18 +398,35 @@ async def get_valid_ride_for_booking(
             status_code=400, detail=f"Ride with id <{ride.id}> has expired"
         )
 
-    query = select(Booking).where(
+    query = select(Booking.id).where(
         and_(Booking.passenger_id == current_user.id, Booking.ride_id == ride.id)
     )
-    existing_user_booking = await session.scalar(query)
-    if existing_user_booking is not None:
+    existing_booking_id = await session.scalar(query)
+    if existing_booking_id is not None:
         raise HTTPException(
             status_code=400,
-            detail=f"booking from the current user already exists: booking_id: {existing_user_booking.id}",
+            detail=f"booking from the current user already exists: booking_id: {existing_booking_id}",
         )
     return ride
 
 
+def get_booking_stops(
+    from_stop: int = Query(default=0, ge=0),
+    to_stop: int | None = Query(default=None, ge=1),
+    ride: Ride = Depends(get_valid_ride_for_booking),
+) -> tuple[int, int]:
+    """Stops range of a booking, the whole route by default"""
+    segments = len(ride.segments_taken)
+    if to_stop is None:
+        to_stop = segments
+    if not from_stop < to_stop <= segments:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid stops range: from_stop: {from_stop} to_stop: {to_stop}",
+        )
+    return from_stop, to_stop
+
+
 async def get_current_user_ride(
     ride_id: int,
     current_user: User = Depends(get_current_user),
@@ -130,24 +442,6 @@ async def get_current_user_ride(
     return ride
 
 
-async def get_ride_approved_seats(
-    ride: Ride = Depends(get_valid_ride), session: AsyncSession = Depends(get_session)
-):
-    query = select(func.sum(Booking.seats)).where(
-        and_(Booking.ride_id == ride.id, Booking.approved == True)
-    )
-    approved_seats = await session.scalar(query)
-
-    return 0 if approved_seats is None else approved_seats
-
-
-async def get_ride_free_seats(
-    ride: Ride = Depends(get_valid_ride),
-    approved_seats: int = Depends(get_ride_approved_seats),
-):
-    return ride.seats - approved_seats
-
-
 async def check_booking_exist(
     booking_id: int,
     current_user: User = Depends(get_current_user),
@@ -164,19 +458,55 @@ async def check_booking_exist(
     return booking
 
 
+async def _get_ride_booking(
+    session: AsyncSession, ride: Ride, booking_id: int, *options
+) -> Booking:
+    query = (
+        select(Booking)
+        .options(*options)
+        .where(Booking.id == booking_id, Booking.ride_id == ride.id)
+    )
+    booking = await session.scalar(query)
+    if booking is None:
+        raise HTTPException(
+            status_code=400, detail=f"Ride booking with id: {booking_id} not found"
+        )
+
+    return booking
+
+
 async def get_ride_booking(
     booking_id: int,
     ride: Ride = Depends(get_current_user_ride),
     session: AsyncSession = Depends(get_session),
 ) -> Booking:
-    query = select(Booking).where(Booking.ride_id == ride.id)
-    booking = await session.scalar(query)
-    if Booking is None:
+    return await _get_ride_booking(session, ride, booking_id)
+
+
+def check_bookings_batch(batch: RideBookingsBatchRequest) -> RideBookingsBatchRequest:
+    booking_ids = batch.approve + batch.reject
+    if not booking_ids:
+        raise HTTPException(status_code=400, detail="No bookings to approve or reject")
+    if len(set(booking_ids)) != len(booking_ids):
         raise HTTPException(
-            status_code=400, detail=f"Ride booking with id: {booking_id} not found"
+            status_code=400, detail="Booking ids are approved or rejected twice"
         )
+    return batch
 
-    return booking
+
+async def get_ride_booking_detailed(
+    booking_id: int,
+    ride: Ride = Depends(get_current_user_ride),
+    session: AsyncSession = Depends(get_session),
+) -> Booking:
+    """Ride booking with ride and passenger for `BookingDetailedResponse`"""
+    return await _get_ride_booking(
+        session,
+        ride,
+        booking_id,
+        joinedload(Booking.ride),
+        joinedload(Booking.passenger),
+    )
 
 
 async def get_user_info(
@@ -184,15 +514,14 @@ async def get_user_info(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    query = (
-        select(User)
-        .options(joinedload(User.rides, Ride.bookings))
-        .where(
-            and_(
-                User.id == user_id,
-                Ride.departure_at > datetime.datetime.now(tz=datetime.timezone.utc),
-            )
-        )
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    # EXISTS subqueries, so no rides or bookings rows are loaded
+    query = select(User).where(
+        User.id == user_id,
+        or_(
+            User.rides.any(Ride.departure_at > now),
+            User.bookings.any(Booking.ride.has(Ride.driver_id == current_user.id)),
+        ),
     )
     user = await session.scalar(query)
     if user is None:
@@ -201,3 +530,229 @@ async def get_user_info(
         )
 
     return UserPublicResponse(**vars(user))
+
+
+def check_not_modified(request: Request, etag: str) -> None:
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        raise HTTPException(status_code=304, headers={"ETag": etag})
+
+
+async def check_ride_not_modified(
+    ride_id: int, request: Request, session: AsyncSession = Depends(get_session)
+) -> None:
+    """304 for `GET /rides/{ride_id}` before the ride is loaded"""
+    if "if-none-match" not in request.headers:
+        return
+    query = (
+        select(Ride.version, User.version).join(Ride.driver).where(Ride.id == ride_id)
+    )
+    versions = (await session.execute(query)).first()
+    if versions is not None:
+        check_not_modified(request, make_etag(*versions))
+
+
+async def check_ride_bookings_not_modified(
+    request: Request, ride: Ride = Depends(get_current_user_ride)
+) -> str:
+    """ETag of the ride bookings, 304 before they are loaded"""
+    etag = make_etag(ride.version)
+    check_not_modified(request, etag)
+    return etag
+
+
+async def check_user_bookings_not_modified(
+    request: Request,
+    period: Literal["upcoming", "past"] | None = None,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> str | None:
+    """ETag of the current user bookings, 304 before they are loaded
+
+    None for upcoming or past bookings, they change with time too.
+    """
+    if period is not None:
+        return None
+    # current user may come from `user_cache`, the version must be fresh
+    query = select(User.version).where(User.id == current_user.id)
+    etag = make_etag(await session.scalar(query))
+    check_not_modified(request, etag)
+    return etag
+
+
+def parse_cursor(cursor: str | None, types: Sequence[type]) -> tuple | None:
+    """Sort key values of the last returned row, None for the first page"""
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor, types)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _normalize_search_window(
+    departure_from: datetime.datetime | None,
+    departure_to: datetime.datetime | None,
+    max_window: datetime.timedelta | None = None,
+) -> tuple[datetime.datetime, datetime.datetime | None]:
+    """Departure window of a search, clamped to `max_window` if given
+
+    Naive datetimes are treated as UTC, past rides are never searched.
+    """
+    if departure_from is not None and departure_from.tzinfo is None:
+        departure_from = departure_from.replace(tzinfo=datetime.timezone.utc)
+    if departure_to is not None and departure_to.tzinfo is None:
+        departure_to = departure_to.replace(tzinfo=datetime.timezone.utc)
+    now = datetime.datetime.now(tz=datetime.timezone.utc)
+    if departure_from is None or departure_from < now:
+        departure_from = now
+    if max_window is not None and (
+        departure_to is None or departure_to > departure_from + max_window
+    ):
+        departure_to = departure_from + max_window
+    return departure_from, departure_to
+
+
+RIDE_SEARCH_CURSOR_TYPES = {
+    "departure_at": (datetime.datetime, int),
+    "price": (int, datetime.datetime, int),
+}
+
+
+async def get_ride_search_request(
+    departure: str,
+    arrival: str,
+    departure_from: datetime.datetime | None = None,
+    departure_to: datetime.datetime | None = None,
+    min_free_seats: int = Query(default=1, ge=1),
+    max_price: int | None = Query(default=None, ge=0),
+    order_by: Literal["departure_at", "price"] = "departure_at",
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    session: AsyncSession = Depends(get_session),
+) -> RideSearchRequest:
+    departure_from, departure_to = _normalize_search_window(
+        departure_from, departure_to
+    )
+
+    after = parse_cursor(cursor, RIDE_SEARCH_CURSOR_TYPES[order_by])
+
+    return RideSearchRequest(
+        departure_place_id=await place_index.lookup(session, departure),
+        arrival_place_id=await place_index.lookup(session, arrival),
+        departure_from=departure_from,
+        departure_to=departure_to,
+        min_free_seats=min_free_seats,
+        max_price=max_price,
+        order_by=order_by,
+        after=after,
+        limit=limit,
+    )
+
+
+async def is_message_recipient_allowed(
+    session: AsyncSession, sender_id: int, message: MessageCreateRequest
+) -> bool:
+    query = select(Ride.id).where(
+        Ride.id == message.ride_id,
+        or_(
+            and_(
+                Ride.driver_id == sender_id,
+                Ride.bookings.any(Booking.passenger_id == message.recipient_id),
+            ),
+            and_(
+                Ride.driver_id == message.recipient_id,
+                Ride.bookings.any(Booking.passenger_id == sender_id),
+            ),
+        ),
+    )
+    return await session.scalar(query) is not None
+
+
+async def check_message_recipient(
+    message: MessageCreateRequest,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> MessageCreateRequest:
+    """Drivers and passengers of a ride message each other about it"""
+    if not await is_message_recipient_allowed(session, current_user.id, message):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Not found ride with id <{message.ride_id}> of the current "
+            f"user and the recipient with id <{message.recipient_id}>",
+        )
+    return message
+
+
+async def get_itinerary_search_request(
+    departure: str,
+    arrival: str,
+    departure_from: datetime.datetime | None = None,
+    departure_to: datetime.datetime | None = None,
+    min_free_seats: int = Query(default=1, ge=1),
+    min_layover_minutes: int = Query(default=15, ge=0),
+    max_layover_minutes: int = Query(
+        default=240, ge=0, le=config.settings.ITINERARY_MAX_LAYOVER_MINUTES
+    ),
+    order_by: Literal["duration", "price"] = "duration",
+    limit: int = Query(default=10, ge=1, le=50),
+    session: AsyncSession = Depends(get_session),
+) -> ItinerarySearchRequest:
+    departure_place_id = await place_index.lookup(session, departure)
+    arrival_place_id = await place_index.lookup(session, arrival)
+    if normalize_place(departure) == normalize_place(arrival) or (
+        departure_place_id is not None and departure_place_id == arrival_place_id
+    ):
+        raise HTTPException(
+            status_code=400, detail="Departure and arrival are the same"
+        )
+    if min_layover_minutes > max_layover_minutes:
+        raise HTTPException(
+            status_code=400, detail="Min layover is greater than max layover"
+        )
+    # the window bounds candidate legs read into memory
+    departure_from, departure_to = _normalize_search_window(
+        departure_from,
+        departure_to,
+        datetime.timedelta(hours=config.settings.ITINERARY_MAX_WINDOW_HOURS),
+    )
+
+    return ItinerarySearchRequest(
+        departure_place_id=departure_place_id,
+        arrival_place_id=arrival_place_id,
+        departure_from=departure_from,
+        departure_to=departure_to,
+        min_free_seats=min_free_seats,
+        min_layover_minutes=min_layover_minutes,
+        max_layover_minutes=max_layover_minutes,
+        order_by=order_by,
+        limit=limit,
+    )
+
+
+async def get_nearby_search_request(
+    lat: float = Query(ge=-90, le=90),
+    lon: float = Query(ge=-180, le=180),
+    radius_km: float = Query(default=10, gt=0, le=config.settings.NEARBY_MAX_RADIUS_KM),
+    point: Literal["departure", "arrival"] = "departure",
+    departure_from: datetime.datetime | None = None,
+    departure_to: datetime.datetime | None = None,
+    min_free_seats: int = Query(default=1, ge=1),
+    limit: int = Query(default=20, ge=1, le=100),
+) -> NearbyRideSearchRequest:
+    # the window bounds candidates ranked by distance
+    departure_from, departure_to = _normalize_search_window(
+        departure_from,
+        departure_to,
+        datetime.timedelta(hours=config.settings.NEARBY_MAX_WINDOW_HOURS),
+    )
+
+    return NearbyRideSearchRequest(
+        lat=lat,
+        lon=lon,
+        radius_km=radius_km,
+        point=point,
+        departure_from=departure_from,
+        departure_to=departure_to,
+        min_free_seats=min_free_seats,
+        limit=limit,
+    )
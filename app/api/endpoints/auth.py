@@ -9,8 +9,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.core import config, security
+from app.core.revocation import revoked_tokens
 from app.models import User
-from app.schemas.requests import RefreshTokenRequest
+from app.schemas.requests import LogoutRequest, RefreshTokenRequest
 from app.schemas.responses import AccessTokenResponse
 
 router = APIRouter()
@@ -25,11 +26,15 @@ async def login_access_token(
 
     result = await session.execute(select(User).where(User.email == form_data.username))
     user = result.scalars().first()
+    # give connection back to the pool while password is verified in the pool
+    await session.close()
 
     if user is None:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
-    if not security.verify_password(form_data.password, user.hashed_password):
+    if not await security.verify_password_async(
+        form_data.password, user.hashed_password
+    ):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
     return security.generate_access_token_response(str(user.id))
@@ -68,10 +73,63 @@ async def refresh_token(
             detail="Could not validate credentials, token expired or not yet valid",
         )
 
+    await revoked_tokens.sync(session)
+    if await revoked_tokens.is_revoked(session, token_data.jti):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials, token revoked",
+        )
+
     result = await session.execute(select(User).where(User.id == token_data.sub))
     user = result.scalars().first()
 
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
+    # rotation, every refresh token can be exchanged only once
+    if token_data.jti is not None:
+        if not await revoked_tokens.revoke(
+            session, token_data.jti, token_data.expires_at
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials, token revoked",
+            )
+        await session.commit()
+
     return security.generate_access_token_response(str(user.id))
+
+
+@router.post("/logout", status_code=204)
+async def logout(
+    input: LogoutRequest,
+    token_data: security.JWTTokenPayload = Depends(deps.get_current_token_payload),
+    session: AsyncSession = Depends(deps.get_session),
+):
+    """Revoke current access token and optionally refresh token issued with it"""
+    if input.refresh_token is not None:
+        try:
+            payload = jwt.decode(
+                input.refresh_token,
+                config.settings.SECRET_KEY,
+                algorithms=[security.JWT_ALGORITHM],
+            )
+            refresh_token_data = security.JWTTokenPayload(**payload)
+        except (jwt.DecodeError, ValidationError):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials, unknown error",
+            )
+        if not refresh_token_data.refresh or refresh_token_data.sub != token_data.sub:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials, invalid refresh token",
+            )
+        if refresh_token_data.jti is not None:
+            await revoked_tokens.revoke(
+                session, refresh_token_data.jti, refresh_token_data.expires_at
+            )
+
+    if token_data.jti is not None:
+        await revoked_tokens.revoke(session, token_data.jti, token_data.expires_at)
+    await session.commit()
@@ -1,28 +1,41 @@
 from datetime import datetime, timezone
+from typing import Literal
 
 from fastapi import HTTPException
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import delete, insert, literal, select, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from app.api import deps
+from app.core.etag import bump_version
+from app.core.events import booking_event, event_hub
+from app.core.pagination import encode_cursor
+from app.core.segments import take_seats
+from app.core.serialization import FastJSONResponse
 from app.models import User, Ride, Booking
-from app.schemas.responses import BookingCreateResponse, BookingDetailedResponse
+from app.schemas.responses import (
+    BookingCreateResponse,
+    BookingDetailedPageResponse,
+)
 
 router = APIRouter()
 
+BOOKING_CURSOR_TYPES = (datetime, int)
+
 
 @router.post("/bookings", response_model=BookingCreateResponse)
 async def book_ride(
-    requested_seats: int,
+    requested_seats: int = Query(ge=1),
+    stops: tuple[int, int] = Depends(deps.get_booking_stops),
     ride: Ride = Depends(deps.get_valid_ride_for_booking),
-    approved_seats: int = Depends(deps.get_ride_approved_seats),
     current_user: User = Depends(deps.get_current_user),
     session: AsyncSession = Depends(deps.get_session),
 ):
-    """Book the ride"""
-    free_seats = ride.seats - approved_seats
+    """Book the ride, from `from_stop` to `to_stop` of a multi-stop ride"""
+    from_stop, to_stop = stops
+    free_seats = ride.seats - max(ride.segments_taken[from_stop:to_stop])
 
     if requested_seats > free_seats:
         raise HTTPException(
@@ -30,31 +43,135 @@ async def book_ride(
             detail=f"Not enough free seats: requested_seats: {requested_seats} free seats: {free_seats}",
         )
 
+    # versions of the ride and of the passenger are bumped by the same statement
+    passenger_version = bump_version(User, current_user.id).cte("passenger_version")
+
     if ride.with_approval:
-        booking = Booking(
-            passenger_id=current_user.id, approved=False, seats=requested_seats
+        # seats are taken on approval, see `approve_ride_booking`
+        query = (
+            insert(Booking)
+            .values(
+                ride_id=ride.id,
+                passenger_id=current_user.id,
+                approved=False,
+                seats=requested_seats,
+                from_stop=from_stop,
+                to_stop=to_stop,
+            )
+            .add_cte(bump_version(Ride, ride.id).cte("ride_version"))
+            .add_cte(passenger_version)
+            .returning(Booking)
+        )
+        booking = await session.scalar(query)
+        await session.commit()
+        await event_hub.publish(
+            booking_event("created", booking), [current_user.id, ride.driver_id]
         )
-    else:
-        booking = Booking(
-            passenger_id=current_user.id,
-            approved=True,
-            approved_at=datetime.now(tz=timezone.utc),
-            seats=requested_seats,
+        return booking
+
+    # Guarded seats reservation and booking insert in a single statement.
+    # Concurrent bookings are serialized by the ride row lock taken by UPDATE,
+    # the loser re-checks the condition against the committed counters
+    # and inserts nothing, so no segment of the ride can be oversold.
+    taken = take_seats(from_stop, to_stop, requested_seats)
+    reserved = (
+        update(Ride)
+        .where(Ride.id == ride.id, taken["seats_taken"] <= Ride.seats)
+        .values(**taken, version=Ride.version + 1)
+        .returning(Ride.id)
+        .cte("reserved")
+    )
+    query = (
+        insert(Booking)
+        .from_select(
+            [
+                "ride_id",
+                "passenger_id",
+                "approved",
+                "approved_at",
+                "seats",
+                "from_stop",
+                "to_stop",
+            ],
+            select(
+                reserved.c.id,
+                literal(current_user.id),
+                literal(True),
+                literal(datetime.now(tz=timezone.utc)),
+                literal(requested_seats),
+                literal(from_stop),
+                literal(to_stop),
+            ),
+        )
+        .add_cte(passenger_version)
+        .returning(Booking)
+    )
+    booking = await session.scalar(query)
+    if booking is None:
+        await session.rollback()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Not enough free seats: requested_seats: {requested_seats}",
         )
-    await session.refresh(ride, ["bookings"])
-    ride.bookings.append(booking)
     await session.commit()
+    await deps.invalidate_ride_searches(
+        [(ride.departure_place_id, ride.arrival_place_id)]
+    )
+    await event_hub.publish(
+        booking_event("created", booking), [current_user.id, ride.driver_id]
+    )
     return booking
 
 
-@router.get("/bookings", response_model=list[BookingDetailedResponse])
+@router.get(
+    "/bookings",
+    response_model=BookingDetailedPageResponse,
+    dependencies=[Depends(deps.use_replica)],
+)
 async def read_current_user_bookings(
+    period: Literal["upcoming", "past"] | None = None,
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    etag: str | None = Depends(deps.check_user_bookings_not_modified),
     current_user: User = Depends(deps.get_current_user),
     session: AsyncSession = Depends(deps.get_session),
 ):
-    """Read the current user's bookings"""
-    await session.refresh(current_user, ["bookings"])
-    return current_user.bookings
+    """Read the current user's bookings, newest first
+
+    `upcoming` and `past` periods filter bookings by departure of the ride.
+    """
+    # served by ix_booking_passenger_id_filled_at, passenger is the current
+    # user, resolved from the session identity map
+    sort_key = (Booking.filled_at, Booking.id)
+    query = (
+        select(Booking)
+        .options(selectinload(Booking.ride))
+        .where(Booking.passenger_id == current_user.id)
+    )
+    if period is not None:
+        now = datetime.now(tz=timezone.utc)
+        query = query.join(Booking.ride).where(
+            Ride.departure_at >= now
+            if period == "upcoming"
+            else Ride.departure_at < now
+        )
+    after = deps.parse_cursor(cursor, BOOKING_CURSOR_TYPES)
+    if after is not None:
+        query = query.where(tuple_(*sort_key) < tuple_(*after))
+    query = query.order_by(*(column.desc() for column in sort_key)).limit(limit + 1)
+
+    bookings = (await session.scalars(query)).all()
+    next_cursor = None
+    if len(bookings) > limit:
+        bookings = bookings[:limit]
+        next_cursor = encode_cursor(
+            [getattr(bookings[-1], column.key) for column in sort_key]
+        )
+    return FastJSONResponse(
+        {"items": bookings, "next_cursor": next_cursor},
+        BookingDetailedPageResponse,
+        headers={"ETag": etag} if etag is not None else None,
+    )
 
 
 @router.delete("/bookings/{booking_id}", status_code=204)
@@ -64,5 +181,36 @@ async def cancel_the_booking(
     session: AsyncSession = Depends(deps.get_session),
 ):
     """Cancel the current user's active booking"""
-    await session.delete(booking)
+    # only the request that actually deleted the booking releases its seats
+    query = (
+        delete(Booking)
+        .where(Booking.id == booking.id)
+        .returning(Booking.approved, Booking.seats, Booking.from_stop, Booking.to_stop)
+    )
+    deleted = (await session.execute(query)).first()
+    route = None
+    if deleted is not None:
+        released_seats = deleted.seats if deleted.approved else 0
+        route = (
+            await session.execute(
+                update(Ride)
+                .where(Ride.id == booking.ride_id)
+                .values(
+                    **take_seats(deleted.from_stop, deleted.to_stop, -released_seats),
+                    version=Ride.version + 1,
+                )
+                .add_cte(bump_version(User, current_user.id).cte("passenger_version"))
+                .returning(
+                    Ride.departure_place_id, Ride.arrival_place_id, Ride.driver_id
+                )
+            )
+        ).first()
     await session.commit()
+    if deleted is not None:
+        if deleted.approved:
+            await deps.invalidate_ride_searches(
+                [(route.departure_place_id, route.arrival_place_id)]
+            )
+        await event_hub.publish(
+            booking_event("cancelled", booking), [current_user.id, route.driver_id]
+        )
@@ -0,0 +1,50 @@
+import asyncio
+from collections.abc import AsyncIterator
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.core import config
+from app.core.events import event_hub
+from app.models import User
+
+router = APIRouter()
+
+
+async def stream_user_events(user_id: int) -> AsyncIterator[str]:
+    with event_hub.subscribe(user_id) as subscription:
+        # confirms the subscription, clients may re-read state from here on
+        yield ": subscribed\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.get(), config.settings.EVENTS_HEARTBEAT_SECONDS
+                )
+            except TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is None:
+                # the client lags behind, it reconnects and re-reads state
+                return
+            yield event.encode_sse()
+
+
+@router.get("/events", response_class=StreamingResponse)
+async def stream_current_user_events(
+    current_user: User = Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_session),
+):
+    """Stream of the current user's events, Server-Sent Events
+
+    Booking events with `BookingResponse` data are sent to the passenger
+    and the driver: booking.created, booking.approved, booking.cancelled
+    """
+    # the stream outlives dependencies, give the connection back to the pool
+    await session.close()
+    return StreamingResponse(
+        stream_user_events(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,3 +1,261 @@
-from fastapi import APIRouter
+import asyncio
+import functools
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from sqlalchemy import and_, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from app.api import deps
+from app.core import config
+from app.core.chat import message_event, message_writer, upsert_message_threads
+from app.core.events import Event, Subscription, event_hub
+from app.core.pagination import encode_cursor
+from app.core.session import async_session
+from app.models import Messages, MessageThread, User
+from app.schemas.requests import MessageCreateRequest
+from app.schemas.responses import (
+    MessagePageResponse,
+    MessageResponse,
+    MessageThreadPageResponse,
+)
 
 router = APIRouter()
+
+MESSAGE_CURSOR_TYPES = (datetime, int)
+THREAD_CURSOR_TYPES = (datetime, int, int)
+
+
+@router.post("/messages", response_model=MessageResponse)
+async def send_message(
+    message_data: MessageCreateRequest = Depends(deps.check_message_recipient),
+    current_user: User = Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_session),
+):
+    """Send a message to the driver or a passenger of the ride"""
+    message = Messages(**message_data.model_dump(), sender_id=current_user.id)
+    session.add(message)
+    await session.flush()
+    await upsert_message_threads(session, [message])
+    await session.commit()
+    await event_hub.publish(*message_event(message))
+    return message
+
+
+@router.get(
+    "/messages/threads",
+    response_model=MessageThreadPageResponse,
+    dependencies=[Depends(deps.use_replica)],
+)
+async def read_current_user_message_threads(
+    cursor: str | None = None,
+    limit: int = Query(default=20, ge=1, le=100),
+    current_user: User = Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_session),
+):
+    """Read the current user's conversations, recently active first"""
+    # served by ix_message_thread_user_id_last_message_at, messages are
+    # only read by primary key for the page rows
+    sort_key = (
+        MessageThread.last_message_at,
+        MessageThread.ride_id,
+        MessageThread.peer_id,
+    )
+    query = (
+        select(MessageThread)
+        .options(joinedload(MessageThread.last_message))
+        .where(MessageThread.user_id == current_user.id)
+    )
+    after = deps.parse_cursor(cursor, THREAD_CURSOR_TYPES)
+    if after is not None:
+        query = query.where(tuple_(*sort_key) < tuple_(*after))
+    query = query.order_by(*(column.desc() for column in sort_key)).limit(limit + 1)
+
+    threads = (await session.scalars(query)).all()
+    next_cursor = None
+    if len(threads) > limit:
+        threads = threads[:limit]
+        next_cursor = encode_cursor(
+            [getattr(threads[-1], column.key) for column in sort_key]
+        )
+    return MessageThreadPageResponse(items=threads, next_cursor=next_cursor)
+
+
+@router.get(
+    "/messages/rides/{ride_id}",
+    response_model=MessagePageResponse,
+    dependencies=[Depends(deps.use_replica)],
+)
+async def read_current_user_ride_messages(
+    ride_id: int,
+    peer_id: int | None = None,
+    cursor: str | None = None,
+    limit: int = Query(default=50, ge=1, le=100),
+    current_user: User = Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_session),
+):
+    """Read the current user's messages about the ride, newest first
+
+    With `peer_id` only the conversation with that user is read.
+    """
+    # served by ix_messages_ride_id_created_at
+    sort_key = (Messages.created_at, Messages.id)
+    if peer_id is None:
+        participants = or_(
+            Messages.sender_id == current_user.id,
+            Messages.recipient_id == current_user.id,
+        )
+    else:
+        participants = or_(
+            and_(
+                Messages.sender_id == current_user.id, Messages.recipient_id == peer_id
+            ),
+            and_(
+                Messages.sender_id == peer_id, Messages.recipient_id == current_user.id
+            ),
+        )
+    query = select(Messages).where(Messages.ride_id == ride_id, participants)
+    after = deps.parse_cursor(cursor, MESSAGE_CURSOR_TYPES)
+    if after is not None:
+        query = query.where(tuple_(*sort_key) < tuple_(*after))
+    query = query.order_by(*(column.desc() for column in sort_key)).limit(limit + 1)
+
+    messages = (await session.scalars(query)).all()
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor(
+            [getattr(messages[-1], column.key) for column in sort_key]
+        )
+    return MessagePageResponse(items=messages, next_cursor=next_cursor)
+
+
+@router.post("/messages/threads/{ride_id}/{peer_id}/read", status_code=204)
+async def mark_message_thread_read(
+    ride_id: int,
+    peer_id: int,
+    current_user: User = Depends(deps.get_current_user),
+    session: AsyncSession = Depends(deps.get_session),
+):
+    """Mark the conversation with the peer about the ride as read"""
+    await session.execute(
+        update(MessageThread)
+        .where(
+            MessageThread.user_id == current_user.id,
+            MessageThread.ride_id == ride_id,
+            MessageThread.peer_id == peer_id,
+        )
+        .values(unread_count=0)
+    )
+    await session.commit()
+
+
+def _on_message_written(
+    subscription: Subscription,
+    pending: asyncio.Semaphore,
+    client_id: str | None,
+    future: asyncio.Future,
+) -> None:
+    pending.release()
+    if future.cancelled():
+        return
+    if future.exception() is not None:
+        subscription.put(
+            Event("error", {"client_id": client_id, "detail": "Message not sent"})
+        )
+        return
+    subscription.put(
+        Event("message.sent", {"client_id": client_id, "id": future.result().id})
+    )
+
+
+async def _receive_messages(
+    websocket: WebSocket, user_id: int, subscription: Subscription
+) -> None:
+    # backpressure: the socket is not read while too many messages of
+    # the connection wait for a group commit
+    pending = asyncio.Semaphore(config.settings.CHAT_MAX_PENDING_PER_CONNECTION)
+    # (ride_id, recipient_id) pairs already checked for the connection
+    allowed: set[tuple[int, int]] = set()
+    while True:
+        try:
+            payload = await websocket.receive_json()
+        except (ValueError, KeyError):
+            # not JSON, or a binary frame
+            subscription.put(
+                Event("error", {"client_id": None, "detail": "Invalid message"})
+            )
+            continue
+        client_id = payload.get("client_id") if isinstance(payload, dict) else None
+        try:
+            message = MessageCreateRequest.model_validate(payload)
+        except ValidationError:
+            subscription.put(
+                Event("error", {"client_id": client_id, "detail": "Invalid message"})
+            )
+            continue
+
+        key = (message.ride_id, message.recipient_id)
+        if key not in allowed:
+            async with async_session() as session:
+                if not await deps.is_message_recipient_allowed(
+                    session, user_id, message
+                ):
+                    subscription.put(
+                        Event(
+                            "error",
+                            {"client_id": client_id, "detail": "Recipient not allowed"},
+                        )
+                    )
+                    continue
+            allowed.add(key)
+
+        await pending.acquire()
+        future = await message_writer.submit(user_id, message)
+        future.add_done_callback(
+            functools.partial(_on_message_written, subscription, pending, client_id)
+        )
+
+
+async def _send_events(websocket: WebSocket, subscription: Subscription) -> None:
+    while (event := await subscription.get()) is not None:
+        await websocket.send_text(json.dumps({"type": event.type, "data": event.data}))
+    # the client does not keep up, it reconnects and re-reads missed messages
+    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+
+@router.websocket("/messages/ws")
+async def chat(
+    websocket: WebSocket,
+    current_user: User = Depends(deps.get_websocket_user),
+    session: AsyncSession = Depends(deps.get_session),
+):
+    """Real-time messages of the current user
+
+    Client sends `{"type": "message.send", "client_id": ..., "ride_id": ...,
+    "recipient_id": ..., "message_text": ...}`, the message is acknowledged
+    with `message.sent` event with its id once persisted or `error` event,
+    both with the `client_id`. Messages of the user, sent by any connection
+    or `POST /messages`, are pushed as `message.created` events with
+    `MessageResponse` data. Events are `{"type": ..., "data": ...}`.
+    """
+    # the connection outlives dependencies, give the DB connection back
+    await session.close()
+    user_id = current_user.id
+    await websocket.accept()
+    with event_hub.subscribe(user_id) as subscription:
+        tasks = [
+            asyncio.create_task(_receive_messages(websocket, user_id, subscription)),
+            asyncio.create_task(_send_events(websocket, subscription)),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            if not isinstance(task.exception(), WebSocketDisconnect | None):
+                raise task.exception()
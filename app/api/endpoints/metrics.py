@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+
+from app.core.metrics import generate_metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics():
+    """Prometheus metrics aggregated over all uvicorn workers"""
+    data, content_type = generate_metrics()
+    return Response(content=data, media_type=content_type)
@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends, Query
+
+from app.api import deps
+from app.core.places import place_index
+from app.models import User
+from app.schemas.responses import PlaceResponse
+
+router = APIRouter()
+
+
+@router.get("/places/autocomplete", response_model=list[PlaceResponse])
+async def autocomplete_places(
+    q: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=5, ge=1, le=10),
+    current_user: User = Depends(deps.get_current_user),
+):
+    """Places with names starting with the typed text, a few typos tolerated
+
+    Served from the in-memory dictionary of places, no database queries.
+    """
+    return [
+        PlaceResponse(id=place_id, name=name)
+        for place_id, name in place_index.suggest(q, limit)
+    ]
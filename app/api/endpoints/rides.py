@@ -1,20 +1,74 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from typing import Literal
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import (
+    ARRAY,
+    Integer,
+    Row,
+    case,
+    delete,
+    exists,
+    func,
+    insert,
+    literal,
+    select,
+    tuple_,
+    update,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.models import User, Ride, Booking
-from app.schemas.requests import RideCreateRequest
+from app.core import config, geo
+from app.core.cache import ride_search_cache
+from app.core.etag import bump_version, make_etag
+from app.core.events import booking_event, event_hub
+from app.core.itineraries import join_legs
+from app.core.serialization import FastJSONResponse
+from app.core.pagination import encode_cursor
+from app.core.places import place_index
+from app.core.segments import take_bookings_seats, take_seats
+from app.models import User, Ride, RideStop, Booking
+from app.schemas.requests import (
+    ItinerarySearchRequest,
+    NearbyRideSearchRequest,
+    RideBookingsBatchRequest,
+    RideCreateRequest,
+    RideSearchRequest,
+)
 from app.schemas.responses import (
-    RideResponse,
+    BookingBatchOutcomeResponse,
+    ItineraryResponse,
+    ItinerarySearchResponse,
+    NearbyRideResponse,
+    NearbyRideSearchResponse,
+    RideBulkCreateResponse,
     RideCreateResponse,
     RideDetailedResponse,
+    RideBookingsBatchResponse,
+    RidePageResponse,
+    RideSearchItemResponse,
+    RideSearchResponse,
     BookingResponse, BookingDetailedResponse,
 )
 
 router = APIRouter()
 
+RIDE_CURSOR_TYPES = (datetime, int)
+# retries of a batch approval when seats of the ride change concurrently
+BATCH_APPROVE_ATTEMPTS = 3
+
+
+def _ride_values(ride_data: RideCreateRequest, place_ids: dict[str, int]) -> dict:
+    """Ride columns of the create request, stops are rows of their own"""
+    values = ride_data.model_dump(exclude={"stops"})
+    values["segments_taken"] = [0] * (len(ride_data.stops) + 1)
+    for point in ["departure", "arrival"]:
+        values[f"{point}_place_id"] = place_ids[values[point]]
+        lat, lon = values[f"{point}_lat"], values[f"{point}_lon"]
+        values[f"{point}_geohash"] = None if lat is None else geo.encode(lat, lon)
+    return values
+
 
 @router.post("/rides", response_model=RideCreateResponse)
 async def create_ride(
@@ -23,54 +77,373 @@ async def create_ride(
         session: AsyncSession = Depends(deps.get_session),
 ):
     """Create a new ride with driver's role for the current user"""
-    ride = Ride(**ride_data.model_dump(exclude_unset=True), driver_id=current_user.id)
+    place_ids = await place_index.get_or_create(
+        [ride_data.departure, ride_data.arrival]
+    )
+    ride = Ride(
+        **_ride_values(ride_data, place_ids),
+        driver_id=current_user.id,
+        stops=[
+            RideStop(position=position, **stop.model_dump())
+            for position, stop in enumerate(ride_data.stops, start=1)
+        ],
+    )
     session.add(ride)
     await session.commit()
+    await deps.invalidate_ride_searches(
+        [(ride.departure_place_id, ride.arrival_place_id)]
+    )
     return ride
 
 
-@router.get("/rides/me", response_model=list[RideResponse])
+async def _insert_rides(
+        session: AsyncSession, driver: User, rides: list[RideCreateRequest]
+) -> RideBulkCreateResponse:
+    # multi-row INSERT .. RETURNING, SQLAlchemy batches rows into as few
+    # statements as parameters limit allows, all in one transaction
+    place_ids = await place_index.get_or_create(
+        name for ride in rides for name in (ride.departure, ride.arrival)
+    )
+    query = insert(Ride).returning(Ride.id, sort_by_parameter_order=True)
+    ids = await session.scalars(
+        query,
+        [{**_ride_values(ride, place_ids), "driver_id": driver.id} for ride in rides],
+    )
+    response = RideBulkCreateResponse(ids=ids.all())
+    stops = [
+        {"ride_id": ride_id, "position": position, **stop.model_dump()}
+        for ride_id, ride in zip(response.ids, rides)
+        for position, stop in enumerate(ride.stops, start=1)
+    ]
+    if stops:
+        await session.execute(insert(RideStop), stops)
+    await session.commit()
+    await deps.invalidate_ride_searches(
+        (place_ids[ride.departure], place_ids[ride.arrival]) for ride in rides
+    )
+    return response
+
+
+@router.post("/rides/bulk", response_model=RideBulkCreateResponse)
+async def create_rides(
+        rides: list[RideCreateRequest] = Depends(deps.check_valid_bulk_rides),
+        current_user: User = Depends(deps.get_current_user),
+        session: AsyncSession = Depends(deps.get_session),
+):
+    """Create several rides at once, ids are returned in the request order"""
+    return await _insert_rides(session, current_user, rides)
+
+
+@router.post("/rides/schedule", response_model=RideBulkCreateResponse)
+async def create_scheduled_rides(
+        rides: list[RideCreateRequest] = Depends(deps.get_scheduled_rides),
+        current_user: User = Depends(deps.get_current_user),
+        session: AsyncSession = Depends(deps.get_session),
+):
+    """Create rides departing at the same time on weekdays of a dates range
+
+    E.g. every weekday at 08:00 for 3 months. Ids are returned by departure.
+    """
+    return await _insert_rides(session, current_user, rides)
+
+
+@router.get("/rides/me", response_model=RidePageResponse)
 async def read_current_user_rides(
+        period: Literal["upcoming", "past"] | None = None,
+        cursor: str | None = None,
+        limit: int = Query(default=20, ge=1, le=100),
         current_user: User = Depends(deps.get_current_user),
         session: AsyncSession = Depends(deps.get_session),
 ):
-    """Read  the current user's rides"""
-    await session.refresh(current_user, ["rides"])
-    return current_user.rides
+    """Read the current user's rides
+
+    Upcoming rides are read soonest first, past and all rides latest first.
+    """
+    # served by ix_ride_driver_id_departure_at
+    sort_key = (Ride.departure_at, Ride.id)
+    query = select(Ride).where(Ride.driver_id == current_user.id)
+    now = datetime.now(tz=timezone.utc)
+    if period == "upcoming":
+        query = query.where(Ride.departure_at >= now)
+    elif period == "past":
+        query = query.where(Ride.departure_at < now)
+    after = deps.parse_cursor(cursor, RIDE_CURSOR_TYPES)
+    if period == "upcoming":
+        if after is not None:
+            query = query.where(tuple_(*sort_key) > tuple_(*after))
+        query = query.order_by(*sort_key)
+    else:
+        if after is not None:
+            query = query.where(tuple_(*sort_key) < tuple_(*after))
+        query = query.order_by(*(column.desc() for column in sort_key))
+    query = query.limit(limit + 1)
+
+    rides = (await session.scalars(query)).all()
+    next_cursor = None
+    if len(rides) > limit:
+        rides = rides[:limit]
+        next_cursor = encode_cursor(
+            [getattr(rides[-1], column.key) for column in sort_key]
+        )
+    return FastJSONResponse(
+        {"items": rides, "next_cursor": next_cursor}, RidePageResponse
+    )
 
 
-@router.get("/rides/search")
+@router.get(
+    "/rides/search",
+    response_model=RideSearchResponse,
+    dependencies=[Depends(deps.use_replica)],
+)
 async def search_rides(
+        search: RideSearchRequest = Depends(deps.get_ride_search_request),
         current_user: User = Depends(deps.get_current_user),
         session: AsyncSession = Depends(deps.get_session),
 ):
-    pass
+    """Search rides by route, departure time window, free seats and price"""
+    if search.departure_place_id is None or search.arrival_place_id is None:
+        return RideSearchResponse(items=[], next_cursor=None)
+    now = datetime.now(tz=timezone.utc)
+    # departure_from clamped to the request time means "from now", past rides
+    # of a response cached for such searches are dropped on hits below
+    from_now = search.departure_from <= now
+    cache_key = tuple(
+        search.model_dump(exclude={"departure_from"} if from_now else None).items()
+    )
+    response = ride_search_cache.get(cache_key)
+    if response is not None:
+        if response.items and response.items[0].departure_at < now:
+            response = response.model_copy(
+                update={
+                    "items": [
+                        item for item in response.items if item.departure_at >= now
+                    ]
+                }
+            )
+        return response
+    # a response read concurrently with a route change is not cached
+    generation = ride_search_cache.generation
 
+    # equality on departure and arrival places plus range on departure_at
+    # is served by ix_ride_departure_place_id_arrival_place_id_departure_at
+    query = select(Ride).where(
+        Ride.departure_place_id == search.departure_place_id,
+        Ride.arrival_place_id == search.arrival_place_id,
+        Ride.departure_at >= search.departure_from,
+        Ride.free_seats >= search.min_free_seats,
+    )
+    if search.departure_to is not None:
+        query = query.where(Ride.departure_at < search.departure_to)
+    if search.max_price is not None:
+        query = query.where(Ride.price <= search.max_price)
 
-@router.get("/rides/{ride_id}", response_model=RideDetailedResponse)
-async def read_ride_info(
-        ride: Ride = Depends(deps.get_valid_ride),
-        free_seats: int = Depends(deps.get_ride_free_seats),
+    if search.order_by == "price":
+        sort_key = (Ride.price, Ride.departure_at, Ride.id)
+    else:
+        sort_key = (Ride.departure_at, Ride.id)
+    if search.after is not None:
+        query = query.where(tuple_(*sort_key) > tuple_(*search.after))
+    query = query.order_by(*sort_key).limit(search.limit + 1)
+
+    rides = (await session.scalars(query)).all()
+    next_cursor = None
+    if len(rides) > search.limit:
+        rides = rides[: search.limit]
+        next_cursor = encode_cursor(
+            [getattr(rides[-1], column.key) for column in sort_key]
+        )
+
+    response = RideSearchResponse(
+        items=[RideSearchItemResponse.model_validate(ride) for ride in rides],
+        next_cursor=next_cursor,
+    )
+    ride_search_cache.set(
+        cache_key,
+        response,
+        tags=[(search.departure_place_id, search.arrival_place_id)],
+        generation=generation,
+    )
+    return response
+
+
+@router.get(
+    "/rides/itineraries",
+    response_model=ItinerarySearchResponse,
+    dependencies=[Depends(deps.use_replica)],
+)
+async def search_itineraries(
+        search: ItinerarySearchRequest = Depends(deps.get_itinerary_search_request),
+        current_user: User = Depends(deps.get_current_user),
+        session: AsyncSession = Depends(deps.get_session),
+):
+    """Search two-leg itineraries, rides A→B then B→C departing in the window
+
+    The second ride departs from B within the layover bounds after the first
+    arrives, both have the free seats. Itineraries are ranked by total
+    duration then price, or by price then duration.
+    """
+    if search.departure_place_id is None or search.arrival_place_id is None:
+        return ItinerarySearchResponse(items=[])
+    # legs are read as plain rows, full rides only for the best itineraries
+    leg_columns = (
+        Ride.id,
+        Ride.departure_place_id,
+        Ride.arrival_place_id,
+        Ride.departure_at,
+        Ride.arrival_at,
+        Ride.price,
+    )
+    max_candidates = config.settings.ITINERARY_MAX_CANDIDATES
+    min_layover = timedelta(minutes=search.min_layover_minutes)
+    max_layover = timedelta(minutes=search.max_layover_minutes)
+
+    # served by ix_ride_departure_place_id_departure_at
+    query = (
+        select(*leg_columns)
+        .where(
+            Ride.departure_place_id == search.departure_place_id,
+            Ride.arrival_place_id != search.arrival_place_id,
+            Ride.departure_at >= search.departure_from,
+            Ride.departure_at < search.departure_to,
+            Ride.free_seats >= search.min_free_seats,
+        )
+        .order_by(Ride.departure_at)
+        .limit(max_candidates)
+    )
+    first_legs = (await session.execute(query)).all()
+    if not first_legs:
+        return ItinerarySearchResponse(items=[])
+
+    # served by ix_ride_departure_place_id_arrival_place_id_departure_at, a
+    # range scan of every route from the cities first legs reach, within
+    # the widest layover window of all of them
+    query = (
+        select(*leg_columns)
+        .where(
+            Ride.departure_place_id.in_({leg.arrival_place_id for leg in first_legs}),
+            Ride.arrival_place_id == search.arrival_place_id,
+            Ride.departure_at
+            >= min(leg.arrival_at for leg in first_legs) + min_layover,
+            Ride.departure_at
+            <= max(leg.arrival_at for leg in first_legs) + max_layover,
+            Ride.free_seats >= search.min_free_seats,
+        )
+        .order_by(Ride.departure_at)
+        .limit(max_candidates)
+    )
+    second_legs = (await session.execute(query)).all()
+
+    itineraries = join_legs(
+        first_legs,
+        second_legs,
+        min_layover,
+        max_layover,
+        search.limit,
+        search.order_by,
+    )
+    ride_ids = {leg.id for item in itineraries for leg in [item.first, item.second]}
+    rides = {
+        ride.id: RideSearchItemResponse.model_validate(ride)
+        for ride in await session.scalars(select(Ride).where(Ride.id.in_(ride_ids)))
+    }
+    return ItinerarySearchResponse(
+        items=[
+            ItineraryResponse(
+                legs=[rides[item.first.id], rides[item.second.id]],
+                price=item.price,
+                duration_minutes=item.duration // timedelta(minutes=1),
+                layover_minutes=item.layover // timedelta(minutes=1),
+            )
+            for item in itineraries
+        ]
+    )
+
+
+@router.get(
+    "/rides/nearby",
+    response_model=NearbyRideSearchResponse,
+    dependencies=[Depends(deps.use_replica)],
+)
+async def search_nearby_rides(
+        search: NearbyRideSearchRequest = Depends(deps.get_nearby_search_request),
+        current_user: User = Depends(deps.get_current_user),
         session: AsyncSession = Depends(deps.get_session),
+):
+    """Search rides departing or arriving within the radius of the point
+
+    Rides are ranked by distance, then by departure. Only rides with
+    coordinates are found.
+    """
+    lat, lon, geohash = (
+        getattr(Ride, f"{search.point}_{column}")
+        for column in ["lat", "lon", "geohash"]
+    )
+    distance = geo.distance_km_sql(lat, lon, search.lat, search.lon)
+    cells = geo.cover(search.lat, search.lon, search.radius_km)
+    # index range scans of ix_ride_departure_geohash_departure_at or
+    # ix_ride_arrival_geohash_departure_at, one per cell covering the circle
+    query = (
+        select(Ride, distance.label("distance_km"))
+        .where(
+            geo.in_cells(geohash, cells),
+            Ride.departure_at >= search.departure_from,
+            Ride.departure_at < search.departure_to,
+            Ride.free_seats >= search.min_free_seats,
+            distance <= search.radius_km,
+        )
+        .order_by(distance, Ride.departure_at, Ride.id)
+        .limit(search.limit)
+    )
+    rows = (await session.execute(query)).all()
+    return NearbyRideSearchResponse(
+        items=[
+            NearbyRideResponse(
+                **RideSearchItemResponse.model_validate(ride).model_dump(),
+                distance_km=distance_km,
+            )
+            for ride, distance_km in rows
+        ]
+    )
+
+
+@router.get(
+    "/rides/{ride_id}",
+    response_model=RideDetailedResponse,
+    dependencies=[
+        Depends(deps.use_replica),
+        Depends(deps.identify_reader),
+        Depends(deps.check_ride_not_modified),
+    ],
+)
+async def read_ride_info(
+        response: Response,
+        ride: Ride = Depends(deps.get_valid_ride_detailed),
 ):
     """Read ride's information"""
-    await session.refresh(ride, ["driver", "vehicle", "bookings"])
-    return RideDetailedResponse(**vars(ride), free_seats=free_seats)
+    response.headers["ETag"] = make_etag(ride.version, ride.driver.version)
+    return RideDetailedResponse(
+        **vars(ride),
+        free_seats=ride.free_seats,
+        segments_free_seats=[ride.seats - taken for taken in ride.segments_taken],
+    )
 
 
 @router.get("/rides/me/{ride_id}/bookings", response_model=list[BookingResponse])
 async def read_current_user_ride_bookings(
+        response: Response,
+        etag: str = Depends(deps.check_ride_bookings_not_modified),
         ride: Ride = Depends(deps.get_current_user_ride),
         session: AsyncSession = Depends(deps.get_session),
 ):
     """Read incoming ride booking's of the current user"""
-    await session.refresh(ride, ["bookings"])
-    return ride.bookings
+    response.headers["ETag"] = etag
+    query = select(Booking).where(Booking.ride_id == ride.id).order_by(Booking.id)
+    return (await session.scalars(query)).all()
 
 
 @router.get("/rides/me/{ride_id}/bookings/{booking_id}", response_model=BookingDetailedResponse)
 async def read_current_user_ride_booking(
-        booking: Booking = Depends(deps.get_ride_booking),
+        booking: Booking = Depends(deps.get_ride_booking_detailed),
 ):
     return booking
 
@@ -79,15 +452,253 @@ async def read_current_user_ride_booking(
     "/rides/me/{ride_id}/bookings/{booking_id}/approve", response_model=BookingResponse
 )
 async def approve_ride_booking(
+        ride: Ride = Depends(deps.get_current_user_ride),
         booking: Booking = Depends(deps.get_ride_booking),
         session: AsyncSession = Depends(deps.get_session),
 ):
     """Approve incoming ride booking's of the current user"""
-    booking.approved = True
-    booking.approved_at = datetime.now(tz=timezone.utc)
-    await session.commit()
+    approved_at = datetime.now(tz=timezone.utc)
+    query = (
+        update(Booking)
+        .where(Booking.id == booking.id, Booking.approved.is_(False))
+        .values(approved=True, approved_at=approved_at)
+        .returning(Booking.id)
+    )
+    if await session.scalar(query) is not None:
+        seats = booking.seats
+        taken = take_seats(booking.from_stop, booking.to_stop, seats)
+        query = (
+            update(Ride)
+            .where(Ride.id == booking.ride_id, taken["seats_taken"] <= Ride.seats)
+            .values(**taken, version=Ride.version + 1)
+            .add_cte(bump_version(User, booking.passenger_id).cte("passenger_version"))
+            # seats of the ride are not read after, nothing to synchronize
+            .execution_options(synchronize_session=False)
+            .returning(Ride.id)
+        )
+        if await session.scalar(query) is None:
+            await session.rollback()
+            raise HTTPException(
+                status_code=400,
+                detail=f"Not enough free seats: booking seats: {seats}",
+            )
+        await session.commit()
+        await deps.invalidate_ride_searches(
+            [(ride.departure_place_id, ride.arrival_place_id)]
+        )
+        await event_hub.publish(
+            booking_event("approved", booking, approved=True, approved_at=approved_at),
+            [booking.passenger_id, ride.driver_id],
+        )
+    else:
+        await session.commit()
     return booking
 
+
+async def _approve_bookings(
+        session: AsyncSession,
+        ride_id: int,
+        booking_ids: list[int],
+        approved_at: datetime,
+) -> tuple[dict[int, str], list[Row]] | None:
+    """Approves pending bookings of the ride in order while free seats last
+
+    Bookings of any stops count against free seats of the most taken
+    segment, so approvals of multi-stop rides are conservative. Returns
+    outcomes by booking id and rows of approved bookings, None if the ride
+    seats changed concurrently, the transaction is rolled back then.
+    """
+    requested = (
+        func.unnest(literal(booking_ids, ARRAY(Integer)))
+        .table_valued("id", with_ordinality="position")
+        .render_derived(name="requested")
+    )
+    # seats of pending bookings up to each one, in the requested order
+    candidates = (
+        select(
+            Booking.id,
+            Booking.approved,
+            func.sum(case((Booking.approved, 0), else_=Booking.seats))
+            .over(order_by=requested.c.position)
+            .label("needed_seats"),
+        )
+        .join(requested, requested.c.id == Booking.id)
+        .where(Booking.ride_id == ride_id)
+        .cte("candidates")
+    )
+    free_seats = (
+        select(Ride.seats - Ride.seats_taken)
+        .where(Ride.id == ride_id)
+        .scalar_subquery()
+    )
+    approved = (
+        update(Booking)
+        .where(
+            Booking.id == candidates.c.id,
+            candidates.c.approved.is_(False),
+            candidates.c.needed_seats <= free_seats,
+            Booking.approved.is_(False),
+        )
+        .values(approved=True, approved_at=approved_at)
+        .returning(*Booking.__table__.c)
+        .cte("approved")
+    )
+    # free seats above are read from the statement snapshot, the guard is
+    # re-checked on the latest ride row by the UPDATE
+    taken = take_bookings_seats(approved)
+    ride_update = (
+        update(Ride)
+        .where(
+            Ride.id == ride_id,
+            taken["seats_taken"] <= Ride.seats,
+            exists(select(approved.c.id)),
+        )
+        .values(**taken, version=Ride.version + 1)
+        .returning(Ride.id)
+        .cte("ride_update")
+    )
+    passengers_version = (
+        update(User)
+        .where(User.id.in_(select(approved.c.passenger_id)))
+        .values(version=User.version + 1)
+        .cte("passengers_version")
+    )
+    query = (
+        select(
+            candidates.c.id.label("booking_id"),
+            candidates.c.approved.label("was_approved"),
+            *approved.c,
+            select(ride_update.c.id).scalar_subquery().label("ride_updated"),
+        )
+        .select_from(candidates.outerjoin(approved, approved.c.id == candidates.c.id))
+        .add_cte(passengers_version)
+    )
+    rows = (await session.execute(query)).all()
+
+    approved_rows = [row for row in rows if row.id is not None]
+    if approved_rows and approved_rows[0].ride_updated is None:
+        await session.rollback()
+        return None
+    outcomes = dict.fromkeys(booking_ids, "not_found")
+    for row in rows:
+        if row.was_approved:
+            outcomes[row.booking_id] = "already_approved"
+        elif row.id is not None:
+            outcomes[row.booking_id] = "approved"
+        else:
+            outcomes[row.booking_id] = "not_enough_seats"
+    return outcomes, approved_rows
+
+
+async def _reject_bookings(
+        session: AsyncSession, ride_id: int, booking_ids: list[int]
+) -> tuple[dict[int, str], list[Row]]:
+    """Deletes pending bookings of the ride
+
+    Returns outcomes by booking id and rows of rejected bookings.
+    """
+    rejected = (
+        delete(Booking)
+        .where(
+            Booking.id.in_(booking_ids),
+            Booking.ride_id == ride_id,
+            Booking.approved.is_(False),
+        )
+        .returning(*Booking.__table__.c)
+        .cte("rejected")
+    )
+    ride_version = (
+        update(Ride)
+        .where(Ride.id == ride_id, exists(select(rejected.c.id)))
+        .values(version=Ride.version + 1)
+        .cte("ride_version")
+    )
+    passengers_version = (
+        update(User)
+        .where(User.id.in_(select(rejected.c.passenger_id)))
+        .values(version=User.version + 1)
+        .cte("passengers_version")
+    )
+    # booking rows are read from the statement snapshot, before the delete
+    query = (
+        select(
+            Booking.id.label("booking_id"),
+            Booking.approved.label("was_approved"),
+            *rejected.c,
+        )
+        .select_from(Booking.__table__.outerjoin(rejected, rejected.c.id == Booking.id))
+        .where(Booking.id.in_(booking_ids), Booking.ride_id == ride_id)
+        .add_cte(ride_version, passengers_version)
+    )
+    rows = (await session.execute(query)).all()
+
+    outcomes = dict.fromkeys(booking_ids, "not_found")
+    for row in rows:
+        if row.id is not None:
+            outcomes[row.booking_id] = "rejected"
+        elif row.was_approved:
+            outcomes[row.booking_id] = "already_approved"
+    return outcomes, [row for row in rows if row.id is not None]
+
+
+@router.post(
+    "/rides/me/{ride_id}/bookings/batch", response_model=RideBookingsBatchResponse
+)
+async def decide_ride_bookings(
+        batch: RideBookingsBatchRequest = Depends(deps.check_bookings_batch),
+        ride: Ride = Depends(deps.get_current_user_ride),
+        session: AsyncSession = Depends(deps.get_session),
+):
+    """Approve and reject pending bookings of the current user's ride at once
+
+    Bookings are approved in the listed order while free seats last, a
+    booking that does not fit gets `not_enough_seats` and so do all after
+    it. Rejected bookings are deleted. Outcomes are listed in the request
+    order, approvals first.
+    """
+    # ride is expired by rollback of a concurrently changed approval
+    ride_id, driver_id = ride.id, ride.driver_id
+    route = (ride.departure_place_id, ride.arrival_place_id)
+    approved_at = datetime.now(tz=timezone.utc)
+    outcomes: dict[int, str] = {}
+    approved = []
+    if batch.approve:
+        for _ in range(BATCH_APPROVE_ATTEMPTS):
+            approval = await _approve_bookings(
+                session, ride_id, batch.approve, approved_at
+            )
+            if approval is not None:
+                break
+        else:
+            raise HTTPException(
+                status_code=409, detail="Ride seats changed concurrently, retry"
+            )
+        approve_outcomes, approved = approval
+        outcomes.update(approve_outcomes)
+    rejected = []
+    if batch.reject:
+        reject_outcomes, rejected = await _reject_bookings(
+            session, ride_id, batch.reject
+        )
+        outcomes.update(reject_outcomes)
+    await session.commit()
+
+    if approved:
+        await deps.invalidate_ride_searches([route])
+    await event_hub.publish_many(
+        [
+            (booking_event(action, booking), [booking.passenger_id, driver_id])
+            for action, bookings in [("approved", approved), ("rejected", rejected)]
+            for booking in bookings
+        ]
+    )
+    return RideBookingsBatchResponse(
+        results=[
+            BookingBatchOutcomeResponse(booking_id=booking_id, outcome=outcome)
+            for booking_id, outcome in outcomes.items()
+        ]
+    )
+
 # @router.patch("/rides/{ride_id}")
 # async def update_ride(
 #         ride: Ride = Depends(deps.get_user_ride),
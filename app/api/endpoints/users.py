@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import delete, select
+from sqlalchemy import delete, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
-from app.core.security import get_password_hash
-from app.models import User
+from app.core.etag import bump_version
+from app.core.security import get_password_hash_async
+from app.core.segments import take_bookings_seats
+from app.models import User, Ride, Booking
 from app.schemas.requests import (
     UserCreateRequest,
     UserUpdatePasswordRequest,
@@ -32,7 +34,10 @@ async def update_current_user_info(
     """Update current user info"""
     for attr, value in user_info.model_dump(exclude_unset=True).items():
         setattr(current_user, attr, value)
+    if session.is_modified(current_user):
+        await session.execute(bump_version(User, current_user.id))
     await session.commit()
+    await deps.invalidate_cached_user(current_user.id)
     return current_user
 
 
@@ -42,8 +47,51 @@ async def delete_current_user(
     session: AsyncSession = Depends(deps.get_session),
 ):
     """Delete current user"""
+    # user's bookings are removed by cascade, release their approved seats first
+    released_bookings = (
+        select(
+            Booking.ride_id,
+            Booking.from_stop,
+            Booking.to_stop,
+            (-Booking.seats).label("seats"),
+        )
+        .where(Booking.passenger_id == current_user.id, Booking.approved.is_(True))
+        .cte("released_bookings")
+    )
+    released = await session.execute(
+        update(Ride)
+        .where(
+            Ride.id.in_(
+                select(Booking.ride_id).where(Booking.passenger_id == current_user.id)
+            )
+        )
+        .values(**take_bookings_seats(released_bookings), version=Ride.version + 1)
+        .returning(Ride.departure_place_id, Ride.arrival_place_id)
+    )
+    routes = set(released.tuples())
+    # user's rides are removed by cascade too, with bookings of their passengers
+    await session.execute(
+        update(User)
+        .where(
+            User.id.in_(
+                select(Booking.passenger_id)
+                .join(Booking.ride)
+                .where(Ride.driver_id == current_user.id)
+            )
+        )
+        .values(version=User.version + 1)
+    )
+    routes.update(
+        await session.execute(
+            select(Ride.departure_place_id, Ride.arrival_place_id).where(
+                Ride.driver_id == current_user.id
+            )
+        )
+    )
     await session.execute(delete(User).where(User.id == current_user.id))
     await session.commit()
+    await deps.invalidate_cached_user(current_user.id)
+    await deps.invalidate_ride_searches(routes)
 
 
 @router.post("/reset-password", response_model=UserPrivateResponse)
@@ -53,9 +101,12 @@ async def reset_current_user_password(
     current_user: User = Depends(deps.get_current_user),
 ):
     """Update current user password"""
-    current_user.hashed_password = get_password_hash(user_update_password.password)
+    current_user.hashed_password = await get_password_hash_async(
+        user_update_password.password
+    )
     session.add(current_user)
     await session.commit()
+    await deps.invalidate_cached_user(current_user.id)
     return current_user
 
 
@@ -65,19 +116,25 @@ async def register_new_user(
     session: AsyncSession = Depends(deps.get_session),
 ):
     """Create new user"""
+    # hash before the first query, so no connection is held while hashing
+    hashed_password = await get_password_hash_async(new_user.password)
     result = await session.execute(select(User).where(User.email == new_user.email))
     if result.scalars().first() is not None:
         raise HTTPException(status_code=400, detail="Cannot use this email address")
     user = User(
         **new_user.model_dump(exclude_unset=True, exclude={"password"}),
-        hashed_password=get_password_hash(new_user.password)
+        hashed_password=hashed_password
     )
     session.add(user)
     await session.commit()
     return user
 
 
-@router.get("/{user_id}", response_model=UserPublicResponse)
+@router.get(
+    "/{user_id}",
+    response_model=UserPublicResponse,
+    dependencies=[Depends(deps.use_replica)],
+)
 async def read_user_info(user: UserPublicResponse = Depends(deps.get_user_info)):
     """Read related user's information (for user having active ride or user having booking of current_user ride"""
     return user
@@ -0,0 +1,93 @@
+"""
+Consistency check of denormalized `Ride.seats_taken` and `Ride.segments_taken`
+counters.
+
+Compares seats taken on every segment of the ride with sum of seats of
+approved bookings over it, and `Ride.seats_taken` with the most taken
+segment, prints mismatched rides. Run with `--fix` to overwrite broken
+counters with the recomputed values.
+
+python -m app.check_ride_seats [--fix]
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import Integer, func, or_, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from app.core.session import async_session
+from app.models import Booking, Ride
+
+
+async def main(fix: bool = False) -> int:
+    segment = (
+        func.generate_series(1, func.cardinality(Ride.segments_taken))
+        .table_valued("position")
+        .render_derived(name="segment")
+    )
+    # see `app/core/segments.py` for positions of segments
+    approved_seats = (
+        select(func.coalesce(func.sum(Booking.seats), 0).cast(Integer))
+        .where(
+            Booking.ride_id == Ride.id,
+            Booking.approved.is_(True),
+            segment.c.position > Booking.from_stop,
+            segment.c.position <= Booking.to_stop,
+        )
+        .correlate(Ride, segment)
+        .scalar_subquery()
+    )
+    expected_segments_taken = select(
+        func.array_agg(aggregate_order_by(approved_seats, segment.c.position))
+    ).scalar_subquery()
+    expected_seats_taken = (
+        select(func.max(approved_seats)).select_from(segment).scalar_subquery()
+    )
+    query = (
+        select(
+            Ride.id,
+            Ride.seats_taken,
+            Ride.segments_taken,
+            expected_seats_taken,
+            expected_segments_taken,
+        )
+        .where(
+            or_(
+                Ride.seats_taken != expected_seats_taken,
+                Ride.segments_taken != expected_segments_taken,
+            )
+        )
+        .order_by(Ride.id)
+    )
+
+    async with async_session() as session:
+        mismatches = (await session.execute(query)).all()
+        for ride_id, seats_taken, segments_taken, expected, segments in mismatches:
+            print(
+                f"ride {ride_id}: seats_taken={seats_taken} expected={expected} "
+                f"segments_taken={segments_taken} expected={segments}"
+            )
+
+        if fix:
+            for ride_id, _, _, expected, segments in mismatches:
+                await session.execute(
+                    update(Ride)
+                    .where(Ride.id == ride_id)
+                    .values(
+                        seats_taken=expected,
+                        segments_taken=segments,
+                        version=Ride.version + 1,
+                    )
+                )
+            await session.commit()
+
+    print(f"Found {len(mismatches)} inconsistent rides" + (", fixed" if fix else ""))
+    return len(mismatches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fix", action="store_true", help="fix broken counters")
+    args = parser.parse_args()
+    raise SystemExit(1 if asyncio.run(main(fix=args.fix)) and not args.fix else 0)
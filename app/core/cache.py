@@ -0,0 +1,132 @@
+"""
+In-process caches.
+
+Caches live in memory of a single uvicorn worker, so invalidation made by one
+worker is not seen by others, keep TTL short enough to bound staleness.
+`user_cache` and `ride_search_cache` are invalidated in every worker by
+`deps.invalidate_cached_user` and `deps.invalidate_ride_searches`, through
+`event_hub`, TTL only bounds staleness when an event is lost.
+"""
+
+import time
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from typing import Any, Generic, TypeVar
+
+from app.core import config
+from app.core.metrics import CACHE_INVALIDATIONS, CACHE_REQUESTS
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """LRU cache with bounded size and per-entry time to live
+
+    Entries may be tagged on set and invalidated by tag. Every invalidation
+    bumps `generation`, pass the value read before computing an entry to
+    `set` so a result computed concurrently with an invalidation is dropped.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self._tags: dict[Hashable, set[K]] = {}
+        self._key_tags: dict[K, tuple[Hashable, ...]] = {}
+        self._hits_counter = CACHE_REQUESTS.labels(cache=name, result="hit")
+        self._misses_counter = CACHE_REQUESTS.labels(cache=name, result="miss")
+        self._invalidations_counter = CACHE_INVALIDATIONS.labels(cache=name)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                self._remove(key)
+            self.misses += 1
+            self._misses_counter.inc()
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        self._hits_counter.inc()
+        return item[1]
+
+    def set(
+        self,
+        key: K,
+        value: V,
+        tags: Iterable[Hashable] = (),
+        generation: int | None = None,
+    ) -> None:
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        if generation is not None and generation != self.generation:
+            return
+        self._remove(key)
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        tags = tuple(tags)
+        if tags:
+            self._key_tags[key] = tags
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+        while len(self._data) > self.maxsize:
+            self._remove(next(iter(self._data)))
+
+    def _remove(self, key: K) -> None:
+        self._data.pop(key, None)
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    def invalidate(self, key: K) -> None:
+        self.generation += 1
+        self._invalidations_counter.inc()
+        self._remove(key)
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        self.generation += 1
+        self._invalidations_counter.inc()
+        for key in list(self._tags.get(tag, ())):
+            self._remove(key)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._data.clear()
+        self._tags.clear()
+        self._key_tags.clear()
+
+    def stats(self) -> dict[str, Any]:
+        requests = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+        }
+
+
+# column values of authenticated users by id, see `deps.get_current_user`
+user_cache: TTLCache[int, dict[str, Any]] = TTLCache(
+    name="user",
+    maxsize=config.settings.USER_CACHE_MAX_SIZE,
+    ttl=config.settings.USER_CACHE_TTL_SECONDS,
+)
+
+# ride search responses by normalized query, tagged by (departure, arrival)
+# route, see `rides.search_rides`
+ride_search_cache: TTLCache[tuple, Any] = TTLCache(
+    name="ride_search",
+    maxsize=config.settings.RIDE_SEARCH_CACHE_MAX_SIZE,
+    ttl=config.settings.RIDE_SEARCH_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,171 @@
+"""
+Persistence and delivery of ride messages.
+
+Messages sent over WebSocket (`WS /messages/ws`) are written by
+`message_writer` with group commit: a single task takes every message queued
+while the previous transaction was committing and writes them all with one
+multi-row INSERT, one upsert of their `MessageThread` rows and one commit,
+so throughput grows with load instead of being bound by commits per second.
+Each sender awaits its own message future.
+
+Persisted messages are published to the sender and the recipient as
+`message.created` events by `event_hub`, which delivers them to WebSocket
+and SSE streams in every uvicorn worker.
+"""
+
+import asyncio
+import logging
+from collections.abc import Sequence
+
+from sqlalchemy import case, insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.core.events import Event, event_hub
+from app.core.metrics import CHAT_WRITE_BATCH_SIZE
+from app.core.session import async_session
+from app.models import Messages, MessageThread
+from app.schemas.requests import MessageCreateRequest
+from app.schemas.responses import MessageResponse
+
+logger = logging.getLogger(__name__)
+
+
+def message_event(message: Messages) -> tuple[Event, list[int]]:
+    data = MessageResponse.model_validate(message).model_dump(mode="json")
+    return Event("message.created", data), [message.sender_id, message.recipient_id]
+
+
+async def upsert_message_threads(
+    session: AsyncSession, messages: Sequence[Messages]
+) -> None:
+    """Moves threads of both users of messages to their last message
+
+    Threads of recipients get their unread counters incremented.
+    """
+    threads: dict[tuple[int, int, int], dict] = {}
+    for message in sorted(messages, key=lambda message: message.id):
+        for user_id, peer_id, unread in [
+            (message.sender_id, message.recipient_id, 0),
+            (message.recipient_id, message.sender_id, 1),
+        ]:
+            key = (user_id, message.ride_id, peer_id)
+            thread = threads.get(key)
+            if thread is None:
+                thread = threads[key] = {
+                    "user_id": user_id,
+                    "ride_id": message.ride_id,
+                    "peer_id": peer_id,
+                    "unread_count": 0,
+                }
+            thread["last_message_id"] = message.id
+            thread["last_message_at"] = message.created_at
+            thread["unread_count"] += unread
+
+    # one row per thread, an upsert cannot update a row twice; rows are
+    # upserted in key order, so concurrent transactions touching the same
+    # threads lock them in the same order and do not deadlock
+    query = pg_insert(MessageThread).values([threads[key] for key in sorted(threads)])
+    # batches may commit out of order, an older one keeps the last message
+    # of the thread, unread messages are counted anyway
+    newer = query.excluded.last_message_id > MessageThread.last_message_id
+    query = query.on_conflict_do_update(
+        index_elements=[
+            MessageThread.user_id,
+            MessageThread.ride_id,
+            MessageThread.peer_id,
+        ],
+        set_={
+            "last_message_id": case(
+                (newer, query.excluded.last_message_id),
+                else_=MessageThread.last_message_id,
+            ),
+            "last_message_at": case(
+                (newer, query.excluded.last_message_at),
+                else_=MessageThread.last_message_at,
+            ),
+            "unread_count": MessageThread.unread_count + query.excluded.unread_count,
+        },
+    )
+    await session.execute(query)
+
+
+class MessageWriter:
+    def __init__(self, batch_size: int, queue_size: int):
+        self.batch_size = batch_size
+        self._queue: asyncio.Queue[
+            tuple[int, MessageCreateRequest, asyncio.Future]
+        ] = asyncio.Queue(queue_size)
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def submit(
+        self, sender_id: int, message: MessageCreateRequest
+    ) -> asyncio.Future[Messages]:
+        """Queues the message, waits while the queue is full
+
+        Returns the future of the persisted message.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((sender_id, message, future))
+        return future
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            batch = [item for item in batch if not item[2].cancelled()]
+            if batch:
+                CHAT_WRITE_BATCH_SIZE.observe(len(batch))
+                await self._write_batch(batch)
+
+    async def _write_batch(self, batch) -> None:
+        try:
+            messages = await self._write(batch)
+        except Exception as exc:
+            if len(batch) > 1:
+                # e.g. a ride deleted meanwhile, others are written one by one
+                for item in batch:
+                    await self._write_batch([item])
+                return
+            logger.exception("Message is not written")
+            if not batch[0][2].done():
+                batch[0][2].set_exception(exc)
+            return
+
+        for (_, _, future), message in zip(batch, messages):
+            if not future.done():
+                future.set_result(message)
+        await event_hub.publish_many([message_event(m) for m in messages])
+
+    async def _write(self, batch) -> Sequence[Messages]:
+        async with async_session() as session:
+            query = insert(Messages).returning(Messages, sort_by_parameter_order=True)
+            messages = (
+                await session.scalars(
+                    query,
+                    [
+                        {**message.model_dump(), "sender_id": sender_id}
+                        for sender_id, message, _ in batch
+                    ],
+                )
+            ).all()
+            await upsert_message_threads(session, messages)
+            await session.commit()
+            return messages
+
+
+message_writer = MessageWriter(
+    batch_size=config.settings.CHAT_WRITE_BATCH_SIZE,
+    queue_size=config.settings.CHAT_WRITE_QUEUE_SIZE,
+)
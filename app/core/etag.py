@@ -0,0 +1,33 @@
+"""
+Version counters and ETags for conditional GET.
+
+`Ride.version` and `User.version` are bumped in the same transaction as
+changes of responses derived from them, by `bump_version` statements (or
+`version=Model.version + 1` in existing UPDATEs). ETags are built from
+versions only, so `If-None-Match` can be answered with 304 after reading
+a couple of integers, see `deps.check_ride_not_modified` and friends.
+"""
+
+from sqlalchemy import Update, update
+
+from app.models import Ride, User
+
+
+def make_etag(*versions: int) -> str:
+    """Strong ETag of a response built from resources of `versions`"""
+    return '"' + ".".join(map(str, versions)) + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match header check, weak comparison as RFC 9110 requires"""
+    if not if_none_match:
+        return False
+    for raw_tag in if_none_match.split(","):
+        tag = raw_tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def bump_version(model: type[Ride] | type[User], *ids: int) -> Update:
+    return update(model).where(model.id.in_(ids)).values(version=model.version + 1)
@@ -0,0 +1,277 @@
+"""
+Pub/sub of events pushed to users, e.g. booking lifecycle by `GET /events`.
+
+`event_hub.publish(event, user_ids)` delivers an event to streams of the
+users open in any uvicorn worker. Endpoints publish after commit, like they
+invalidate caches. The hub fans events out to subscriber queues of its own
+worker, fan-out across workers is made by the backend:
+
+- `PostgresBackend` sends NOTIFY on a channel, every worker LISTENs on
+  a dedicated asyncpg connection (outside of the pool) and dispatches what
+  it receives, its own events included
+- `LocalBackend` dispatches in-process, for a single worker and tests
+
+Handlers registered by `event_hub.on(type, handler)` are called with data of
+every event of the type in every worker, events published to no users are
+for them only, e.g. invalidations of in-process caches.
+
+Delivery is at most once: events published while a client reconnects or
+while the listening connection is re-established are lost, clients re-read
+the state (cheaply, with ETags) after reconnect.
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from app.core import config
+from app.core.metrics import (
+    EVENT_SUBSCRIBERS,
+    EVENT_SUBSCRIBERS_OVERFLOWED,
+    EVENTS_PUBLISHED,
+)
+from app.models import Booking
+from app.schemas.responses import BookingResponse
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Event:
+    type: str
+    data: dict[str, Any]
+
+    def encode_sse(self) -> str:
+        """Server-Sent Events message"""
+        return f"event: {self.type}\ndata: {json.dumps(self.data)}\n\n"
+
+
+def booking_event(action: str, booking: Booking, **changes: Any) -> Event:
+    """booking.created, .approved, .rejected or .cancelled event
+
+    `changes` are made to the booking by UPDATE statements, not in the object.
+    """
+    data = BookingResponse.model_validate(booking).model_copy(update=changes)
+    return Event(f"booking.{action}", data.model_dump(mode="json"))
+
+
+class Subscription:
+    """Queue of events of a user, None is put when the queue overflows"""
+
+    def __init__(self, user_id: int, maxsize: int):
+        self.user_id = user_id
+        self.overflowed = False
+        # one slot over maxsize is kept for None
+        self._queue: asyncio.Queue[Event | None] = asyncio.Queue(maxsize + 1)
+        self._maxsize = maxsize
+
+    def put(self, event: Event) -> None:
+        if self.overflowed:
+            return
+        if self._queue.qsize() >= self._maxsize:
+            self.overflowed = True
+            EVENT_SUBSCRIBERS_OVERFLOWED.inc()
+            self._queue.put_nowait(None)
+            return
+        self._queue.put_nowait(event)
+
+    async def get(self) -> Event | None:
+        return await self._queue.get()
+
+
+class Backend(Protocol):
+    # max size in bytes of a published message, None is unlimited
+    max_message_size: int | None
+
+    async def start(self, dispatch: Callable[[str], None]) -> None:
+        ...
+
+    async def publish(self, messages: Sequence[str]) -> None:
+        ...
+
+    async def stop(self) -> None:
+        ...
+
+
+class LocalBackend:
+    max_message_size = None
+
+    async def start(self, dispatch: Callable[[str], None]) -> None:
+        self._dispatch = dispatch
+
+    async def publish(self, messages: Sequence[str]) -> None:
+        for message in messages:
+            self._dispatch(message)
+
+    async def stop(self) -> None:
+        pass
+
+
+class PostgresBackend:
+    """Fan-out across workers by Postgres LISTEN/NOTIFY
+
+    NOTIFY payloads are limited to 8000 bytes, events are packed into
+    messages up to `max_message_size`, all sent in one round trip.
+    """
+
+    max_message_size = 7900
+    reconnect_delay_seconds = 1.0
+
+    def __init__(self, database_uri: str, channel: str = "events"):
+        # asyncpg DSN from SQLAlchemy URI
+        self.dsn = make_url(database_uri).set(drivername="postgresql")
+        self.channel = channel
+        self._connection: asyncpg.Connection | None = None
+        self._lock = asyncio.Lock()
+        self._reconnect_task: asyncio.Task | None = None
+        self._stopped = False
+
+    async def start(self, dispatch: Callable[[str], None]) -> None:
+        self._dispatch = dispatch
+        self._stopped = False
+        await self._connect()
+
+    async def _connect(self) -> None:
+        connection = await asyncpg.connect(
+            self.dsn.render_as_string(hide_password=False)
+        )
+        await connection.add_listener(self.channel, self._on_notification)
+        connection.add_termination_listener(self._on_termination)
+        self._connection = connection
+
+    def _on_notification(self, connection, pid, channel, payload: str) -> None:
+        self._dispatch(payload)
+
+    def _on_termination(self, connection) -> None:
+        self._connection = None
+        if not self._stopped:
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        while not self._stopped:
+            await asyncio.sleep(self.reconnect_delay_seconds)
+            try:
+                await self._connect()
+                return
+            except (OSError, asyncpg.PostgresError):
+                logger.warning("Events backend reconnect failed", exc_info=True)
+
+    async def publish(self, messages: Sequence[str]) -> None:
+        # one operation at a time on an asyncpg connection
+        async with self._lock:
+            if self._connection is None:
+                raise ConnectionError("Events backend is not connected")
+            await self._connection.execute(
+                "SELECT pg_notify($1, message) FROM unnest($2::text[]) AS message",
+                self.channel,
+                list(messages),
+            )
+
+    async def stop(self) -> None:
+        self._stopped = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+
+# called with data of events of a type in every worker, see `EventHub.on`
+Handler = Callable[[dict[str, Any]], None]
+
+
+class EventHub:
+    def __init__(self, backend: Backend, queue_size: int):
+        self.backend = backend
+        self.queue_size = queue_size
+        self._subscriptions: dict[int, set[Subscription]] = defaultdict(set)
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+
+    async def start(self) -> None:
+        await self.backend.start(self._dispatch_message)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    def on(self, event_type: str, handler: Handler) -> None:
+        """Calls the handler with data of every event of the type"""
+        self._handlers[event_type].append(handler)
+
+    @contextlib.contextmanager
+    def subscribe(self, user_id: int) -> Iterator[Subscription]:
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions[user_id].add(subscription)
+        EVENT_SUBSCRIBERS.inc()
+        try:
+            yield subscription
+        finally:
+            EVENT_SUBSCRIBERS.dec()
+            subscriptions = self._subscriptions[user_id]
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[user_id]
+
+    async def publish(self, event: Event, user_ids: Iterable[int]) -> None:
+        """Publishes event to users, failures are logged, not raised
+
+        Call it after commit, the change is already made whatever happens
+        to its event.
+        """
+        await self.publish_many([(event, user_ids)])
+
+    async def publish_many(self, events: Sequence[tuple[Event, Iterable[int]]]) -> None:
+        """Publishes events to their users in one backend round trip"""
+        if not events:
+            return
+        # message is a JSON list of events, split by the backend size limit
+        messages = []
+        chunk: list[str] = []
+        chunk_size = 2
+        for event, user_ids in events:
+            EVENTS_PUBLISHED.labels(type=event.type).inc()
+            item = json.dumps(
+                {"type": event.type, "data": event.data, "user_ids": list(user_ids)},
+                ensure_ascii=False,
+            )
+            item_size = len(item.encode()) + 1
+            limit = self.backend.max_message_size
+            if chunk and limit is not None and chunk_size + item_size > limit:
+                messages.append(f"[{','.join(chunk)}]")
+                chunk, chunk_size = [], 2
+            chunk.append(item)
+            chunk_size += item_size
+        if chunk:
+            messages.append(f"[{','.join(chunk)}]")
+
+        try:
+            await self.backend.publish(messages)
+        except Exception:
+            logger.exception("%d events are not published", len(events))
+
+    def _dispatch_message(self, message: str) -> None:
+        for payload in json.loads(message):
+            event = Event(payload["type"], payload["data"])
+            for handler in self._handlers.get(event.type, ()):
+                try:
+                    handler(event.data)
+                except Exception:
+                    logger.exception("%s event handler failed", event.type)
+            for user_id in payload["user_ids"]:
+                for subscription in self._subscriptions.get(user_id, ()):
+                    subscription.put(event)
+
+
+if config.settings.ENVIRONMENT == "PYTEST" or config.settings.EVENTS_BACKEND == "local":
+    _backend: Backend = LocalBackend()
+else:
+    _backend = PostgresBackend(config.settings.DEFAULT_SQLALCHEMY_DATABASE_URI)
+
+event_hub = EventHub(_backend, queue_size=config.settings.EVENTS_QUEUE_SIZE)
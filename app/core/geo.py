@@ -0,0 +1,125 @@
+"""
+Proximity search of ride departure and arrival points on stock Postgres.
+
+Points are stored with their geohash of `GEOHASH_PRECISION` characters in
+a "C" collation column. A geohash is a cell of a grid over the globe, and
+every character adds 5 bits alternating between longitude and latitude, so
+cells sharing a prefix form a bigger cell and a prefix is a contiguous key
+range of the B-tree index.
+
+A search within a radius covers the bounding box of the circle with cells
+of the finest precision that needs at most `MAX_COVER_CELLS` of them, then
+reads every cell by an index range scan and ranks candidates by great
+circle distance. Candidates in the box corners are dropped by distance.
+"""
+
+import math
+
+from sqlalchemy import ColumnElement, and_, func, or_
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# cell of about 150 m x 150 m
+GEOHASH_PRECISION = 7
+MAX_COVER_CELLS = 16
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def _cell_size(precision: int) -> tuple[float, float]:
+    """Height and width of cells of the precision, in degrees"""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** (bits - bits // 2)
+
+
+def encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Geohash of the point"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bit = value = 0
+    # even bits are longitude, the first one included
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(BASE32[value])
+            bit = value = 0
+    return "".join(chars)
+
+
+def cover(lat: float, lon: float, radius_km: float) -> list[str]:
+    """Geohash prefixes of cells covering the circle around the point"""
+    lat_delta = radius_km / KM_PER_DEGREE
+    south, north = max(lat - lat_delta, -90.0), min(lat + lat_delta, 90.0)
+    # the box is widest at the latitude farthest from the equator
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    lon_delta = 180.0 if cos_lat < 1e-9 else radius_km / (KM_PER_DEGREE * cos_lat)
+    if lon_delta >= 180.0:
+        west, east = -180.0, 180.0
+    else:
+        west, east = lon - lon_delta, lon + lon_delta
+
+    cells = [""]
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = _cell_size(precision)
+        rows = range(
+            math.floor((south + 90) / height), math.floor((north + 90) / height) + 1
+        )
+        columns = range(
+            math.floor((west + 180) / width), math.floor((east + 180) / width) + 1
+        )
+        if len(rows) * len(columns) > MAX_COVER_CELLS:
+            break
+        cells = []
+        for row in rows:
+            # cells of the north pole row are the last ones
+            center_lat = min(-90 + (row + 0.5) * height, 90 - height / 2)
+            columns_per_row = round(360 / width)
+            for column in sorted({column % columns_per_row for column in columns}):
+                center_lon = -180 + (column + 0.5) * width
+                cells.append(encode(center_lat, center_lon, precision))
+    return sorted(set(cells))
+
+
+def in_cells(geohash: ColumnElement[str], prefixes: list[str]) -> ColumnElement[bool]:
+    """Geohash is in one of the cells, as index range conditions
+
+    Ranges instead of LIKE, so the index is used by generic plans of
+    prepared statements too.
+    """
+    if prefixes == [""]:
+        return geohash.is_not(None)
+    # "{" follows "z", the last geohash character, in the "C" collation
+    return or_(
+        *(and_(geohash >= prefix, geohash < prefix + "{") for prefix in prefixes)
+    )
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great circle distance by the haversine formula"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def distance_km_sql(
+    lat: ColumnElement[float], lon: ColumnElement[float], to_lat: float, to_lon: float
+) -> ColumnElement[float]:
+    """`distance_km` of the point columns to the point"""
+    to_lat, to_lon = math.radians(to_lat), math.radians(to_lon)
+    lat, lon = func.radians(lat), func.radians(lon)
+    sin_lat = func.sin((lat - to_lat) / 2)
+    sin_lon = func.sin((lon - to_lon) / 2)
+    a = sin_lat * sin_lat + math.cos(to_lat) * func.cos(lat) * sin_lon * sin_lon
+    return 2 * EARTH_RADIUS_KM * func.asin(func.sqrt(func.least(a, 1.0)))
@@ -0,0 +1,96 @@
+"""
+Two-leg itineraries, A→B + B→C connections suggested when there is no
+direct ride from A to C.
+
+Cities are places of `app/core/places.py`. Candidates are read by index
+range scans: first legs departing from A in the requested window
+(`ix_ride_departure_place_id_departure_at`) and second legs from every
+city the first legs reach to C, departing within the layover bounds of
+their arrivals (the route index of direct search).
+
+`join_legs` joins them in memory by time: second legs are grouped by their
+departure city and sorted by departure time once, then every first leg
+takes the band of second legs departing within its layover window by
+binary search. The join costs O((F + S) log S + P) for F first and S second
+legs and P pairs within layover windows, instead of F * S of a cross
+product, and only the best `limit` pairs are kept in a heap.
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Literal, Protocol
+
+
+class Leg(Protocol):
+    id: int
+    departure_place_id: int
+    arrival_place_id: int
+    departure_at: datetime
+    arrival_at: datetime
+    price: int
+
+
+@dataclass(frozen=True)
+class Itinerary:
+    first: Leg
+    second: Leg
+
+    @property
+    def price(self) -> int:
+        return self.first.price + self.second.price
+
+    @property
+    def duration(self) -> timedelta:
+        return self.second.arrival_at - self.first.departure_at
+
+    @property
+    def layover(self) -> timedelta:
+        return self.second.departure_at - self.first.arrival_at
+
+
+def join_legs(
+    first_legs: Iterable[Leg],
+    second_legs: Iterable[Leg],
+    min_layover: timedelta,
+    max_layover: timedelta,
+    limit: int,
+    order_by: Literal["duration", "price"] = "duration",
+) -> list[Itinerary]:
+    """Best `limit` connections of first legs to second legs
+
+    A second leg connects if it departs from the arrival city of the first
+    one within [min_layover, max_layover] after its arrival. Connections are
+    ranked by total duration then price, or by price then duration.
+    """
+    hubs: dict[int, list[Leg]] = defaultdict(list)
+    for leg in second_legs:
+        hubs[leg.departure_place_id].append(leg)
+    departures: dict[int, list[datetime]] = {}
+    for hub, legs in hubs.items():
+        legs.sort(key=lambda leg: leg.departure_at)
+        departures[hub] = [leg.departure_at for leg in legs]
+
+    by_duration = order_by == "duration"
+
+    def pairs() -> Iterator[tuple[tuple, Leg, Leg]]:
+        for first in first_legs:
+            legs = hubs.get(first.arrival_place_id)
+            if legs is None:
+                continue
+            hub_departures = departures[first.arrival_place_id]
+            start = bisect_left(hub_departures, first.arrival_at + min_layover)
+            end = bisect_right(hub_departures, first.arrival_at + max_layover)
+            for i in range(start, end):
+                second = legs[i]
+                duration = second.arrival_at - first.departure_at
+                price = first.price + second.price
+                rank = (duration, price) if by_duration else (price, duration)
+                # ids make the order total and ties deterministic
+                yield (*rank, first.id, second.id), first, second
+
+    best = heapq.nsmallest(limit, pairs(), key=lambda pair: pair[0])
+    return [Itinerary(first, second) for _, first, second in best]
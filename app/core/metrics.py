@@ -0,0 +1,225 @@
+"""
+Prometheus metrics of HTTP requests and SQL queries made while serving them.
+
+SQL queries are counted with SQLAlchemy engine events into per-request stats
+kept in a context variable, `MetricsMiddleware` observes them per route
+template (e.g. `/rides/{ride_id}`) when the response is sent.
+
+Connection pool checkout time and saturation (checked out connections to
+pool size plus max overflow) are published by `InstrumentedQueuePool`.
+
+With several uvicorn workers set PROMETHEUS_MULTIPROC_DIR env variable to an
+empty writable directory, workers then write metrics to files there and
+`/metrics` served by any worker aggregates all of them.
+See https://prometheus.github.io/client_python/multiprocess/
+"""
+
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.multiprocess import MultiProcessCollector
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Total time of HTTP request processing",
+    ["method", "route"],
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "Number of SQL queries made during HTTP request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50, 100),
+)
+REQUEST_DB_DURATION = Histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL queries during HTTP request",
+    ["method", "route"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests",
+    "In-process cache lookups",
+    ["cache", "result"],
+)
+CACHE_INVALIDATIONS = Counter(
+    "cache_invalidations",
+    "In-process cache entries or tags invalidations",
+    ["cache"],
+)
+EVENT_SUBSCRIBERS = Gauge(
+    "event_subscribers",
+    "Open event streams",
+    multiprocess_mode="livesum",
+)
+EVENTS_PUBLISHED = Counter(
+    "events_published",
+    "Events published to users, by type",
+    ["type"],
+)
+EVENT_SUBSCRIBERS_OVERFLOWED = Counter(
+    "event_subscribers_overflowed",
+    "Event streams closed because the client did not keep up",
+)
+CHAT_WRITE_BATCH_SIZE = Histogram(
+    "chat_write_batch_size",
+    "Messages written by one group commit",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500),
+)
+SINGLE_FLIGHT_CALLS = Counter(
+    "single_flight_calls",
+    "Calls of single flight functions, run by the leader or shared in flight",
+    ["function", "result"],
+)
+DB_POOL_CHECKOUT_DURATION = Histogram(
+    "db_pool_checkout_duration_seconds",
+    "Time to check out a connection from the pool, waiting for a free one"
+    " and pre-ping included",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts",
+    "Connection checkouts failed after waiting pool timeout",
+    ["pool"],
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Connections checked out from the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_SATURATION = Gauge(
+    "db_pool_saturation",
+    "Checked out connections to pool size plus max overflow,"
+    " of the most saturated worker",
+    ["pool"],
+    multiprocess_mode="livemax",
+)
+
+
+@dataclass
+class RequestStats:
+    db_queries: int = 0
+    db_duration: float = 0.0
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool publishing checkout time and saturation
+
+    Metrics are labeled with `pool_logging_name` engine argument.
+    """
+
+    def __init__(self, creator, pool_size: int = 5, max_overflow: int = 10, **kw):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kw)
+        # with unlimited overflow (-1) checkouts never wait, saturation
+        # is relative to the pool size then
+        self.capacity = pool_size + max(max_overflow, 0)
+        labels = {"pool": self.logging_name or "default"}
+        self._checkout_duration = DB_POOL_CHECKOUT_DURATION.labels(**labels)
+        self._timeouts = DB_POOL_TIMEOUTS.labels(**labels)
+        self._checked_out = DB_POOL_CHECKED_OUT.labels(**labels)
+        self._saturation = DB_POOL_SATURATION.labels(**labels)
+
+    def connect(self) -> PoolProxiedConnection:
+        started_at = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self._timeouts.inc()
+            raise
+        finally:
+            self._checkout_duration.observe(time.perf_counter() - started_at)
+        self.observe_usage()
+        return connection
+
+    def observe_usage(self, returning: int = 0) -> None:
+        checked_out = self.checkedout() - returning
+        self._checked_out.set(checked_out)
+        if self.capacity:
+            self._saturation.set(checked_out / self.capacity)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Counts queries and their time into stats of the current request"""
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        # engine pool is replaced on dispose, event listeners are kept
+        pool = engine.sync_engine.pool
+        if isinstance(pool, InstrumentedQueuePool):
+            # checkin is dispatched before the connection is back in the pool
+            pool.observe_usage(returning=1)
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        started_at = conn.info["query_started_at"].pop()
+        stats = request_stats.get()
+        if stats is not None:
+            stats.db_queries += 1
+            stats.db_duration += time.perf_counter() - started_at
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None:
+            started = context.connection.info.get("query_started_at")
+            if started:
+                started.pop()
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            duration = time.perf_counter() - started_at
+            request_stats.reset(token)
+            # route is put into scope by router on match, use template
+            # instead of the raw path to keep labels cardinality bounded
+            route = scope.get("route")
+            labels = (scope["method"], getattr(route, "path", "<unmatched>"))
+            REQUEST_DURATION.labels(*labels).observe(duration)
+            REQUEST_DB_QUERIES.labels(*labels).observe(stats.db_queries)
+            REQUEST_DB_DURATION.labels(*labels).observe(stats.db_duration)
+
+
+def generate_metrics() -> tuple[bytes, str]:
+    """Returns metrics in Prometheus text format and its content type"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
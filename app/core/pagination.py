@@ -0,0 +1,51 @@
+"""
+Keyset pagination cursors.
+
+Cursor is an urlsafe base64 encoded json list of the sort key values of the
+last returned row. Clients must treat it as an opaque string and only pass
+back what was received in `next_cursor`.
+"""
+
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encodes sort key values of the last row into opaque cursor string"""
+    raw = json.dumps(
+        [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> tuple[Any, ...]:
+    """Decodes cursor string back into sort key values of given types
+
+    Raises ValueError if cursor is malformed or does not match given types.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError):
+        raise ValueError("Malformed cursor")
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError("Malformed cursor")
+
+    decoded = []
+    for raw_value, type_ in zip(values, types):
+        value = raw_value
+        if type_ is datetime and isinstance(raw_value, str):
+            value = datetime.fromisoformat(raw_value)
+        if not isinstance(value, type_) or isinstance(value, bool):
+            raise ValueError("Malformed cursor")
+        decoded.append(value)
+    return tuple(decoded)
@@ -0,0 +1,290 @@
+"""
+Dictionary of places, canonical ids of ride departure and arrival names.
+
+Names are normalized (`normalize_place`), so "Москва", "москва " and
+"МОСКВА" are one name, and every normalized name in `place_name` table
+points to a place: its first spelling or an alias in another language added
+by `python -m app.place_alias`. Rides store place ids and are searched by
+them.
+
+Every worker keeps the dictionary in memory, `place_index`, to resolve
+names of rides and searches and to suggest places by prefix without
+database queries. It is loaded at startup and then synced incrementally
+with names added since the last sync every PLACES_SYNC_SECONDS, places
+created by the worker itself are added at once.
+"""
+
+import asyncio
+import bisect
+import heapq
+import logging
+import re
+import unicodedata
+from collections.abc import Iterable, Iterator
+
+from sqlalchemy import literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.core.session import async_session
+from app.models import Place, PlaceName
+
+logger = logging.getLogger(__name__)
+
+# names re-read by every sync, ids are taken in transaction start order,
+# so rows may be committed out of id order
+SYNC_OVERLAP = 100
+# completions kept in every trie node, suggestions of different names of
+# the same place are merged, so a few more than a response has
+TOP_SIZE = 16
+
+
+def normalize_place(name: str) -> str:
+    """Case, whitespace and punctuation insensitive form of the name"""
+    name = unicodedata.normalize("NFKC", name).casefold().replace("ё", "е")
+    return " ".join(re.split(r"[\W_]+", name)).strip()
+
+
+def max_typos(query: str) -> int:
+    """Typos tolerated in a prefix, none in short ones"""
+    if len(query) < 4:
+        return 0
+    return 1 if len(query) < 8 else 2
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        # best completions below the node, (len, name, place id) sorted
+        self.top: list[tuple[int, str, int]] = []
+
+
+def _with_edits(edits: int, top: list[tuple]) -> Iterator[tuple]:
+    for item in top:
+        yield edits, *item
+
+
+class PlaceTrie:
+    """Prefix trie of normalized names, shorter names complete first
+
+    Every node keeps its best completions, so a prefix is completed in
+    O(len(prefix)) and a prefix with typos in time of the trie nodes within
+    the edit distance of it.
+    """
+
+    def __init__(self):
+        self._root = _Node()
+
+    def insert(self, name: str, place_id: int) -> None:
+        """Adds the name or moves it to another place"""
+        entry = (len(name), name, place_id)
+        node = self._root
+        for char in name:
+            node = node.children.setdefault(char, _Node())
+            node.top = [item for item in node.top if item[1] != name]
+            bisect.insort(node.top, entry)
+            del node.top[TOP_SIZE:]
+
+    def suggest(self, query: str, typos: int, limit: int) -> list[tuple[int, str, int]]:
+        """Completions of names within `typos` edits of a prefix of them
+
+        The first character is never a typo, as in most autocompletes, it
+        saves searching every subtree of the root. Returns (edits, name,
+        place id) of names of up to `limit` different places, fewest edits
+        and then shorter names first.
+        """
+        first = self._root.children.get(query[:1])
+        if first is None:
+            return []
+        rest = query[1:]
+        size = len(query)
+        # distances over `typos` are all the same to the search
+        over = typos + 1
+        # completions of nodes within `typos` edits of the query
+        matches = []
+        # row[i] is the Levenshtein distance of query[1:i + 1] to the node
+        # path after the first character, a branch is cut when all of the
+        # row is over. Cells further than `typos` from the diagonal are
+        # over, only the band around it is computed.
+        stack = [(first, 0, [min(i, over) for i in range(size)])]
+        while stack:
+            node, depth, row = stack.pop()
+            edits = row[-1]
+            if edits <= typos:
+                matches.append((edits, node.top))
+                if edits == 0:
+                    # completions below are in the top of the node already
+                    continue
+            depth += 1
+            low, high = max(1, depth - typos), min(size - 1, depth + typos)
+            for char, child in node.children.items():
+                child_row = [over] * size
+                left = child_row[0] = min(depth, over)
+                lowest = left
+                if low > 1:
+                    left = over
+                for i in range(low, high + 1):
+                    cost = row[i - 1] if rest[i - 1] == char else row[i - 1] + 1
+                    if row[i] + 1 < cost:
+                        cost = row[i] + 1
+                    if left + 1 < cost:
+                        cost = left + 1
+                    if cost > over:
+                        cost = over
+                    child_row[i] = left = cost
+                    if cost < lowest:
+                        lowest = cost
+                if lowest <= typos:
+                    stack.append((child, depth, child_row))
+
+        # tops are sorted, merged lazily only as far as the limit, a name
+        # of several matched nodes is taken with the fewest edits
+        completions = []
+        names, places = set(), set()
+        for edits, length, name, place_id in heapq.merge(
+            *(_with_edits(edits, top) for edits, top in matches)
+        ):
+            if name in names:
+                continue
+            names.add(name)
+            if place_id not in places:
+                places.add(place_id)
+                completions.append((edits, name, place_id))
+                if len(completions) == limit:
+                    break
+        return completions
+
+
+class PlaceIndex:
+    def __init__(self, sync_interval: float):
+        self.sync_interval = sync_interval
+        self._ids: dict[str, int] = {}
+        self._names: dict[int, str] = {}
+        self._trie = PlaceTrie()
+        self._synced_id = 0
+        self._task: asyncio.Task | None = None
+
+    def clear(self) -> None:
+        self._ids.clear()
+        self._names.clear()
+        self._trie = PlaceTrie()
+        self._synced_id = 0
+
+    def _add(self, normalized: str, place_id: int, name: str) -> None:
+        self._ids[normalized] = place_id
+        self._names[place_id] = name
+        self._trie.insert(normalized, place_id)
+
+    async def sync(self, session: AsyncSession) -> None:
+        """Loads names added since the last sync"""
+        query = (
+            select(PlaceName.id, PlaceName.normalized, Place.id, Place.name)
+            .join(Place, Place.id == PlaceName.place_id)
+            .where(PlaceName.id > self._synced_id - SYNC_OVERLAP)
+            .order_by(PlaceName.id)
+        )
+        for name_id, normalized, place_id, name in await session.execute(query):
+            self._add(normalized, place_id, name)
+            self._synced_id = max(self._synced_id, name_id)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                async with async_session() as session:
+                    await self.sync(session)
+            except Exception:
+                logger.exception("Places sync failed")
+
+    async def start(self) -> None:
+        async with async_session() as session:
+            await self.sync(session)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def lookup(self, session: AsyncSession, name: str) -> int | None:
+        """Place id of the name, from the database if the worker has no such"""
+        normalized = normalize_place(name)
+        place_id = self._ids.get(normalized)
+        if place_id is None:
+            # added by another worker since the last sync, or no such place
+            query = (
+                select(Place.id, Place.name)
+                .join(PlaceName, PlaceName.place_id == Place.id)
+                .where(PlaceName.normalized == normalized)
+            )
+            place = (await session.execute(query)).first()
+            if place is not None:
+                place_id = place.id
+                self._add(normalized, place.id, place.name)
+        return place_id
+
+    async def get_or_create(self, names: Iterable[str]) -> dict[str, int]:
+        """Place ids of names, places of new names are created
+
+        New places are committed by a session of their own at once, so other
+        requests may use them before the caller commits, an unused place is
+        harmless.
+        """
+        ids = {name: self._ids.get(normalize_place(name)) for name in names}
+        # the first spelling of a new place is its name
+        missing = {}
+        for name, place_id in ids.items():
+            if place_id is None:
+                missing.setdefault(normalize_place(name), " ".join(name.split()))
+        if missing:
+            async with async_session() as session:
+                for normalized, name in missing.items():
+                    # a place created concurrently with the same name is left
+                    # without names, the name points to one of them
+                    place = insert(Place).values(name=name).returning(Place.id).cte()
+                    await session.execute(
+                        insert(PlaceName)
+                        .from_select(
+                            ["normalized", "place_id"],
+                            select(literal(normalized), place.c.id),
+                        )
+                        .on_conflict_do_nothing(index_elements=["normalized"])
+                    )
+                await session.commit()
+                await self.sync(session)
+                # names of conflicts committed out of id order below the
+                # synced window are not picked up by the sync
+                unsynced = [name for name in missing if name not in self._ids]
+                if unsynced:
+                    query = (
+                        select(PlaceName.normalized, Place.id, Place.name)
+                        .join(Place, Place.id == PlaceName.place_id)
+                        .where(PlaceName.normalized.in_(unsynced))
+                    )
+                    for normalized, place_id, name in await session.execute(query):
+                        self._add(normalized, place_id, name)
+            ids = {name: self._ids[normalize_place(name)] for name in ids}
+        return ids
+
+    def suggest(self, query: str, limit: int) -> list[tuple[int, str]]:
+        """Places of names starting with the query, typos tolerated
+
+        Returns (place id, place name) of different places, best first.
+        """
+        query = normalize_place(query)
+        if not query:
+            return []
+        # a prefix of known names is not a typo, typos are looked for only
+        # if nothing completes it, as few of them as complete it
+        for typos in range(max_typos(query) + 1):
+            completions = self._trie.suggest(query, typos, limit)
+            if completions:
+                break
+        return [(place_id, self._names[place_id]) for _, _, place_id in completions]
+
+
+place_index = PlaceIndex(config.settings.PLACES_SYNC_SECONDS)
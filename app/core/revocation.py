@@ -0,0 +1,168 @@
+"""
+Revoked JWT tokens (logout and refresh token rotation).
+
+Authoritative list of revoked token ids (`jti` claim) is `revoked_token` table.
+Every worker keeps a Bloom filter of it in memory, so on the hot auth path
+a token is looked up in the database only when the filter says it may be
+revoked. Filter is synced with the table at most once per
+TOKEN_REVOCATION_SYNC_SECONDS, this is the delay before a token revoked
+by one worker is rejected by the others. Syncs on the auth path only read
+new rows, a full filter is rebuilt in the background.
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import config
+from app.core.session import async_session
+from app.models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# overlap of incremental syncs, revoked_at is a transaction start time,
+# so rows may be committed out of revoked_at order
+SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class BloomFilter:
+    """Compact set of strings with no false negatives"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        added = False
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                self.bits[byte] |= 1 << bit
+                added = True
+        if added:
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        for position in self._positions(key):
+            byte, bit = divmod(position, 8)
+            if not self.bits[byte] & (1 << bit):
+                return False
+        return True
+
+
+class RevokedTokens:
+    def __init__(self, capacity: int, error_rate: float, sync_interval: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.filter = BloomFilter(capacity, error_rate)
+        self._synced_at = -math.inf
+        self._synced_until: datetime | None = None
+        self._rebuild: asyncio.Task | None = None
+
+    async def _read(
+        self, session: AsyncSession, since: datetime | None
+    ) -> list[tuple[str, datetime]]:
+        """Not yet expired tokens revoked since the time, all of them if None"""
+        query = (
+            select(RevokedToken.jti, RevokedToken.revoked_at)
+            .where(RevokedToken.expires_at > datetime.now(tz=timezone.utc))
+            .execution_options(use_primary=True)
+        )
+        if since is not None:
+            query = query.where(RevokedToken.revoked_at > since - SYNC_OVERLAP)
+        return (await session.execute(query)).tuples().all()
+
+    async def sync(self, session: AsyncSession) -> None:
+        """Loads tokens revoked since the last sync into the filter"""
+        if time.monotonic() - self._synced_at < self.sync_interval:
+            return
+        self._synced_at = time.monotonic()
+
+        if self.filter.count >= self.capacity and self._rebuild is None:
+            self._rebuild = asyncio.create_task(self.rebuild())
+        for jti, revoked_at in await self._read(session, self._synced_until):
+            self.filter.add(jti)
+            if self._synced_until is None or revoked_at > self._synced_until:
+                self._synced_until = revoked_at
+
+    async def rebuild(self) -> None:
+        """Replaces the filter with one of not yet expired tokens
+
+        Bloom filter cannot forget, expired tokens are deleted and the rest
+        are loaded into a new filter, in a session of its own. Tokens revoked
+        meanwhile are loaded by the next sync.
+        """
+        try:
+            async with async_session() as session:
+                await session.execute(
+                    delete(RevokedToken).where(
+                        RevokedToken.expires_at < datetime.now(tz=timezone.utc)
+                    )
+                )
+                await session.commit()
+                revoked = await self._read(session, None)
+            bloom_filter = BloomFilter(self.capacity, self.error_rate)
+            synced_until = None
+            for jti, revoked_at in revoked:
+                bloom_filter.add(jti)
+                if synced_until is None or revoked_at > synced_until:
+                    synced_until = revoked_at
+            self.filter, self._synced_until = bloom_filter, synced_until
+        except Exception:
+            logger.exception("Revoked tokens filter rebuild failed")
+        finally:
+            self._rebuild = None
+
+    async def is_revoked(self, session: AsyncSession, jti: str | None) -> bool:
+        """Checks token in the filter and only on a hit in the database"""
+        if jti is None or jti not in self.filter:
+            return False
+        query = (
+            select(RevokedToken.jti)
+            .where(RevokedToken.jti == jti)
+            .execution_options(use_primary=True)
+        )
+        return await session.scalar(query) is not None
+
+    async def revoke(self, session: AsyncSession, jti: str, expires_at: int) -> bool:
+        """Adds token to revoked ones, returns False if it was already revoked
+
+        Caller is responsible for the session commit.
+        """
+        query = (
+            insert(RevokedToken)
+            .values(
+                jti=jti,
+                expires_at=datetime.fromtimestamp(expires_at, tz=timezone.utc),
+            )
+            .on_conflict_do_nothing()
+            .returning(RevokedToken.jti)
+        )
+        revoked = await session.scalar(query) is not None
+        self.filter.add(jti)
+        return revoked
+
+
+revoked_tokens = RevokedTokens(
+    capacity=config.settings.TOKEN_REVOCATION_FILTER_CAPACITY,
+    error_rate=config.settings.TOKEN_REVOCATION_FILTER_ERROR_RATE,
+    sync_interval=config.settings.TOKEN_REVOCATION_SYNC_SECONDS,
+)
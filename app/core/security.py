@@ -1,8 +1,14 @@
 """Black-box security shortcuts to generate JWT tokens and password hashing and verifcation."""
 
+import asyncio
+import secrets
 import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import TypeVar
 
 import jwt
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 from pydantic import BaseModel
 
@@ -24,6 +30,8 @@ class JWTTokenPayload(BaseModel):
     refresh: bool
     issued_at: int
     expires_at: int
+    # unique token id used for revocation, absent in tokens issued before it
+    jti: str | None = None
 
 
 def create_jwt_token(subject: str | int, exp_secs: int, refresh: bool):
@@ -43,6 +51,7 @@ def create_jwt_token(subject: str | int, exp_secs: int, refresh: bool):
         "expires_at": expires_at,
         "sub": subject,
         "refresh": refresh,
+        "jti": secrets.token_hex(16),
     }
     encoded_jwt = jwt.encode(
         to_encode,
@@ -87,3 +96,65 @@ def get_password_hash(password: str) -> str:
     It takes about 0.3s for default 12 rounds of SECURITY_BCRYPT_DEFAULT_ROUNDS.
     """
     return PWD_CONTEXT.hash(password)
+
+
+T = TypeVar("T")
+
+
+class PasswordPool:
+    """Pool for bcrypt calls, one per uvicorn worker process
+
+    Created lazily on the first call, and bounded: calls over its workers
+    and queue size are rejected rather than queued.
+    """
+
+    def __init__(self):
+        self._executor: Executor | None = None
+        self.in_flight = 0
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            workers = config.settings.SECURITY_PASSWORD_HASH_WORKERS
+            if config.settings.SECURITY_PASSWORD_HASH_EXECUTOR == "process":
+                self._executor = ProcessPoolExecutor(max_workers=workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """Runs blocking bcrypt function without blocking event loop
+
+        Raises 503 HTTPException if all pool workers are busy and queue is full.
+        """
+        max_in_flight = (
+            config.settings.SECURITY_PASSWORD_HASH_WORKERS
+            + config.settings.SECURITY_PASSWORD_HASH_QUEUE_SIZE
+        )
+        if self.in_flight >= max_in_flight:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, try again later",
+            )
+
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self.in_flight -= 1
+
+
+password_pool = PasswordPool()
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Non-blocking `verify_password` for async handlers"""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Non-blocking `get_password_hash` for async handlers"""
+    return await password_pool.run(get_password_hash, password)
@@ -0,0 +1,78 @@
+"""
+Seats of multi-stop rides, taken per segment between consecutive stops.
+
+Stops of a ride are numbered from 0 (departure) to len(stops) + 1 (arrival),
+segment i runs from stop i to stop i + 1. A booking from stop i to stop j
+takes its seats on segments i..j-1. `Ride.segments_taken` keeps seats taken
+on every segment in an integer array in the ride row, and `Ride.seats_taken`
+the most taken segment, which is what a booking of the whole route needs,
+so search and `Ride.free_seats` work for multi-stop rides as they are.
+
+Both are changed by a single UPDATE of the ride with expressions below,
+reservations guard the new `seats_taken` against `Ride.seats` in the same
+statement, the ride row lock makes concurrent reservations of overlapping
+segments serial and the loser re-checks the guard on the committed array.
+Free seats between two stops of a loaded ride are `Ride.seats` less the max
+of its slice of `segments_taken`, rides have a handful of stops.
+"""
+
+from collections.abc import Callable
+
+from sqlalchemy import ColumnElement, FromClause, Integer, and_, case, func, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+from app.models import Ride
+
+
+def _taken(
+    added: Callable[[ColumnElement[int]], ColumnElement[int]]
+) -> dict[str, ColumnElement]:
+    # segment positions are 1-based, segment i of a booking is position i + 1
+    segment = (
+        func.unnest(Ride.segments_taken)
+        .table_valued("seats", with_ordinality="position")
+        .render_derived(name="segment")
+    )
+    seats = segment.c.seats + added(segment.c.position)
+    return {
+        "segments_taken": select(
+            func.array_agg(aggregate_order_by(seats, segment.c.position))
+        ).scalar_subquery(),
+        "seats_taken": select(func.max(seats)).scalar_subquery(),
+    }
+
+
+def take_seats(
+    from_stop: ColumnElement[int] | int,
+    to_stop: ColumnElement[int] | int,
+    seats: ColumnElement[int] | int,
+) -> dict[str, ColumnElement]:
+    """`Ride` values with seats taken from stop to stop, negative release
+
+    Guard reservations with `values["seats_taken"] <= Ride.seats`.
+    """
+    return _taken(
+        lambda position: case(
+            (and_(position > from_stop, position <= to_stop), seats), else_=0
+        )
+    )
+
+
+def take_bookings_seats(bookings: FromClause) -> dict[str, ColumnElement]:
+    """`Ride` values with seats of rows of bookings of the ride taken
+
+    Rows have `ride_id`, `from_stop`, `to_stop` and `seats` columns, negative
+    seats release.
+    """
+    return _taken(
+        lambda position: select(
+            func.coalesce(func.sum(bookings.c.seats), 0).cast(Integer)
+        )
+        .where(
+            bookings.c.ride_id == Ride.id,
+            position > bookings.c.from_stop,
+            position <= bookings.c.to_stop,
+        )
+        .correlate(Ride, position.table)
+        .scalar_subquery()
+    )
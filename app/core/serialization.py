@@ -0,0 +1,201 @@
+"""
+Fast JSON rendering of response models.
+
+By default FastAPI validates an endpoint result against `response_model`,
+dumps the validated models to JSON compatible python objects calling
+`json_encoders` of `CustomModel` for every datetime and `JSONResponse`
+encodes them with `json`. For long lists of ORM objects validation
+and datetime formatting dominate the request time.
+
+`dump_json` builds JSON types straight from the objects by a plan compiled
+once per response type from model annotations: attribute values are read
+from instance `__dict__` (loaded ORM columns and relationships), objects
+shared by several rows (e.g. the passenger of all current user bookings)
+are built once, and datetimes are formatted in bulk at the end, once per
+distinct value, with the same `convert_datetime_to_gmt`. Nothing is
+validated, so use it only for content already of the model field types,
+as ORM objects are. Output is byte for byte the same as the default one.
+
+Endpoints opt in by returning `FastJSONResponse`, FastAPI sends Response
+instances as is, `response_model` of the route is still used for docs:
+
+    return FastJSONResponse(bookings, list[BookingDetailedResponse])
+"""
+
+import enum
+import functools
+import json
+import types
+import typing
+from collections.abc import Callable, Mapping
+from datetime import date, datetime
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse
+
+from app.schemas.base import convert_datetime_to_gmt
+
+# same options as `JSONResponse.render`
+_json_encoder = json.JSONEncoder(
+    ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+)
+
+
+class _DumpContext:
+    def __init__(self):
+        # (container, key, value) of datetimes to format in bulk
+        self.datetimes: list[tuple[dict, str, datetime]] = []
+        # built dicts by (object id, model), objects are alive during dump
+        self.built: dict[tuple[int, type], dict] = {}
+
+    def format_datetimes(self) -> None:
+        formatted: dict[tuple[datetime, Any], str] = {}
+        for container, key, value in self.datetimes:
+            # equal datetimes in different time zones are formatted differently
+            cache_key = (value, value.tzinfo)
+            text = formatted.get(cache_key)
+            if text is None:
+                text = formatted[cache_key] = convert_datetime_to_gmt(value)
+            container[key] = text
+
+
+Builder = Callable[[Any, _DumpContext], Any]
+
+
+def _convert_any(value: Any, ctx: _DumpContext) -> Any:
+    if isinstance(value, dict):
+        return {key: _convert_any(item, ctx) for key, item in value.items()}
+    if isinstance(value, list | tuple):
+        return [_convert_any(item, ctx) for item in value]
+    if isinstance(value, datetime):
+        return convert_datetime_to_gmt(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return _convert_any(value.value, ctx)
+    return value
+
+
+def _optional_args(annotation: Any) -> list[Any] | None:
+    """Non None arguments of Union annotation, None if it is not Union"""
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union or origin is types.UnionType:
+        return [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    return None
+
+
+def _is_datetime(annotation: Any) -> bool:
+    args = _optional_args(annotation)
+    if args is not None:
+        return len(args) == 1 and _is_datetime(args[0])
+    return isinstance(annotation, type) and issubclass(annotation, datetime)
+
+
+def _model_builder(model: type[BaseModel]) -> Builder:
+    fields = [
+        (
+            field.alias or name,
+            name,
+            _is_datetime(field.annotation),
+            _compile(field.annotation),
+            field,
+        )
+        for name, field in model.model_fields.items()
+    ]
+
+    def build(obj: Any, ctx: _DumpContext) -> dict:
+        built_key = (id(obj), model)
+        data = ctx.built.get(built_key)
+        if data is not None:
+            return data
+
+        values = obj if isinstance(obj, dict) else getattr(obj, "__dict__", {})
+        data = {}
+        for key, name, is_datetime, builder, field in fields:
+            if name in values:
+                value = values[name]
+            else:
+                try:
+                    # not loaded columns, properties like `Ride.free_seats`
+                    value = getattr(obj, name)
+                except AttributeError:
+                    if field.is_required():
+                        raise
+                    value = field.get_default(call_default_factory=True)
+            if is_datetime:
+                if value is not None:
+                    ctx.datetimes.append((data, key, value))
+            elif builder is not None:
+                value = builder(value, ctx)
+            data[key] = value
+        ctx.built[built_key] = data
+        return data
+
+    return build
+
+
+def _compile(annotation: Any) -> Builder | None:
+    """Builder of JSON types from `annotation` typed value
+
+    None means the value is already of JSON types.
+    """
+    args = _optional_args(annotation)
+    if args is not None:
+        if len(args) != 1:
+            return _convert_any
+        builder = _compile(args[0])
+        if builder is None:
+            return None
+        return lambda value, ctx: None if value is None else builder(value, ctx)
+
+    origin = typing.get_origin(annotation)
+    if origin is list:
+        (item_annotation,) = typing.get_args(annotation)
+        builder = _compile(item_annotation)
+        if builder is None:
+            return None
+        return lambda value, ctx: [builder(item, ctx) for item in value]
+    if origin is typing.Literal:
+        return None
+    if origin is not None or not isinstance(annotation, type):
+        return _convert_any
+    if issubclass(annotation, BaseModel):
+        return _model_builder(annotation)
+    if issubclass(annotation, bool | int | str):
+        return None
+    if issubclass(annotation, float):
+        # pydantic validates ints of float fields to floats, e.g. 5 -> 5.0
+        return lambda value, ctx: float(value)
+    return _convert_any
+
+
+_compile_cached = functools.cache(_compile)
+
+
+def dump_json(annotation: Any, content: Any) -> bytes:
+    """Returns JSON of content (ORM objects too) as `annotation` type"""
+    builder = _compile_cached(annotation)
+    ctx = _DumpContext()
+    data = content if builder is None else builder(content, ctx)
+    ctx.format_datetimes()
+    return _json_encoder.encode(data).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered by `dump_json` for `model` type"""
+
+    def __init__(
+        self,
+        content: Any,
+        model: Any,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        background: BackgroundTask | None = None,
+    ):
+        self.model = model
+        super().__init__(content, status_code, headers, background=background)
+
+    def render(self, content: Any) -> bytes:
+        return dump_json(self.model, content)
@@ -2,17 +2,123 @@
 SQLAlchemy async engine and sessions tools
 
 https://docs.sqlalchemy.org/en/20/orm/extensions/asyncio.html
+
+Reads of read-only endpoints may be served by replicas from
+DEFAULT_DATABASE_REPLICA_URIS, see `RoutingSession`. To try it locally
+without a second Postgres put the primary URI there, two engines
+on one database stand in for primary and replica.
 """
 
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+import random
+
+from sqlalchemy import Select, event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
 
 from app.core import config
+from app.core.cache import TTLCache
+from app.core.metrics import InstrumentedQueuePool, instrument_engine
 
 if config.settings.ENVIRONMENT == "PYTEST":
     sqlalchemy_database_uri = config.settings.TEST_SQLALCHEMY_DATABASE_URI
+    replica_database_uris = []
 else:
     sqlalchemy_database_uri = config.settings.DEFAULT_SQLALCHEMY_DATABASE_URI
+    replica_database_uris = config.settings.DEFAULT_DATABASE_REPLICA_URIS
+
+
+def create_engine(uri: str, name: str) -> AsyncEngine:
+    engine = create_async_engine(
+        uri,
+        poolclass=InstrumentedQueuePool,
+        # pool metrics are labeled by it
+        pool_logging_name=name,
+        pool_size=config.settings.DATABASE_POOL_SIZE,
+        max_overflow=config.settings.DATABASE_POOL_MAX_OVERFLOW,
+        pool_timeout=config.settings.DATABASE_POOL_TIMEOUT_SECONDS,
+        pool_recycle=config.settings.DATABASE_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=config.settings.DATABASE_POOL_PRE_PING,
+        connect_args={
+            # cache of SQLAlchemy asyncpg dialect and of asyncpg itself
+            "prepared_statement_cache_size": config.settings.DATABASE_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": config.settings.DATABASE_STATEMENT_CACHE_SIZE,
+        },
+    )
+    instrument_engine(engine)
+    return engine
+
+
+async_engine = create_engine(sqlalchemy_database_uri, "primary")
+replica_engines = [
+    create_engine(uri, f"replica{i}") for i, uri in enumerate(replica_database_uris)
+]
+
+# users who wrote recently, their reads stay on the primary until replicas
+# catch up; per uvicorn worker like other in-process caches
+recent_writers: TTLCache[int, bool] = TTLCache(
+    name="replica_stickiness",
+    maxsize=config.settings.USER_CACHE_MAX_SIZE,
+    ttl=config.settings.DATABASE_REPLICA_STICKINESS_SECONDS,
+)
+
+
+class RoutingSession(Session):
+    """Sends reads of sessions with `info["use_replica"]` to a replica
+
+    Session info keys:
+    use_replica: set by `deps.use_replica` for read-only endpoints
+    user_id: current user, set by `deps.get_current_user` or
+        `deps.identify_reader`
+    wrote: set on the first write, the rest of the session uses the primary
+
+    Statements with `use_primary=True` execution option always go to the
+    primary, for reads which must not lag (e.g. revoked tokens).
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if (
+            replica_engines
+            and self.info.get("use_replica")
+            and not self.info.get("wrote")
+            and not self._flushing
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+            and not clause.get_execution_options().get("use_primary")
+            and not self.is_recent_writer()
+        ):
+            if "replica" not in self.info:
+                # one replica per session, its reads see a single snapshot
+                self.info["replica"] = random.choice(replica_engines)
+            return self.info["replica"].sync_engine
+        return async_engine.sync_engine
+
+    def is_recent_writer(self) -> bool:
+        if "recent_writer" not in self.info:
+            user_id = self.info.get("user_id")
+            if user_id is None:
+                return False
+            self.info["recent_writer"] = recent_writers.get(user_id) is not None
+        return self.info["recent_writer"]
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def track_statement_writes(orm_execute_state):
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def track_flush_writes(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def remember_recent_writer(session):
+    user_id = session.info.get("user_id")
+    if session.info.get("wrote") and user_id is not None:
+        recent_writers.set(user_id, True)
 
 
-async_engine = create_async_engine(sqlalchemy_database_uri, pool_pre_ping=True)
-async_session = async_sessionmaker(async_engine, expire_on_commit=False)
+async_session = async_sessionmaker(
+    async_engine, expire_on_commit=False, sync_session_class=RoutingSession
+)
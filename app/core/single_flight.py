@@ -0,0 +1,89 @@
+"""
+In-process request coalescing.
+
+`single_flight` makes concurrent calls of a coroutine function with equal key
+arguments share one execution: the first call runs it, calls made while it
+is in flight await the same result (or exception). Nothing is kept after the
+call completes, so unlike a cache it never serves stale data.
+
+Meant for read dependencies, e.g. a hot ride shared on social media:
+
+    @single_flight("ride_id", "replica")
+    async def _load_shared_ride_detailed(ride_id: int, replica: bool, session):
+        ...
+
+Results are shared between requests, so they must not be mutated and ORM
+objects must be fully loaded, followers merge them into their own sessions
+with `session.merge(obj, load=False)`. Key arguments must cover everything
+the result depends on, e.g. the database it is read from. Like caches it
+works per uvicorn worker.
+"""
+
+import asyncio
+import functools
+import inspect
+from collections.abc import Awaitable, Callable, Hashable
+from typing import ParamSpec, TypeVar
+
+from app.core.metrics import SINGLE_FLIGHT_CALLS
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+def single_flight(
+    *key_args: str,
+) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    """Coalesces concurrent calls with equal values of `key_args` arguments"""
+
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        signature = inspect.signature(func)
+        unknown = set(key_args) - signature.parameters.keys()
+        if unknown:
+            raise TypeError(f"{func.__qualname__} has no arguments {unknown}")
+        in_flight: dict[tuple[Hashable, ...], asyncio.Future] = {}
+        leader_calls = SINGLE_FLIGHT_CALLS.labels(
+            function=func.__qualname__, result="leader"
+        )
+        shared_calls = SINGLE_FLIGHT_CALLS.labels(
+            function=func.__qualname__, result="shared"
+        )
+
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            arguments = signature.bind(*args, **kwargs).arguments
+            key = tuple(arguments.get(name) for name in key_args)
+
+            while (future := in_flight.get(key)) is not None:
+                try:
+                    result = await asyncio.shield(future)
+                except asyncio.CancelledError:
+                    # the leader was cancelled (e.g. its client disconnected),
+                    # unless this call was cancelled too it runs by itself
+                    if not future.cancelled() or asyncio.current_task().cancelling():
+                        raise
+                    continue
+                shared_calls.inc()
+                return result
+
+            future = in_flight[key] = asyncio.get_running_loop().create_future()
+            leader_calls.inc()
+            try:
+                result = await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except BaseException as exc:
+                future.set_exception(exc)
+                # marks the exception retrieved when there are no followers
+                future.exception()
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                del in_flight[key]
+
+        return wrapper
+
+    return decorator
@@ -1,11 +1,29 @@
 """Main FastAPI app instance declaration."""
 
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 
 from app.api.api import api_router
 from app.core import config
+from app.core.chat import message_writer
+from app.core.events import event_hub
+from app.core.metrics import MetricsMiddleware
+from app.core.places import place_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await event_hub.start()
+    await message_writer.start()
+    await place_index.start()
+    yield
+    await place_index.stop()
+    await message_writer.stop()
+    await event_hub.stop()
+
 
 app = FastAPI(
     title=config.settings.PROJECT_NAME,
@@ -13,6 +31,7 @@ app = FastAPI(
     description=config.settings.DESCRIPTION,
     openapi_url="/openapi.json",
     docs_url="/",
+    lifespan=lifespan,
 )
 app.include_router(api_router)
 
@@ -27,3 +46,6 @@ app.add_middleware(
 
 # Guards against HTTP Host Header attacks
 app.add_middleware(TrustedHostMiddleware, allowed_hosts=config.settings.ALLOWED_HOSTS)
+
+# Per route request time and SQL queries metrics, outermost to measure everything
+app.add_middleware(MetricsMiddleware)
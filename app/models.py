@@ -17,7 +17,9 @@ from datetime import datetime, date
 from enum import Enum
 from typing import Optional
 
-from sqlalchemy import String, ForeignKey, DateTime, func
+from sqlalchemy import String, ForeignKey, DateTime, Index, Integer, func
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -37,7 +39,10 @@ class User(Base):
     rating: Mapped[Optional[float]]
     rides: Mapped[list["Ride"]] = relationship(back_populates="driver")
     vehicles: Mapped[list["Vehicle"]] = relationship()
-    bookings: Mapped[list["Booking"]] = relationship()
+    bookings: Mapped[list["Booking"]] = relationship(back_populates="passenger")
+    # bumped on changes of the user info and of the user's bookings,
+    # ETags of responses which include them are derived from it
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
 
 
 class VehicleType(Enum):
@@ -63,6 +68,10 @@ class Vehicle(Base):
 
 class Booking(Base):
     __tablename__ = "booking"
+    __table_args__ = (
+        # bookings of a passenger, newest first
+        Index("ix_booking_passenger_id_filled_at", "passenger_id", "filled_at"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     ride_id: Mapped[int] = mapped_column(ForeignKey("ride.id", ondelete="CASCADE"))
     passenger_id: Mapped[int] = mapped_column(ForeignKey("user.id", ondelete="CASCADE"))
@@ -72,21 +81,87 @@ class Booking(Base):
     approved: Mapped[bool]
     approved_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
     seats: Mapped[int]
-    ride: Mapped["Ride"] = relationship(back_populates="bookings", lazy="joined")
-    passenger: Mapped['User'] = relationship(lazy='joined')
+    # stops of the ride the booking is from and to, 0 is the ride departure,
+    # see `RideStop.position`
+    from_stop: Mapped[int] = mapped_column(default=0, server_default="0")
+    to_stop: Mapped[int] = mapped_column(default=1, server_default="1")
+    # never loaded by SQL implicitly, endpoints choose loader strategy with
+    # options, objects already in the session identity map are still resolved
+    ride: Mapped["Ride"] = relationship(
+        back_populates="bookings", lazy="raise_on_sql"
+    )
+    passenger: Mapped["User"] = relationship(
+        back_populates="bookings", lazy="raise_on_sql"
+    )
+
+
+def _single_segment_taken(context) -> list[int]:
+    return [context.get_current_parameters().get("seats_taken") or 0]
 
 
 class Ride(Base):
     __tablename__ = "ride"
+    __table_args__ = (
+        Index(
+            "ix_ride_departure_place_id_arrival_place_id_departure_at",
+            "departure_place_id",
+            "arrival_place_id",
+            "departure_at",
+        ),
+        # rides of a driver by departure
+        Index("ix_ride_driver_id_departure_at", "driver_id", "departure_at"),
+        # first legs of itineraries, from a city by departure
+        Index(
+            "ix_ride_departure_place_id_departure_at",
+            "departure_place_id",
+            "departure_at",
+        ),
+        # proximity search of departure and arrival points by geohash cells,
+        # see app/core/geo.py
+        Index(
+            "ix_ride_departure_geohash_departure_at",
+            "departure_geohash",
+            "departure_at",
+        ),
+        Index(
+            "ix_ride_arrival_geohash_departure_at", "arrival_geohash", "departure_at"
+        ),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
-    departure: Mapped[str] = mapped_column(index=True)
-    arrival: Mapped[str] = mapped_column(index=True)
+    departure: Mapped[str]
+    arrival: Mapped[str]
+    # canonical places of departure and arrival names, see app/core/places.py
+    departure_place_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("place.id", ondelete="SET NULL")
+    )
+    arrival_place_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("place.id", ondelete="SET NULL")
+    )
     departure_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
     arrival_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    # optional coordinates of departure and arrival points, geohashes are
+    # set with them, "C" collation makes geohash prefixes index ranges
+    departure_lat: Mapped[Optional[float]]
+    departure_lon: Mapped[Optional[float]]
+    departure_geohash: Mapped[Optional[str]] = mapped_column(
+        String(12, collation="C")
+    )
+    arrival_lat: Mapped[Optional[float]]
+    arrival_lon: Mapped[Optional[float]]
+    arrival_geohash: Mapped[Optional[str]] = mapped_column(String(12, collation="C"))
     seats: Mapped[int]
+    # sum of approved bookings seats on the most taken segment of the route,
+    # maintained on booking create/approve/cancel
+    # see `app/check_ride_seats.py` for consistency check
+    seats_taken: Mapped[int] = mapped_column(default=0, server_default="0")
+    # seats taken on segments between consecutive stops, `seats_taken` is the
+    # most taken one, see `app/core/segments.py`
+    segments_taken: Mapped[list[int]] = mapped_column(
+        ARRAY(Integer), default=_single_segment_taken, server_default="{0}"
+    )
     price: Mapped[int]
     with_approval: Mapped[bool]
     comment: Mapped[Optional[str]]
@@ -97,18 +172,108 @@ class Ride(Base):
     )
     vehicle: Mapped["Vehicle"] = relationship()
     bookings: Mapped[list["Booking"]] = relationship(back_populates="ride")
+    # intermediate stops, in order of the route
+    stops: Mapped[list["RideStop"]] = relationship(
+        order_by="RideStop.position", lazy="raise_on_sql", passive_deletes=True
+    )
+    # bumped on changes of the ride and of its bookings, see `User.version`
+    version: Mapped[int] = mapped_column(default=1, server_default="1")
+
+    @hybrid_property
+    def free_seats(self) -> int:
+        return self.seats - self.seats_taken
+
+
+class Place(Base):
+    __tablename__ = "place"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # canonical spelling, the first one seen
+    name: Mapped[str]
+
+
+class PlaceName(Base):
+    """Normalized name of a place, its spellings and aliases are names too"""
+
+    __tablename__ = "place_name"
+    # ids order names for incremental loading of new ones
+    id: Mapped[int] = mapped_column(primary_key=True)
+    normalized: Mapped[str] = mapped_column(unique=True)
+    place_id: Mapped[int] = mapped_column(
+        ForeignKey("place.id", ondelete="CASCADE"), index=True
+    )
+
+
+class RideStop(Base):
+    """Intermediate stop of a ride
+
+    Positions go from 1 to the number of stops, 0 is the ride departure and
+    the number of stops + 1 is its arrival.
+    """
+
+    __tablename__ = "ride_stop"
+    ride_id: Mapped[int] = mapped_column(
+        ForeignKey("ride.id", ondelete="CASCADE"), primary_key=True
+    )
+    position: Mapped[int] = mapped_column(primary_key=True)
+    place: Mapped[str]
+    departure_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
 
 
 class Messages(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # conversation of a ride, newest first
+        Index("ix_messages_ride_id_created_at", "ride_id", "created_at"),
+        # messages received by a user, newest first
+        Index("ix_messages_recipient_id_created_at", "recipient_id", "created_at"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
-    sender_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
-    recipient_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
+    sender_id: Mapped[int] = mapped_column(ForeignKey("user.id", ondelete="CASCADE"))
+    recipient_id: Mapped[int] = mapped_column(ForeignKey("user.id", ondelete="CASCADE"))
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), server_onupdate=func.now()
+        DateTime(timezone=True), server_default=func.now(), server_onupdate=func.now()
     )
-    ride_id: Mapped[str] = mapped_column(ForeignKey("ride.id", ondelete="CASCADE"))
+    ride_id: Mapped[int] = mapped_column(ForeignKey("ride.id", ondelete="CASCADE"))
     message_text: Mapped[str] = mapped_column(String(1000))
+
+
+class MessageThread(Base):
+    """Inbox row of a user: conversation with a peer about a ride
+
+    Maintained on every message sent, so inbox reads never scan messages.
+    """
+
+    __tablename__ = "message_thread"
+    __table_args__ = (
+        Index(
+            "ix_message_thread_user_id_last_message_at", "user_id", "last_message_at"
+        ),
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id", ondelete="CASCADE"), primary_key=True
+    )
+    ride_id: Mapped[int] = mapped_column(
+        ForeignKey("ride.id", ondelete="CASCADE"), primary_key=True
+    )
+    peer_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id", ondelete="CASCADE"), primary_key=True
+    )
+    last_message_id: Mapped[int] = mapped_column(
+        ForeignKey("messages.id", ondelete="CASCADE")
+    )
+    last_message_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    # messages received since the user last read the thread
+    unread_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    last_message: Mapped["Messages"] = relationship(lazy="raise_on_sql")
+
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_token"
+    jti: Mapped[str] = mapped_column(String(32), primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    revoked_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), index=True
+    )
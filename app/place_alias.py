@@ -0,0 +1,75 @@
+"""
+Adds an alias of a place, e.g. a name in another language.
+
+The alias name is added to the canonical place. If rides already use the
+alias as a place of its own, the place is merged into the canonical one:
+its rides and names are moved and the place is deleted. Workers pick up
+the change by their next places sync, cached searches expire by TTL.
+
+python -m app.place_alias Moscow Москва
+"""
+
+import argparse
+import asyncio
+
+from sqlalchemy import delete, insert, select, update
+
+from app.core.places import normalize_place
+from app.core.session import async_session
+from app.models import Place, PlaceName, Ride
+
+
+async def main(alias: str, canonical: str) -> int:
+    async with async_session() as session:
+        place_id = await session.scalar(
+            select(PlaceName.place_id).where(
+                PlaceName.normalized == normalize_place(canonical)
+            )
+        )
+        if place_id is None:
+            print(f"Place {canonical!r} not found")
+            return 1
+        alias_place_id = await session.scalar(
+            select(PlaceName.place_id).where(
+                PlaceName.normalized == normalize_place(alias)
+            )
+        )
+        if alias_place_id == place_id:
+            print(f"{alias!r} is {canonical!r} already")
+            return 0
+
+        if alias_place_id is None:
+            names = [normalize_place(alias)]
+        else:
+            for column in [Ride.departure_place_id, Ride.arrival_place_id]:
+                await session.execute(
+                    update(Ride)
+                    .where(column == alias_place_id)
+                    .values({column: place_id})
+                )
+            # names are inserted again rather than updated, so incremental
+            # syncs of workers see them as new ones
+            names = (
+                await session.scalars(
+                    delete(PlaceName)
+                    .where(PlaceName.place_id == alias_place_id)
+                    .returning(PlaceName.normalized)
+                )
+            ).all()
+            await session.execute(delete(Place).where(Place.id == alias_place_id))
+        await session.execute(
+            insert(PlaceName),
+            [{"normalized": name, "place_id": place_id} for name in names],
+        )
+        await session.commit()
+
+    print(f"{alias!r} is {canonical!r} now")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("alias", help="alias name of the place")
+    parser.add_argument("canonical", help="name of the place")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.alias, args.canonical)))
@@ -5,11 +5,19 @@ from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, ConfigDict
 
 
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+
 def convert_datetime_to_gmt(dt: datetime) -> str:
     if not dt.tzinfo:
         dt = dt.replace(tzinfo=ZoneInfo("UTC"))
 
-    return dt.strftime("%Y-%m-%dT%H:%M:%S%z")
+    # isoformat is several times faster than strftime and gives the same
+    # result up to the colon in UTC offset, e.g. 2023-11-05T10:00:00+03:00
+    value = dt.isoformat(timespec="seconds")
+    if len(value) == 25 and dt.year >= 1000:
+        return value[:22] + value[23:]
+    return dt.strftime(DATETIME_FORMAT)
 
 
 class CustomModel(BaseModel):
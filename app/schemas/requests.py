@@ -1,4 +1,5 @@
-from datetime import datetime, date
+from datetime import datetime, date, time
+from typing import Annotated, Literal
 
 from pydantic import EmailStr, Field
 
@@ -14,6 +15,10 @@ class RefreshTokenRequest(BaseRequest):
     refresh_token: str
 
 
+class LogoutRequest(BaseRequest):
+    refresh_token: str | None = None
+
+
 class UserUpdatePasswordRequest(BaseRequest):
     password: str
 
@@ -46,13 +51,109 @@ class VehicleCreateRequest(BaseRequest):
     seats_count: int = Field(ge=1, le=5)
 
 
-class RideCreateRequest(BaseRequest):
+class RideStopRequest(BaseRequest):
+    place: str
+    departure_at: datetime
+
+
+# intermediate stops of a ride
+MAX_RIDE_STOPS = 10
+
+
+# fields of a ride shared by single rides and schedules of them
+class BaseRideRequest(BaseRequest):
     departure: str
     arrival: str
-    departure_at: datetime
-    arrival_at: datetime
+    # optional coordinates of departure and arrival points, both or none
+    departure_lat: float | None = Field(default=None, ge=-90, le=90)
+    departure_lon: float | None = Field(default=None, ge=-180, le=180)
+    arrival_lat: float | None = Field(default=None, ge=-90, le=90)
+    arrival_lon: float | None = Field(default=None, ge=-180, le=180)
     seats: int = Field(ge=1, le=4)
     price: int = Field(ge=0)
     with_approval: bool = True
     comment: str | None = None
     vehicle_id: int | None = None
+
+
+class RideCreateRequest(BaseRideRequest):
+    departure_at: datetime
+    arrival_at: datetime
+    # in order of the route, seats are sold between any two stops
+    stops: list[RideStopRequest] = Field(default=[], max_length=MAX_RIDE_STOPS)
+
+
+# rides created by one bulk or schedule request
+MAX_BULK_RIDES = 500
+
+
+class RideBulkCreateRequest(BaseRequest):
+    rides: list[RideCreateRequest] = Field(min_length=1, max_length=MAX_BULK_RIDES)
+
+
+class RideScheduleCreateRequest(BaseRideRequest):
+    # local time in `time_zone` of departure on every scheduled day
+    departure_time: time
+    duration_minutes: int = Field(ge=1, le=24 * 60)
+    # inclusive dates range, ISO weekdays, 1 is Monday
+    start_date: date
+    end_date: date
+    weekdays: list[Annotated[int, Field(ge=1, le=7)]] = Field(
+        default=[1, 2, 3, 4, 5], min_length=1
+    )
+    time_zone: str = Field(default="UTC", examples=["Europe/Moscow"])
+
+
+# bookings approved or rejected by one batch request
+MAX_BATCH_BOOKINGS = 100
+
+
+class RideBookingsBatchRequest(BaseRequest):
+    # approved in the listed order while free seats last
+    approve: list[int] = Field(default=[], max_length=MAX_BATCH_BOOKINGS)
+    reject: list[int] = Field(default=[], max_length=MAX_BATCH_BOOKINGS)
+
+
+class RideSearchRequest(BaseRequest):
+    # places of the route names, None for names of no ride
+    departure_place_id: int | None
+    arrival_place_id: int | None
+    departure_from: datetime
+    departure_to: datetime | None = None
+    min_free_seats: int = Field(default=1, ge=1)
+    max_price: int | None = Field(default=None, ge=0)
+    order_by: Literal["departure_at", "price"] = "departure_at"
+    after: tuple | None = None
+    limit: int = Field(default=20, ge=1, le=100)
+
+
+class ItinerarySearchRequest(BaseRequest):
+    # places of the route names, None for names of no ride
+    departure_place_id: int | None
+    arrival_place_id: int | None
+    # window of the first leg departure
+    departure_from: datetime
+    departure_to: datetime
+    min_free_seats: int = Field(default=1, ge=1)
+    min_layover_minutes: int = Field(default=15, ge=0)
+    max_layover_minutes: int = Field(default=240, ge=0)
+    order_by: Literal["duration", "price"] = "duration"
+    limit: int = Field(default=10, ge=1, le=50)
+
+
+class NearbyRideSearchRequest(BaseRequest):
+    lat: float
+    lon: float
+    radius_km: float = 10
+    # rides departing or arriving near the point
+    point: Literal["departure", "arrival"] = "departure"
+    departure_from: datetime
+    departure_to: datetime
+    min_free_seats: int = Field(default=1, ge=1)
+    limit: int = Field(default=20, ge=1, le=100)
+
+
+class MessageCreateRequest(BaseRequest):
+    ride_id: int
+    recipient_id: int
+    message_text: str = Field(min_length=1, max_length=1000)
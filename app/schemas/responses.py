@@ -1,4 +1,5 @@
 from datetime import datetime, date
+from typing import Literal
 
 from pydantic import EmailStr
 
@@ -47,6 +48,11 @@ class UserPrivateResponse(UserResponse):
     birthday: date | None = None
 
 
+class PlaceResponse(BaseResponse):
+    id: int
+    name: str
+
+
 class RideResponse(BaseResponse):
     id: int
     created_at: datetime
@@ -58,16 +64,67 @@ class RideResponse(BaseResponse):
     price: int
     with_approval: bool
     comment: str | None = None
+    departure_lat: float | None = None
+    departure_lon: float | None = None
+    arrival_lat: float | None = None
+    arrival_lon: float | None = None
+
+
+class RideStopResponse(BaseResponse):
+    position: int
+    place: str
+    departure_at: datetime
 
 
 class RideCreateResponse(RideResponse):
-    pass
+    stops: list[RideStopResponse] = []
+
+
+class RideBulkCreateResponse(BaseResponse):
+    ids: list[int]
+
+
+class RidePageResponse(BaseResponse):
+    items: list[RideResponse]
+    next_cursor: str | None = None
+
+
+class RideSearchItemResponse(RideResponse):
+    free_seats: int
+
+
+class RideSearchResponse(BaseResponse):
+    items: list[RideSearchItemResponse]
+    next_cursor: str | None = None
+
+
+class NearbyRideResponse(RideSearchItemResponse):
+    # from the searched point to the ride departure or arrival point
+    distance_km: float
+
+
+class NearbyRideSearchResponse(BaseResponse):
+    items: list[NearbyRideResponse]
+
+
+class ItineraryResponse(BaseResponse):
+    legs: list[RideSearchItemResponse]
+    price: int
+    duration_minutes: int
+    layover_minutes: int
+
+
+class ItinerarySearchResponse(BaseResponse):
+    items: list[ItineraryResponse]
 
 
 class RideDetailedResponse(RideResponse):
     driver: UserPublicResponse
     vehicle: VehicleResponse | None = None
     free_seats: int
+    stops: list[RideStopResponse] = []
+    # free seats on segments between consecutive stops, from departure
+    segments_free_seats: list[int]
 
 
 class BookingResponse(BaseResponse):
@@ -77,12 +134,58 @@ class BookingResponse(BaseResponse):
     approved: bool
     approved_at: datetime | None = None
     seats: int
+    # stops of the ride, 0 is departure, see `RideStopResponse.position`
+    from_stop: int
+    to_stop: int
 
 
 class BookingCreateResponse(BookingResponse):
     pass
 
 
+class BookingBatchOutcomeResponse(BaseResponse):
+    booking_id: int
+    # not_found is also a booking of another ride
+    outcome: Literal[
+        "approved", "rejected", "already_approved", "not_enough_seats", "not_found"
+    ]
+
+
+class RideBookingsBatchResponse(BaseResponse):
+    results: list[BookingBatchOutcomeResponse]
+
+
 class BookingDetailedResponse(BookingResponse):
     ride: RideResponse
     passenger: UserPublicResponse
+
+
+class BookingDetailedPageResponse(BaseResponse):
+    items: list[BookingDetailedResponse]
+    next_cursor: str | None = None
+
+
+class MessageResponse(BaseResponse):
+    id: int
+    ride_id: int
+    sender_id: int
+    recipient_id: int
+    created_at: datetime
+    message_text: str
+
+
+class MessagePageResponse(BaseResponse):
+    items: list[MessageResponse]
+    next_cursor: str | None = None
+
+
+class MessageThreadResponse(BaseResponse):
+    ride_id: int
+    peer_id: int
+    unread_count: int
+    last_message: MessageResponse
+
+
+class MessageThreadPageResponse(BaseResponse):
+    items: list[MessageThreadResponse]
+    next_cursor: str | None = None
@@ -1,20 +1,31 @@
 import asyncio
+import math
+import time
 from collections.abc import AsyncGenerator
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 
 import pytest
 import pytest_asyncio
 from httpx import AsyncClient
-from sqlalchemy import delete, select
+from sqlalchemy import delete, event, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core import config, security
+from app.core.cache import ride_search_cache, user_cache
+from app.core.chat import message_writer
+from app.core.events import event_hub
+from app.core.places import place_index
+from app.core.revocation import revoked_tokens
 from app.core.session import async_engine, async_session
 from app.main import app
-from app.models import Base, User
+from app.models import Base, Ride, User
 
-default_user_id = "b75365d9-7bf9-4f54-add5-aeab333a087b"
+default_user_id = 100500
 default_user_email = "geralt@wiedzmin.pl"
 default_user_password = "geralt"
+default_user_first_name = "Geralt"
+default_user_last_name = "of Rivia"
 default_user_password_hash = security.get_password_hash(default_user_password)
 default_user_access_token = security.create_jwt_token(
     str(default_user_id), 60 * 60 * 24, refresh=False
@@ -49,13 +60,23 @@ async def session(test_db_setup_sessionmaker) -> AsyncGenerator[AsyncSession, No
         for name, table in Base.metadata.tables.items():
             await session.execute(delete(table))
         await session.commit()
+        user_cache.clear()
+        ride_search_cache.clear()
+        place_index.clear()
 
 
 @pytest_asyncio.fixture(scope="session")
-async def client() -> AsyncGenerator[AsyncClient, None]:
+async def client(test_db_setup_sessionmaker) -> AsyncGenerator[AsyncClient, None]:
+    # AsyncClient does not run the app lifespan
+    await event_hub.start()
+    await message_writer.start()
+    await place_index.start()
     async with AsyncClient(app=app, base_url="http://test") as client:
         client.headers.update({"Host": "localhost"})
         yield client
+    await place_index.stop()
+    await message_writer.stop()
+    await event_hub.stop()
 
 
 @pytest_asyncio.fixture
@@ -69,6 +90,8 @@ async def default_user(test_db_setup_sessionmaker) -> User:
             new_user = User(
                 email=default_user_email,
                 hashed_password=default_user_password_hash,
+                first_name=default_user_first_name,
+                last_name=default_user_last_name,
             )
             new_user.id = default_user_id
             session.add(new_user)
@@ -81,3 +104,71 @@ async def default_user(test_db_setup_sessionmaker) -> User:
 @pytest.fixture
 def default_user_headers(default_user: User):
     return {"Authorization": f"Bearer {default_user_access_token}"}
+
+
+@pytest.fixture
+def query_budget(monkeypatch):
+    """Counts SQL statements executed inside `with query_budget(n):` block
+
+    Fails the test if there were more than n of them. Caches are reset and
+    revoked tokens filter sync is frozen, so the count is deterministic
+    and includes loading of the current user.
+    """
+    monkeypatch.setattr(revoked_tokens, "_synced_at", time.monotonic())
+    monkeypatch.setattr(revoked_tokens, "sync_interval", math.inf)
+
+    @contextmanager
+    def assert_query_budget(budget: int):
+        statements = []
+
+        def after_cursor_execute(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        user_cache.clear()
+        event.listen(
+            async_engine.sync_engine, "after_cursor_execute", after_cursor_execute
+        )
+        try:
+            yield statements
+        finally:
+            event.remove(
+                async_engine.sync_engine, "after_cursor_execute", after_cursor_execute
+            )
+        queries = "\n\n".join(statements)
+        assert (
+            len(statements) <= budget
+        ), f"{len(statements)} queries over budget of {budget}:\n{queries}"
+
+    return assert_query_budget
+
+
+async def create_driver(session: AsyncSession) -> User:
+    driver = User(email="driver@example.com", first_name="Ivan", last_name="Petrov")
+    session.add(driver)
+    await session.commit()
+    return driver
+
+
+async def create_ride(session: AsyncSession, driver: User, **kwargs) -> Ride:
+    departure_at = kwargs.pop(
+        "departure_at", datetime.now(tz=timezone.utc) + timedelta(days=1)
+    )
+    departure = kwargs.pop("departure", "Moscow")
+    arrival = kwargs.pop("arrival", "Tver")
+    place_ids = await place_index.get_or_create([departure, arrival])
+    ride = Ride(
+        departure=departure,
+        arrival=arrival,
+        departure_place_id=place_ids[departure],
+        arrival_place_id=place_ids[arrival],
+        departure_at=departure_at,
+        arrival_at=kwargs.pop("arrival_at", departure_at + timedelta(hours=3)),
+        seats=kwargs.pop("seats", 3),
+        price=kwargs.pop("price", 1000),
+        with_approval=kwargs.pop("with_approval", False),
+        driver_id=driver.id,
+        **kwargs,
+    )
+    session.add(ride)
+    await session.commit()
+    return ride
@@ -1,7 +1,13 @@
+from datetime import datetime, timedelta, timezone
+
 from httpx import AsyncClient, codes
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import config, security
+from app.core.revocation import RevokedTokens
 from app.main import app
-from app.models import User
+from app.models import RevokedToken, User
 from app.tests.conftest import default_user_email, default_user_password
 
 
@@ -62,3 +68,103 @@ async def test_auth_refresh_token(client: AsyncClient, default_user: User):
     assert "refresh_token" in token
     assert "refresh_token_expires_at" in token
     assert "refresh_token_issued_at" in token
+
+
+async def test_auth_access_token_fail_password_pool_saturated(
+    client: AsyncClient, default_user: User, monkeypatch
+):
+    monkeypatch.setattr(
+        security.password_pool,
+        "in_flight",
+        config.settings.SECURITY_PASSWORD_HASH_WORKERS
+        + config.settings.SECURITY_PASSWORD_HASH_QUEUE_SIZE,
+    )
+    response = await client.post(
+        app.url_path_for("login_access_token"),
+        data={
+            "username": default_user_email,
+            "password": default_user_password,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+
+    assert response.status_code == codes.SERVICE_UNAVAILABLE
+    assert response.json() == {"detail": "Server is busy, try again later"}
+
+
+async def login(client: AsyncClient) -> dict:
+    response = await client.post(
+        app.url_path_for("login_access_token"),
+        data={
+            "username": default_user_email,
+            "password": default_user_password,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    return response.json()
+
+
+async def test_auth_refresh_token_rotation(client: AsyncClient, default_user: User):
+    refresh_token = (await login(client))["refresh_token"]
+
+    response = await client.post(
+        app.url_path_for("refresh_token"), json={"refresh_token": refresh_token}
+    )
+    assert response.status_code == codes.OK
+
+    response = await client.post(
+        app.url_path_for("refresh_token"), json={"refresh_token": refresh_token}
+    )
+    assert response.status_code == codes.FORBIDDEN
+    assert response.json() == {
+        "detail": "Could not validate credentials, token revoked"
+    }
+
+
+async def test_auth_logout(client: AsyncClient, default_user: User):
+    token = await login(client)
+    headers = {"Authorization": f"Bearer {token['access_token']}"}
+
+    response = await client.post(
+        app.url_path_for("logout"),
+        headers=headers,
+        json={"refresh_token": token["refresh_token"]},
+    )
+    assert response.status_code == codes.NO_CONTENT
+
+    response = await client.get(app.url_path_for("read_current_user"), headers=headers)
+    assert response.status_code == codes.FORBIDDEN
+    response = await client.post(
+        app.url_path_for("refresh_token"),
+        json={"refresh_token": token["refresh_token"]},
+    )
+    assert response.status_code == codes.FORBIDDEN
+
+
+async def test_revoked_tokens_full_filter_rebuilt(session: AsyncSession):
+    now = datetime.now(tz=timezone.utc)
+    session.add_all(
+        [
+            RevokedToken(jti="expired", expires_at=now - timedelta(minutes=1)),
+            RevokedToken(jti="first", expires_at=now + timedelta(hours=1)),
+            RevokedToken(jti="second", expires_at=now + timedelta(hours=1)),
+        ]
+    )
+    await session.commit()
+    tokens = RevokedTokens(capacity=2, error_rate=0.001, sync_interval=0)
+    await tokens.sync(session)
+    full_filter = tokens.filter
+    assert full_filter.count == tokens.capacity
+
+    # the full filter is rebuilt in the background, sync itself only reads
+    # and never commits what the request has pending
+    session.add(RevokedToken(jti="pending", expires_at=now + timedelta(hours=1)))
+    await tokens.sync(session)
+    rebuild = tokens._rebuild
+    assert rebuild is not None
+    await rebuild
+    await session.rollback()
+    assert tokens.filter is not full_filter
+    assert "first" in tokens.filter and "second" in tokens.filter
+    query = select(RevokedToken.jti).order_by(RevokedToken.jti)
+    assert (await session.scalars(query)).all() == ["first", "second"]
@@ -0,0 +1,278 @@
+from datetime import datetime, timedelta, timezone
+
+from httpx import AsyncClient, codes
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.check_ride_seats import main as check_ride_seats
+from app.core.security import create_jwt_token
+from app.main import app
+from app.models import Booking, Ride, User
+from app.tests.conftest import create_driver, create_ride, default_user_id
+
+
+async def get_seats_taken(session: AsyncSession, ride_id: int) -> int:
+    return await session.scalar(select(Ride.seats_taken).where(Ride.id == ride_id))
+
+
+async def test_book_ride_takes_seats(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver, seats=3)
+
+    response = await client.post(
+        app.url_path_for("book_ride"),
+        headers=default_user_headers,
+        params={"ride_id": ride.id, "requested_seats": 2},
+    )
+    assert response.status_code == codes.OK
+    assert response.json()["approved"] is True
+    assert await get_seats_taken(session, ride.id) == 2
+
+    response = await client.delete(
+        app.url_path_for("cancel_the_booking", booking_id=response.json()["id"]),
+        headers=default_user_headers,
+    )
+    assert response.status_code == codes.NO_CONTENT
+    assert await get_seats_taken(session, ride.id) == 0
+    assert await check_ride_seats() == 0
+
+
+async def test_book_ride_not_enough_seats(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver, seats=2, seats_taken=1)
+
+    response = await client.post(
+        app.url_path_for("book_ride"),
+        headers=default_user_headers,
+        params={"ride_id": ride.id, "requested_seats": 2},
+    )
+    assert response.status_code == codes.BAD_REQUEST
+    assert await get_seats_taken(session, ride.id) == 1
+
+
+async def test_book_ride_with_approval_takes_seats_on_approve(
+    client: AsyncClient, default_user, session: AsyncSession
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver, with_approval=True)
+    booking = Booking(
+        ride_id=ride.id, passenger_id=default_user.id, approved=False, seats=2
+    )
+    session.add(booking)
+    await session.commit()
+    assert await get_seats_taken(session, ride.id) == 0
+
+    driver_token = create_jwt_token(driver.id, 60, refresh=False)[0]
+    response = await client.post(
+        app.url_path_for(
+            "approve_ride_booking", ride_id=ride.id, booking_id=booking.id
+        ),
+        headers={"Authorization": f"Bearer {driver_token}"},
+    )
+    assert response.status_code == codes.OK
+    assert response.json()["approved"] is True
+    assert await get_seats_taken(session, ride.id) == 2
+    assert await check_ride_seats() == 0
+
+
+async def test_approve_booking_not_enough_seats(
+    client: AsyncClient, default_user, session: AsyncSession
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver, seats=2, seats_taken=1)
+    booking = Booking(
+        ride_id=ride.id, passenger_id=default_user.id, approved=False, seats=2
+    )
+    session.add(booking)
+    await session.commit()
+
+    driver_token = create_jwt_token(driver.id, 60, refresh=False)[0]
+    response = await client.post(
+        app.url_path_for(
+            "approve_ride_booking", ride_id=ride.id, booking_id=booking.id
+        ),
+        headers={"Authorization": f"Bearer {driver_token}"},
+    )
+    assert response.status_code == codes.BAD_REQUEST
+    assert await get_seats_taken(session, ride.id) == 1
+    await session.refresh(booking)
+    assert booking.approved is False
+
+
+async def test_conditional_get_of_bookings(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    driver_headers = {
+        "Authorization": f"Bearer {create_jwt_token(driver.id, 60, refresh=False)[0]}"
+    }
+    ride = await create_ride(session, driver, with_approval=True)
+    urls_headers = [
+        (app.url_path_for("read_current_user_bookings"), default_user_headers),
+        (
+            app.url_path_for("read_current_user_ride_bookings", ride_id=ride.id),
+            driver_headers,
+        ),
+        (app.url_path_for("read_ride_info", ride_id=ride.id), default_user_headers),
+    ]
+
+    async def get_etags() -> list[str]:
+        etags = []
+        for url, headers in urls_headers:
+            response = await client.get(url, headers=headers)
+            assert response.status_code == codes.OK
+            etags.append(response.headers["ETag"])
+        return etags
+
+    async def assert_not_modified(etags: list[str], expected: bool) -> None:
+        for (url, headers), etag in zip(urls_headers, etags):
+            response = await client.get(url, headers={**headers, "If-None-Match": etag})
+            if expected:
+                assert response.status_code == codes.NOT_MODIFIED
+                assert response.headers["ETag"] == etag
+                assert response.content == b""
+            else:
+                assert response.status_code == codes.OK
+
+    etags = await get_etags()
+    await assert_not_modified(etags, True)
+
+    response = await client.post(
+        app.url_path_for("book_ride"),
+        headers=default_user_headers,
+        params={"ride_id": ride.id, "requested_seats": 1},
+    )
+    assert response.status_code == codes.OK
+    await assert_not_modified(etags, False)
+
+    etags = await get_etags()
+    response = await client.post(
+        app.url_path_for(
+            "approve_ride_booking", ride_id=ride.id, booking_id=response.json()["id"]
+        ),
+        headers=driver_headers,
+    )
+    assert response.status_code == codes.OK
+    await assert_not_modified(etags, False)
+    await assert_not_modified(await get_etags(), True)
+
+
+async def test_read_current_user_bookings_by_period(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    now = datetime.now(tz=timezone.utc)
+    bookings = []
+    for days in [-2, 1, -1, 2]:
+        ride = await create_ride(
+            session, driver, departure_at=now + timedelta(days=days)
+        )
+        booking = Booking(
+            ride_id=ride.id,
+            passenger_id=default_user_id,
+            approved=True,
+            seats=1,
+            filled_at=now - timedelta(minutes=10 - len(bookings)),
+        )
+        session.add(booking)
+        await session.commit()
+        bookings.append(booking)
+
+    for period, expected in [
+        ("upcoming", [bookings[3], bookings[1]]),
+        ("past", [bookings[2], bookings[0]]),
+        (None, list(reversed(bookings))),
+    ]:
+        params = {"limit": 1}
+        if period is not None:
+            params["period"] = period
+        found = []
+        while True:
+            response = await client.get(
+                app.url_path_for("read_current_user_bookings"),
+                headers=default_user_headers,
+                params=params,
+            )
+            assert response.status_code == codes.OK
+            # upcoming and past bookings change with time, not cacheable
+            assert ("ETag" in response.headers) is (period is None)
+            result = response.json()
+            found += [item["id"] for item in result["items"]]
+            if result["next_cursor"] is None:
+                break
+            params["cursor"] = result["next_cursor"]
+        assert found == [booking.id for booking in expected]
+
+
+async def test_decide_ride_bookings_batch(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    driver_headers = {
+        "Authorization": f"Bearer {create_jwt_token(driver.id, 60, refresh=False)[0]}"
+    }
+    ride = await create_ride(session, driver, seats=4, with_approval=True)
+    other_ride = await create_ride(session, driver, with_approval=True)
+    passengers = [
+        User(email=f"passenger{i}@example.com", first_name="P", last_name=str(i))
+        for i in range(5)
+    ]
+    session.add_all(passengers)
+    await session.commit()
+    bookings = [
+        Booking(ride_id=ride.id, passenger_id=passenger.id, approved=False, seats=seats)
+        for passenger, seats in zip(passengers, [2, 1, 2, 1, 1])
+    ]
+    bookings[4].ride_id = other_ride.id
+    session.add_all(bookings)
+    await session.commit()
+
+    response = await client.post(
+        app.url_path_for("decide_ride_bookings", ride_id=ride.id),
+        headers=driver_headers,
+        json={
+            # 2 + 1 seats fit, 2 more do not, nor does 1 after them
+            "approve": [bookings[0].id, bookings[1].id, bookings[2].id, 0],
+            "reject": [bookings[3].id, bookings[4].id],
+        },
+    )
+    assert response.status_code == codes.OK
+    assert response.json()["results"] == [
+        {"booking_id": bookings[0].id, "outcome": "approved"},
+        {"booking_id": bookings[1].id, "outcome": "approved"},
+        {"booking_id": bookings[2].id, "outcome": "not_enough_seats"},
+        {"booking_id": 0, "outcome": "not_found"},
+        {"booking_id": bookings[3].id, "outcome": "rejected"},
+        {"booking_id": bookings[4].id, "outcome": "not_found"},
+    ]
+    assert await get_seats_taken(session, ride.id) == 3
+    remaining = (
+        await session.scalars(
+            select(Booking.id).where(Booking.ride_id == ride.id).order_by(Booking.id)
+        )
+    ).all()
+    assert remaining == [bookings[0].id, bookings[1].id, bookings[2].id]
+
+    response = await client.post(
+        app.url_path_for("decide_ride_bookings", ride_id=ride.id),
+        headers=driver_headers,
+        json={"approve": [bookings[0].id], "reject": [bookings[1].id]},
+    )
+    assert response.json()["results"] == [
+        {"booking_id": bookings[0].id, "outcome": "already_approved"},
+        {"booking_id": bookings[1].id, "outcome": "already_approved"},
+    ]
+    assert await get_seats_taken(session, ride.id) == 3
+    await check_ride_seats()
+
+    for batch in [{}, {"approve": [1], "reject": [1]}]:
+        response = await client.post(
+            app.url_path_for("decide_ride_bookings", ride_id=ride.id),
+            headers=driver_headers,
+            json=batch,
+        )
+        assert response.status_code == codes.BAD_REQUEST
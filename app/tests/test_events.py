@@ -0,0 +1,103 @@
+import asyncio
+
+from httpx import AsyncClient, codes
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.endpoints.events import stream_user_events
+from app.core.events import Event, EventHub, LocalBackend, PostgresBackend, event_hub
+from app.core.security import create_jwt_token
+from app.core.session import sqlalchemy_database_uri
+from app.main import app
+from app.tests.conftest import create_driver, create_ride, default_user_id
+
+
+def drain(subscription) -> list[tuple[str, dict]]:
+    events = []
+    while not subscription._queue.empty():
+        event = subscription._queue.get_nowait()
+        events.append((event.type, event.data))
+    return events
+
+
+async def test_booking_events_pushed_to_passenger_and_driver(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    driver_headers = {
+        "Authorization": f"Bearer {create_jwt_token(driver.id, 60, refresh=False)[0]}"
+    }
+    ride = await create_ride(session, driver, with_approval=True)
+
+    with (
+        event_hub.subscribe(default_user_id) as passenger_events,
+        event_hub.subscribe(driver.id) as driver_events,
+    ):
+        response = await client.post(
+            app.url_path_for("book_ride"),
+            headers=default_user_headers,
+            params={"ride_id": ride.id, "requested_seats": 1},
+        )
+        assert response.status_code == codes.OK
+        booking_id = response.json()["id"]
+
+        response = await client.post(
+            app.url_path_for(
+                "approve_ride_booking", ride_id=ride.id, booking_id=booking_id
+            ),
+            headers=driver_headers,
+        )
+        assert response.status_code == codes.OK
+
+        response = await client.delete(
+            app.url_path_for("cancel_the_booking", booking_id=booking_id),
+            headers=default_user_headers,
+        )
+        assert response.status_code == codes.NO_CONTENT
+
+        for events in [drain(passenger_events), drain(driver_events)]:
+            assert [event_type for event_type, _ in events] == [
+                "booking.created",
+                "booking.approved",
+                "booking.cancelled",
+            ]
+            assert all(data["id"] == booking_id for _, data in events)
+            assert [data["approved"] for _, data in events] == [False, True, True]
+
+
+async def test_stream_user_events():
+    stream = stream_user_events(default_user_id)
+    assert await anext(stream) == ": subscribed\n\n"
+
+    await event_hub.publish(Event("booking.created", {"id": 1}), [default_user_id])
+    assert await anext(stream) == 'event: booking.created\ndata: {"id": 1}\n\n'
+    await stream.aclose()
+
+
+async def test_lagging_subscriber_is_disconnected():
+    hub = EventHub(LocalBackend(), queue_size=2)
+    await hub.start()
+    with hub.subscribe(1) as subscription:
+        for i in range(3):
+            await hub.publish(Event("booking.created", {"id": i}), [1, 2])
+        assert subscription.overflowed
+        assert (await subscription.get()).data == {"id": 0}
+        assert (await subscription.get()).data == {"id": 1}
+        assert await subscription.get() is None
+
+
+async def test_postgres_backend_fans_out_across_workers():
+    hubs = [
+        EventHub(PostgresBackend(sqlalchemy_database_uri, "test_events"), 10)
+        for _ in range(2)
+    ]
+    for hub in hubs:
+        await hub.start()
+    try:
+        with hubs[0].subscribe(1) as first, hubs[1].subscribe(1) as second:
+            await hubs[0].publish(Event("booking.created", {"id": 1}), [1])
+            for subscription in [first, second]:
+                event = await asyncio.wait_for(subscription.get(), 5)
+                assert event == Event("booking.created", {"id": 1})
+    finally:
+        for hub in hubs:
+            await hub.stop()
@@ -0,0 +1,127 @@
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+from httpx import AsyncClient, codes
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import geo
+from app.core.security import create_jwt_token
+from app.main import app
+from app.tests.conftest import create_driver
+
+MOSCOW = (55.7558, 37.6173)
+
+
+def offset(point: tuple[float, float], north_km: float, east_km: float) -> tuple:
+    lat, lon = point
+    return (
+        lat + north_km / geo.KM_PER_DEGREE,
+        lon + east_km / (geo.KM_PER_DEGREE * math.cos(math.radians(lat))),
+    )
+
+
+def test_encode():
+    assert geo.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geo.encode(*MOSCOW).startswith("ucfv0")
+
+
+def test_cover_contains_points_within_radius():
+    rng = random.Random(42)
+    centers = [MOSCOW, (0.0, 179.99), (-33.87, 151.21), (89.9, 10.0), (64.0, -0.01)]
+    for lat, lon in centers:
+        for radius_km in [0.5, 10, 50]:
+            cells = geo.cover(lat, lon, radius_km)
+            assert len(cells) <= geo.MAX_COVER_CELLS
+            for _ in range(300):
+                point_lat, point_lon = offset(
+                    (lat, lon),
+                    rng.uniform(-radius_km, radius_km),
+                    rng.uniform(-radius_km, radius_km),
+                )
+                point_lat = max(min(point_lat, 90.0), -90.0)
+                point_lon = (point_lon + 180) % 360 - 180
+                if geo.distance_km(lat, lon, point_lat, point_lon) > radius_km:
+                    continue
+                geohash = geo.encode(point_lat, point_lon)
+                assert any(geohash.startswith(cell) for cell in cells)
+
+
+async def test_search_nearby_rides(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    driver_headers = {
+        "Authorization": f"Bearer {create_jwt_token(driver.id, 60, refresh=False)[0]}"
+    }
+    departure_at = datetime.now(tz=timezone.utc) + timedelta(hours=2)
+
+    def ride(departure_point, arrival_point=None, **kwargs):
+        ride = {
+            "departure": "Moscow",
+            "arrival": "Tver",
+            "departure_at": departure_at.isoformat(),
+            "arrival_at": (departure_at + timedelta(hours=3)).isoformat(),
+            "seats": 2,
+            "price": 1000,
+            **kwargs,
+        }
+        if departure_point is not None:
+            ride["departure_lat"], ride["departure_lon"] = departure_point
+        if arrival_point is not None:
+            ride["arrival_lat"], ride["arrival_lon"] = arrival_point
+        return ride
+
+    tver = (56.8587, 35.9176)
+    rides = [
+        ride(offset(MOSCOW, 6, 5), tver),
+        ride(offset(MOSCOW, -1, 1)),
+        ride(offset(MOSCOW, 0, -12)),
+        ride(None, tver),
+        ride(
+            offset(MOSCOW, 1, 0),
+            departure_at=(departure_at - timedelta(days=1)).isoformat(),
+        ),
+    ]
+    response = await client.post(
+        app.url_path_for("create_rides"),
+        headers=driver_headers,
+        json={"rides": rides},
+    )
+    assert response.status_code == codes.OK
+    ids = response.json()["ids"]
+
+    response = await client.get(
+        app.url_path_for("search_nearby_rides"),
+        headers=default_user_headers,
+        params={"lat": MOSCOW[0], "lon": MOSCOW[1]},
+    )
+    assert response.status_code == codes.OK
+    items = response.json()["items"]
+    assert [item["id"] for item in items] == [ids[1], ids[0]]
+    assert [round(item["distance_km"], 1) for item in items] == [1.4, 7.8]
+
+    response = await client.get(
+        app.url_path_for("search_nearby_rides"),
+        headers=default_user_headers,
+        params={"lat": tver[0], "lon": tver[1], "radius_km": 1, "point": "arrival"},
+    )
+    assert [item["id"] for item in response.json()["items"]] == [ids[0], ids[3]]
+
+    for params in [
+        {"lat": MOSCOW[0], "lon": MOSCOW[1], "radius_km": 1000},
+        {"lat": 91, "lon": 0},
+    ]:
+        response = await client.get(
+            app.url_path_for("search_nearby_rides"),
+            headers=default_user_headers,
+            params=params,
+        )
+        assert response.status_code == codes.UNPROCESSABLE_ENTITY
+
+    response = await client.post(
+        app.url_path_for("create_ride"),
+        headers=driver_headers,
+        json={**rides[0], "arrival_lon": None},
+    )
+    assert response.status_code == codes.BAD_REQUEST
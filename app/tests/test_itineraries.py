@@ -0,0 +1,141 @@
+import random
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from httpx import AsyncClient, codes
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.itineraries import join_legs
+from app.main import app
+from app.tests.conftest import create_driver, create_ride
+
+
+def test_join_legs_matches_cross_product():
+    rng = random.Random(42)
+    cities = [1, 2, 3, 4, 5]
+    start = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    legs = []
+    for i in range(400):
+        departure, arrival = rng.sample(cities, 2)
+        departure_at = start + timedelta(minutes=rng.randrange(0, 48 * 60, 5))
+        legs.append(
+            SimpleNamespace(
+                id=i,
+                departure_place_id=departure,
+                arrival_place_id=arrival,
+                departure_at=departure_at,
+                arrival_at=departure_at + timedelta(minutes=rng.randrange(30, 300)),
+                price=rng.randrange(100, 1000),
+            )
+        )
+    first_legs = [
+        leg for leg in legs if leg.departure_place_id == 1 and leg.arrival_place_id != 3
+    ]
+    second_legs = [leg for leg in legs if leg.arrival_place_id == 3]
+    min_layover, max_layover = timedelta(minutes=15), timedelta(hours=4)
+
+    for order_by in ["duration", "price"]:
+        expected = sorted(
+            (
+                (first, second)
+                for first in first_legs
+                for second in second_legs
+                if second.departure_place_id == first.arrival_place_id
+                and min_layover <= second.departure_at - first.arrival_at <= max_layover
+            ),
+            key=lambda pair: (
+                (
+                    pair[1].arrival_at - pair[0].departure_at,
+                    pair[0].price + pair[1].price,
+                )
+                if order_by == "duration"
+                else (
+                    pair[0].price + pair[1].price,
+                    pair[1].arrival_at - pair[0].departure_at,
+                )
+            )
+            + (pair[0].id, pair[1].id),
+        )[:20]
+        assert len(expected) == 20
+        found = join_legs(
+            first_legs, second_legs, min_layover, max_layover, 20, order_by
+        )
+        assert [(item.first, item.second) for item in found] == expected
+
+
+async def test_search_itineraries(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    day = datetime.now(tz=timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    ) + timedelta(days=2)
+
+    async def ride(departure, arrival, hour, minute, hours, price, **kwargs):
+        departure_at = day + timedelta(hours=hour, minutes=minute)
+        return await create_ride(
+            session,
+            driver,
+            departure=departure,
+            arrival=arrival,
+            departure_at=departure_at,
+            arrival_at=departure_at + timedelta(hours=hours),
+            price=price,
+            **kwargs,
+        )
+
+    to_tver = await ride("Moscow", "Tver", 10, 0, 3, 1000)
+    # spellings of the same place connect
+    tver_to_pskov = await ride("TVER ", "Pskov", 13, 30, 5, 500)
+    # layover too short, too long, no free seats
+    await ride("Tver", "Pskov", 13, 5, 3, 100)
+    await ride("Tver", "Pskov", 18, 0, 3, 100)
+    await ride("Tver", "Pskov", 14, 0, 3, 100, seats=2, seats_taken=2)
+    to_klin = await ride("Moscow", "Klin", 9, 0, 2, 100)
+    klin_to_pskov = await ride("Klin", "Pskov", 12, 0, 7, 100)
+    # direct rides are not legs
+    await ride("Moscow", "Pskov", 9, 0, 9, 100)
+    await ride("Pskov", "Moscow", 19, 0, 9, 100)
+
+    params = {
+        "departure": "moscow",
+        "arrival": "Pskov",
+        "departure_from": day.isoformat(),
+        "departure_to": (day + timedelta(days=1)).isoformat(),
+    }
+    for order_by, expected in [
+        ("duration", [(to_tver, tver_to_pskov), (to_klin, klin_to_pskov)]),
+        ("price", [(to_klin, klin_to_pskov), (to_tver, tver_to_pskov)]),
+    ]:
+        response = await client.get(
+            app.url_path_for("search_itineraries"),
+            headers=default_user_headers,
+            params={**params, "order_by": order_by},
+        )
+        assert response.status_code == codes.OK
+        items = response.json()["items"]
+        assert [tuple(leg["id"] for leg in item["legs"]) for item in items] == [
+            (first.id, second.id) for first, second in expected
+        ]
+
+    assert items[1] == {
+        "legs": items[1]["legs"],
+        "price": 1500,
+        "duration_minutes": 8 * 60 + 30,
+        "layover_minutes": 30,
+    }
+
+    response = await client.get(
+        app.url_path_for("search_itineraries"),
+        headers=default_user_headers,
+        params={**params, "arrival": "Moscow"},
+    )
+    assert response.status_code == codes.BAD_REQUEST
+
+    response = await client.get(
+        app.url_path_for("search_itineraries"),
+        headers=default_user_headers,
+        params={**params, "arrival": "Kazan"},
+    )
+    assert response.status_code == codes.OK
+    assert response.json()["items"] == []
@@ -0,0 +1,291 @@
+import asyncio
+import json
+
+from httpx import AsyncClient, codes
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.chat import upsert_message_threads
+from app.core.security import create_jwt_token
+from app.main import app
+from app.models import Booking, Messages, MessageThread, User
+from app.tests.conftest import create_driver, create_ride, default_user_id
+
+
+async def send(client: AsyncClient, headers: dict, **message) -> dict:
+    response = await client.post(
+        app.url_path_for("send_message"), headers=headers, json=message
+    )
+    assert response.status_code == codes.OK
+    return response.json()
+
+
+async def test_conversation_and_threads(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    driver_headers = {
+        "Authorization": f"Bearer {create_jwt_token(driver.id, 60, refresh=False)[0]}"
+    }
+    rides = [await create_ride(session, driver) for _ in range(2)]
+    for ride in rides:
+        session.add(
+            Booking(
+                ride_id=ride.id, passenger_id=default_user_id, approved=True, seats=1
+            )
+        )
+    await session.commit()
+
+    sent = []
+    for i in range(3):
+        sent.append(
+            await send(
+                client,
+                default_user_headers,
+                ride_id=rides[0].id,
+                recipient_id=driver.id,
+                message_text=f"question {i}",
+            )
+        )
+    sent.append(
+        await send(
+            client,
+            driver_headers,
+            ride_id=rides[1].id,
+            recipient_id=default_user_id,
+            message_text="answer",
+        )
+    )
+
+    # conversation of a ride, newest first, by pages
+    found = []
+    params = {"limit": 2}
+    while True:
+        response = await client.get(
+            app.url_path_for("read_current_user_ride_messages", ride_id=rides[0].id),
+            headers=driver_headers,
+            params=params,
+        )
+        assert response.status_code == codes.OK
+        result = response.json()
+        found += [message["id"] for message in result["items"]]
+        if result["next_cursor"] is None:
+            break
+        params["cursor"] = result["next_cursor"]
+    assert found == [message["id"] for message in reversed(sent[:3])]
+
+    # driver's inbox, recently active thread first
+    response = await client.get(
+        app.url_path_for("read_current_user_message_threads"), headers=driver_headers
+    )
+    assert response.status_code == codes.OK
+    threads = response.json()["items"]
+    assert [thread["ride_id"] for thread in threads] == [rides[1].id, rides[0].id]
+    assert [thread["unread_count"] for thread in threads] == [0, 3]
+    assert threads[1]["peer_id"] == default_user_id
+    assert threads[1]["last_message"]["message_text"] == "question 2"
+
+    response = await client.post(
+        app.url_path_for(
+            "mark_message_thread_read", ride_id=rides[0].id, peer_id=default_user_id
+        ),
+        headers=driver_headers,
+    )
+    assert response.status_code == codes.NO_CONTENT
+    response = await client.get(
+        app.url_path_for("read_current_user_message_threads"),
+        headers=default_user_headers,
+        params={"limit": 1},
+    )
+    result = response.json()
+    assert [thread["unread_count"] for thread in result["items"]] == [1]
+    assert result["next_cursor"] is not None
+
+
+async def test_send_message_to_unrelated_user(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver)
+    stranger = User(email="stranger@example.com", first_name="S", last_name="S")
+    session.add(stranger)
+    await session.commit()
+
+    for recipient_id in [driver.id, stranger.id]:
+        response = await client.post(
+            app.url_path_for("send_message"),
+            headers=default_user_headers,
+            json={
+                "ride_id": ride.id,
+                "recipient_id": recipient_id,
+                "message_text": "hello",
+            },
+        )
+        assert response.status_code == codes.BAD_REQUEST
+
+
+async def test_thread_keeps_last_message_of_batches_out_of_order(
+    default_user: User, session: AsyncSession
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver)
+    messages = [
+        Messages(
+            sender_id=default_user.id,
+            recipient_id=driver.id,
+            ride_id=ride.id,
+            message_text=text,
+        )
+        for text in ["older", "newer"]
+    ]
+    session.add_all(messages)
+    await session.commit()
+    older, newer = messages
+
+    # the batch of the newer message commits first
+    await upsert_message_threads(session, [newer])
+    await upsert_message_threads(session, [older])
+    await session.commit()
+
+    thread = await session.scalar(
+        select(MessageThread).where(MessageThread.user_id == driver.id)
+    )
+    assert thread.last_message_id == newer.id
+    assert thread.unread_count == len(messages)
+
+
+class WebSocketClient:
+    """Drives the app over the ASGI WebSocket protocol
+
+    httpx test transport speaks HTTP only.
+    """
+
+    def __init__(self, token: str):
+        self.scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "path": app.url_path_for("chat"),
+            "raw_path": app.url_path_for("chat").encode(),
+            "query_string": f"token={token}".encode(),
+            "headers": [(b"host", b"localhost")],
+            "client": ("127.0.0.1", 50000),
+            "server": ("localhost", 80),
+            "subprotocols": [],
+        }
+        self._incoming: asyncio.Queue[dict] = asyncio.Queue()
+        self._outgoing: asyncio.Queue[dict] = asyncio.Queue()
+
+    async def __aenter__(self) -> "WebSocketClient":
+        self._task = asyncio.create_task(
+            app(self.scope, self._incoming.get, self._outgoing.put)
+        )
+        await self._incoming.put({"type": "websocket.connect"})
+        message = await self._receive()
+        if message["type"] != "websocket.accept":
+            self._task.cancel()
+            raise ConnectionRefusedError(message.get("code"))
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self._incoming.put({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait_for(self._task, 5)
+
+    async def _receive(self) -> dict:
+        return await asyncio.wait_for(self._outgoing.get(), 5)
+
+    async def send(self, message: dict) -> None:
+        await self._incoming.put({"type": "websocket.receive", **message})
+
+    async def send_json(self, data: dict) -> None:
+        await self.send({"text": json.dumps(data)})
+
+    async def receive_json(self) -> dict:
+        message = await self._receive()
+        assert message["type"] == "websocket.send", message
+        return json.loads(message["text"])
+
+
+async def test_websocket_chat(
+    client: AsyncClient, default_user: User, session: AsyncSession
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver)
+    session.add(
+        Booking(ride_id=ride.id, passenger_id=default_user.id, approved=True, seats=1)
+    )
+    await session.commit()
+    driver_token = create_jwt_token(driver.id, 60, refresh=False)[0]
+    passenger_token = create_jwt_token(default_user.id, 60, refresh=False)[0]
+
+    async with WebSocketClient(driver_token) as driver_ws, WebSocketClient(
+        passenger_token
+    ) as passenger_ws:
+        for i in range(3):
+            await passenger_ws.send_json(
+                {
+                    "type": "message.send",
+                    "client_id": f"m{i}",
+                    "ride_id": ride.id,
+                    "recipient_id": driver.id,
+                    "message_text": f"question {i}",
+                }
+            )
+        received = [await driver_ws.receive_json() for _ in range(3)]
+        assert [event["type"] for event in received] == ["message.created"] * 3
+        assert [event["data"]["message_text"] for event in received] == [
+            f"question {i}" for i in range(3)
+        ]
+
+        # sender gets its own messages and acknowledgements with ids
+        events = [await passenger_ws.receive_json() for _ in range(6)]
+        acks = {
+            event["data"]["client_id"]: event["data"]["id"]
+            for event in events
+            if event["type"] == "message.sent"
+        }
+        assert acks == {f"m{i}": received[i]["data"]["id"] for i in range(3)}
+
+        await driver_ws.send_json(
+            {
+                "client_id": "bad",
+                "ride_id": ride.id,
+                "recipient_id": driver.id,
+                "message_text": "to myself",
+            }
+        )
+        assert await driver_ws.receive_json() == {
+            "type": "error",
+            "data": {"client_id": "bad", "detail": "Recipient not allowed"},
+        }
+
+        # malformed frames are answered with errors, the socket stays open
+        for frame in [{"text": "not json"}, {"bytes": b"{}"}]:
+            await driver_ws.send(frame)
+            assert await driver_ws.receive_json() == {
+                "type": "error",
+                "data": {"client_id": None, "detail": "Invalid message"},
+            }
+        await driver_ws.send_json({"client_id": "empty"})
+        assert await driver_ws.receive_json() == {
+            "type": "error",
+            "data": {"client_id": "empty", "detail": "Invalid message"},
+        }
+
+    # persisted with the inbox updated
+    response = await client.get(
+        app.url_path_for("read_current_user_message_threads"),
+        headers={"Authorization": f"Bearer {driver_token}"},
+    )
+    threads = response.json()["items"]
+    assert [thread["unread_count"] for thread in threads] == [3]
+
+
+async def test_websocket_chat_requires_token(client: AsyncClient):
+    try:
+        async with WebSocketClient("invalid"):
+            pass
+    except ConnectionRefusedError as exc:
+        assert exc.args == (1008,)
+    else:
+        raise AssertionError("connection accepted")
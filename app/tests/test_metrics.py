@@ -0,0 +1,51 @@
+import pytest
+from httpx import AsyncClient, codes
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.metrics import (
+    DB_POOL_SATURATION,
+    DB_POOL_TIMEOUTS,
+    InstrumentedQueuePool,
+    instrument_engine,
+)
+from app.core.session import sqlalchemy_database_uri
+from app.main import app
+
+
+async def test_pool_metrics_published(client: AsyncClient, default_user_headers):
+    await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+
+    response = await client.get(app.url_path_for("read_metrics"))
+    assert response.status_code == codes.OK
+    assert "db_pool_checkout_duration_seconds_count" in response.text
+    assert "db_pool_checked_out_connections" in response.text
+    assert "db_pool_saturation" in response.text
+
+
+async def test_pool_saturation_and_timeout():
+    engine = create_async_engine(
+        sqlalchemy_database_uri,
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+        pool_logging_name="test",
+    )
+    instrument_engine(engine)
+    timeouts = DB_POOL_TIMEOUTS.labels(pool="test")._value.get()
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+            assert DB_POOL_SATURATION.labels(pool="test")._value.get() == 1.0
+
+            with pytest.raises(exc.TimeoutError):
+                async with engine.connect():
+                    pass
+            assert DB_POOL_TIMEOUTS.labels(pool="test")._value.get() == timeouts + 1
+
+        assert DB_POOL_SATURATION.labels(pool="test")._value.get() == 0.0
+    finally:
+        await engine.dispose()
@@ -0,0 +1,134 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from httpx import AsyncClient, codes
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import ride_search_cache
+from app.core.places import SYNC_OVERLAP, PlaceTrie, normalize_place, place_index
+from app.core.security import create_jwt_token
+from app.main import app
+from app.models import Place, PlaceName
+from app.place_alias import main as place_alias
+from app.tests.conftest import create_driver
+
+
+def edit_distance(a: str, b: str) -> int:
+    row = list(range(len(b) + 1))
+    for i, a_char in enumerate(a, start=1):
+        previous, row[0] = row[0], i
+        for j, b_char in enumerate(b, start=1):
+            previous, row[j] = row[j], min(
+                row[j] + 1, row[j - 1] + 1, previous + (a_char != b_char)
+            )
+    return row[-1]
+
+
+def test_normalize_place():
+    assert normalize_place(" Москва ") == "москва"
+    assert normalize_place("МОСКВА") == "москва"
+    assert normalize_place("Ростов-на-Дону") == "ростов на дону"
+    assert normalize_place("Орёл") == normalize_place("Орел")
+    assert normalize_place("St.  Petersburg") == "st petersburg"
+
+
+def test_trie_suggest_matches_brute_force():
+    rng = random.Random(42)
+    # fewer names than completions kept per node, so none is cut off
+    names = {"".join(rng.choices("abc", k=rng.randint(1, 7))) for _ in range(12)}
+    trie = PlaceTrie()
+    for place_id, name in enumerate(sorted(names)):
+        trie.insert(name, place_id)
+    for _ in range(300):
+        # the first character is never a typo
+        query = "".join(rng.choices("abcd", k=rng.randint(1, 6)))
+        typos, limit = rng.randint(0, 2), rng.randint(1, len(names))
+        expected = []
+        for name in names:
+            if name[0] != query[0]:
+                continue
+            edits = min(
+                edit_distance(query, name[:end]) for end in range(1, len(name) + 1)
+            )
+            if edits <= typos:
+                expected.append((edits, len(name), name))
+        suggestions = trie.suggest(query, typos, limit)
+        assert [item[:2] for item in suggestions] == [
+            (edits, name) for edits, _, name in sorted(expected)[:limit]
+        ]
+
+
+async def test_get_or_create_name_below_synced_window(session: AsyncSession):
+    # committed by another worker out of id order, before the synced window
+    place = Place(name="Kazan")
+    session.add(place)
+    await session.flush()
+    name = PlaceName(normalized="kazan", place_id=place.id)
+    session.add(name)
+    await session.commit()
+    place_index._synced_id = name.id + SYNC_OVERLAP + 1
+
+    assert await place_index.get_or_create(["KAZAN"]) == {"KAZAN": place.id}
+
+
+async def test_autocomplete_and_search_by_place(
+    client: AsyncClient, default_user_headers, session: AsyncSession, query_budget
+):
+    driver = await create_driver(session)
+    driver_headers = {
+        "Authorization": f"Bearer {create_jwt_token(driver.id, 60, refresh=False)[0]}"
+    }
+    departure_at = datetime.now(tz=timezone.utc) + timedelta(hours=2)
+    rides = [
+        {
+            "departure": departure,
+            "arrival": "Tver",
+            "departure_at": departure_at.isoformat(),
+            "arrival_at": (departure_at + timedelta(hours=3)).isoformat(),
+            "seats": 2,
+            "price": 1000,
+        }
+        for departure in ["Moscow", "moscow ", "Москва", "Moscow Oblast"]
+    ]
+    response = await client.post(
+        app.url_path_for("create_rides"),
+        headers=driver_headers,
+        json={"rides": rides},
+    )
+    assert response.status_code == codes.OK
+    ids = response.json()["ids"]
+
+    async def search(departure: str) -> list[int]:
+        response = await client.get(
+            app.url_path_for("search_rides"),
+            headers=default_user_headers,
+            params={"departure": departure, "arrival": "TVER"},
+        )
+        assert response.status_code == codes.OK
+        return [item["id"] for item in response.json()["items"]]
+
+    assert await search("MOSCOW") == ids[:2]
+    assert await search("Kazan") == []
+
+    async def autocomplete(q: str) -> list[str]:
+        response = await client.get(
+            app.url_path_for("autocomplete_places"),
+            headers=default_user_headers,
+            params={"q": q},
+        )
+        assert response.status_code == codes.OK
+        return [place["name"] for place in response.json()]
+
+    # current user only
+    with query_budget(1):
+        assert await autocomplete("mos") == ["Moscow", "Moscow Oblast"]
+    assert await autocomplete("Mosckow") == ["Moscow", "Moscow Oblast"]
+    assert await autocomplete("моск") == ["Москва"]
+    assert await autocomplete("kaz") == []
+
+    assert await place_alias("москва", "Moscow") == 0
+    # picked up by the next sync, cached searches expire by TTL
+    await place_index.sync(session)
+    ride_search_cache.clear()
+    assert await search("Москва") == ids[:3]
+    assert await autocomplete("моск") == ["Moscow"]
@@ -0,0 +1,174 @@
+"""
+SQL queries budgets of endpoints, catch N+1 and lazy load regressions.
+
+Budgets include loading of the current user, data has several bookings
+per ride and per user so per-row loading exceeds them.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from httpx import AsyncClient, codes
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import create_jwt_token
+from app.main import app
+from app.models import Booking, Ride, User, Vehicle, VehicleType
+from app.tests.conftest import create_driver, create_ride
+
+
+@pytest.fixture
+async def driver(session: AsyncSession) -> User:
+    return await create_driver(session)
+
+
+@pytest.fixture
+def driver_headers(driver: User) -> dict:
+    token = create_jwt_token(driver.id, 60, refresh=False)[0]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+async def rides(session: AsyncSession, driver: User, default_user: User) -> list[Ride]:
+    vehicle = Vehicle(
+        make="Lada",
+        model="Vesta",
+        color="white",
+        registration_date=date(2020, 1, 1),
+        type=VehicleType.SEDAN,
+        seats=4,
+        owner_id=driver.id,
+    )
+    session.add(vehicle)
+    await session.commit()
+
+    rides = [
+        await create_ride(session, driver, vehicle_id=vehicle.id, seats=4)
+        for _ in range(3)
+    ]
+    passengers = [
+        User(email=f"passenger{i}@example.com", first_name="P", last_name=str(i))
+        for i in range(3)
+    ]
+    session.add_all(passengers)
+    await session.commit()
+    for ride in rides:
+        for passenger in [default_user, *passengers]:
+            session.add(
+                Booking(
+                    ride_id=ride.id, passenger_id=passenger.id, approved=False, seats=1
+                )
+            )
+    await session.commit()
+    return rides
+
+
+async def test_read_ride_info_budget(
+    client: AsyncClient, default_user_headers, rides: list[Ride], query_budget
+):
+    with query_budget(1):
+        response = await client.get(
+            app.url_path_for("read_ride_info", ride_id=rides[0].id),
+            headers=default_user_headers,
+        )
+    assert response.status_code == codes.OK
+
+
+async def test_read_current_user_bookings_budget(
+    client: AsyncClient, default_user_headers, rides: list[Ride], query_budget
+):
+    # current user, fresh version of the user for ETag, bookings, rides
+    with query_budget(4):
+        response = await client.get(
+            app.url_path_for("read_current_user_bookings"),
+            headers=default_user_headers,
+        )
+    assert response.status_code == codes.OK
+    assert len(response.json()["items"]) == len(rides)
+
+
+async def test_book_ride_budget(
+    client: AsyncClient,
+    default_user_headers,
+    session: AsyncSession,
+    driver: User,
+    rides: list[Ride],
+    query_budget,
+):
+    ride = await create_ride(session, driver)
+    with query_budget(4):
+        response = await client.post(
+            app.url_path_for("book_ride"),
+            headers=default_user_headers,
+            params={"ride_id": ride.id, "requested_seats": 1},
+        )
+    assert response.status_code == codes.OK
+
+
+async def test_read_current_user_ride_bookings_budget(
+    client: AsyncClient, driver_headers, rides: list[Ride], query_budget
+):
+    with query_budget(3):
+        response = await client.get(
+            app.url_path_for("read_current_user_ride_bookings", ride_id=rides[0].id),
+            headers=driver_headers,
+        )
+    assert response.status_code == codes.OK
+    assert len(response.json()) == 4
+
+
+async def test_read_user_info_budget(
+    client: AsyncClient,
+    default_user_headers,
+    driver: User,
+    rides: list[Ride],
+    query_budget,
+):
+    with query_budget(2):
+        response = await client.get(
+            app.url_path_for("read_user_info", user_id=driver.id),
+            headers=default_user_headers,
+        )
+    assert response.status_code == codes.OK
+
+
+async def test_not_modified_ride_info_budget(
+    client: AsyncClient, default_user_headers, rides: list[Ride], query_budget
+):
+    url = app.url_path_for("read_ride_info", ride_id=rides[0].id)
+    response = await client.get(url, headers=default_user_headers)
+    etag = response.headers["ETag"]
+
+    # versions only, driver and vehicle are not loaded
+    with query_budget(1):
+        response = await client.get(
+            url, headers={**default_user_headers, "If-None-Match": etag}
+        )
+    assert response.status_code == codes.NOT_MODIFIED
+
+
+async def test_create_scheduled_rides_budget(
+    client: AsyncClient,
+    driver_headers,
+    rides: list[Ride],
+    query_budget,
+):
+    # current user, vehicle, one multi-row insert
+    with query_budget(3):
+        response = await client.post(
+            app.url_path_for("create_scheduled_rides"),
+            headers=driver_headers,
+            json={
+                "departure": "Moscow",
+                "arrival": "Tver",
+                "departure_time": "08:00:00",
+                "duration_minutes": 180,
+                "start_date": str(date.today()),
+                "end_date": str(date.today() + timedelta(days=90)),
+                "seats": 4,
+                "price": 500,
+                "vehicle_id": rides[0].vehicle_id,
+            },
+        )
+    assert response.status_code == codes.OK
+    assert len(response.json()["ids"]) >= 60
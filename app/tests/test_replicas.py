@@ -0,0 +1,158 @@
+import asyncio
+from collections.abc import AsyncGenerator
+
+import pytest
+from httpx import AsyncClient, codes
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api import deps
+from app.core import session as session_module
+from app.core.metrics import SINGLE_FLIGHT_CALLS
+from app.core.session import (
+    async_session,
+    create_engine,
+    recent_writers,
+    sqlalchemy_database_uri,
+)
+from app.main import app
+from app.models import User
+from app.tests.conftest import create_driver, create_ride
+
+
+@pytest.fixture
+async def replica_statements(monkeypatch) -> AsyncGenerator[list[str], None]:
+    """Statements executed on a replica, second engine on the test database"""
+    replica = create_engine(sqlalchemy_database_uri, "test_replica")
+    statements = []
+
+    @event.listens_for(replica.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    monkeypatch.setattr(session_module, "replica_engines", [replica])
+    recent_writers.clear()
+    yield statements
+    recent_writers.clear()
+    await replica.dispose()
+
+
+async def test_read_only_endpoints_use_replica(
+    client: AsyncClient,
+    default_user_headers,
+    session: AsyncSession,
+    replica_statements: list[str],
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver)
+
+    response = await client.get(
+        app.url_path_for("read_ride_info", ride_id=ride.id),
+        headers=default_user_headers,
+    )
+    assert response.status_code == codes.OK
+    assert any("FROM ride" in statement for statement in replica_statements)
+
+    replica_statements.clear()
+    response = await client.get(
+        app.url_path_for("search_rides"),
+        headers=default_user_headers,
+        params={"departure": "Moscow", "arrival": "Tver"},
+    )
+    assert response.status_code == codes.OK
+    assert len(response.json()["items"]) == 1
+    assert any("FROM ride" in statement for statement in replica_statements)
+    # revoked tokens are never read from a replica
+    assert not any("revoked_token" in statement for statement in replica_statements)
+
+
+async def test_writes_use_primary(
+    client: AsyncClient,
+    default_user_headers,
+    session: AsyncSession,
+    replica_statements: list[str],
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver)
+
+    response = await client.post(
+        app.url_path_for("book_ride"),
+        headers=default_user_headers,
+        params={"ride_id": ride.id, "requested_seats": 1},
+    )
+    assert response.status_code == codes.OK
+    assert replica_statements == []
+
+
+async def test_reads_stick_to_primary_after_write(
+    client: AsyncClient,
+    default_user_headers,
+    replica_statements: list[str],
+):
+    response = await client.patch(
+        app.url_path_for("update_current_user_info"),
+        headers=default_user_headers,
+        json={"first_name": "Ciri"},
+    )
+    assert response.status_code == codes.OK
+
+    response = await client.get(
+        app.url_path_for("read_current_user_bookings"), headers=default_user_headers
+    )
+    assert response.status_code == codes.OK
+    assert replica_statements == []
+
+    recent_writers.clear()
+    response = await client.get(
+        app.url_path_for("read_current_user_bookings"), headers=default_user_headers
+    )
+    assert response.status_code == codes.OK
+    assert any("FROM booking" in statement for statement in replica_statements)
+
+
+async def test_shared_ride_merged_into_follower_session(
+    session: AsyncSession, replica_statements: list[str]
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver)
+    shared = SINGLE_FLIGHT_CALLS.labels(
+        function="_load_shared_ride_detailed", result="shared"
+    )
+    shared_calls = shared._value.get()
+
+    async def read(use_replica: bool):
+        async with async_session() as reader:
+            reader.info["use_replica"] = use_replica
+            loaded = await deps.get_valid_ride_detailed(ride.id, reader)
+            assert loaded in reader
+            assert loaded.driver in reader
+            return loaded
+
+    rides = await asyncio.gather(read(True), read(True), read(False))
+    assert shared._value.get() == shared_calls + 1
+    assert len({id(loaded) for loaded in rides}) == len(rides)
+    assert [loaded.driver.first_name for loaded in rides] == ["Ivan"] * 3
+
+
+async def test_ride_read_of_recent_writer_uses_primary(
+    client: AsyncClient,
+    default_user: User,
+    default_user_headers,
+    session: AsyncSession,
+    replica_statements: list[str],
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver)
+    recent_writers.set(default_user.id, True)
+
+    response = await client.get(
+        app.url_path_for("read_ride_info", ride_id=ride.id),
+        headers=default_user_headers,
+    )
+    assert response.status_code == codes.OK
+    assert replica_statements == []
+
+    # anonymous reads are not sticky
+    response = await client.get(app.url_path_for("read_ride_info", ride_id=ride.id))
+    assert response.status_code == codes.OK
+    assert any("FROM ride" in statement for statement in replica_statements)
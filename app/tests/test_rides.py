@@ -0,0 +1,345 @@
+from datetime import date, datetime, timedelta, timezone
+
+from httpx import AsyncClient, codes
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import ride_search_cache
+from app.core.events import event_hub
+from app.core.security import create_jwt_token
+from app.main import app
+from app.models import Ride, Vehicle, VehicleType
+from app.tests.conftest import create_driver, create_ride
+
+
+async def test_search_rides_filters(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    now = datetime.now(tz=timezone.utc)
+    ride = await create_ride(session, driver, departure_at=now + timedelta(days=2))
+    await create_ride(session, driver, departure_at=now - timedelta(days=1))
+    await create_ride(session, driver, arrival="Kazan")
+    await create_ride(session, driver, price=5000)
+    await create_ride(session, driver, seats=1, seats_taken=1)
+
+    response = await client.get(
+        app.url_path_for("search_rides"),
+        headers=default_user_headers,
+        params={"departure": "Moscow", "arrival": "Tver", "max_price": 2000},
+    )
+    assert response.status_code == codes.OK
+    result = response.json()
+    assert [item["id"] for item in result["items"]] == [ride.id]
+    assert result["items"][0]["free_seats"] == 3
+    assert result["next_cursor"] is None
+
+
+async def test_search_rides_keyset_pagination(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    now = datetime.now(tz=timezone.utc)
+    rides = [
+        await create_ride(
+            session, driver, departure_at=now + timedelta(hours=i), price=1000 - i
+        )
+        for i in range(1, 6)
+    ]
+
+    for order_by, expected in [
+        ("departure_at", rides),
+        ("price", list(reversed(rides))),
+    ]:
+        params = {
+            "departure": "Moscow",
+            "arrival": "Tver",
+            "order_by": order_by,
+            "limit": 2,
+        }
+        found = []
+        while True:
+            response = await client.get(
+                app.url_path_for("search_rides"),
+                headers=default_user_headers,
+                params=params,
+            )
+            assert response.status_code == codes.OK
+            result = response.json()
+            assert len(result["items"]) <= 2
+            found += [item["id"] for item in result["items"]]
+            if result["next_cursor"] is None:
+                break
+            params["cursor"] = result["next_cursor"]
+
+        assert found == [ride.id for ride in expected]
+
+
+async def test_search_rides_invalid_cursor(client: AsyncClient, default_user_headers):
+    response = await client.get(
+        app.url_path_for("search_rides"),
+        headers=default_user_headers,
+        params={"departure": "Moscow", "arrival": "Tver", "cursor": "garbage"},
+    )
+    assert response.status_code == codes.BAD_REQUEST
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+async def test_search_rides_metrics(client: AsyncClient, default_user_headers):
+    await client.get(
+        app.url_path_for("search_rides"),
+        headers=default_user_headers,
+        params={"departure": "Moscow", "arrival": "Tver"},
+    )
+
+    response = await client.get(app.url_path_for("read_metrics"))
+    assert response.status_code == codes.OK
+    assert (
+        'http_request_db_queries_count{method="GET",route="/rides/search"}'
+        in response.text
+    )
+
+
+async def test_search_rides_invalidated_in_other_workers(
+    client: AsyncClient, default_user_headers, session: AsyncSession, monkeypatch
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver, seats=1)
+    params = {"departure": "Moscow", "arrival": "Tver"}
+
+    async def search():
+        response = await client.get(
+            app.url_path_for("search_rides"),
+            headers=default_user_headers,
+            params=params,
+        )
+        assert response.status_code == codes.OK
+        return [item["id"] for item in response.json()["items"]]
+
+    assert await search() == [ride.id]
+    # another worker has the same response cached
+    cached = [
+        (key, value, ride_search_cache._key_tags.get(key, ()))
+        for key, (_, value) in ride_search_cache._data.items()
+    ]
+    assert cached
+
+    # messages are held back and dispatched as by the backend of that worker
+    messages = []
+
+    async def publish(batch: list[str]) -> None:
+        messages.extend(batch)
+
+    monkeypatch.setattr(event_hub.backend, "publish", publish)
+    response = await client.post(
+        app.url_path_for("book_ride"),
+        headers=default_user_headers,
+        params={"ride_id": ride.id, "requested_seats": 1},
+    )
+    assert response.status_code == codes.OK
+    for key, value, tags in cached:
+        ride_search_cache.set(key, value, tags=tags)
+    assert await search() == [ride.id]
+
+    for message in messages:
+        event_hub._dispatch_message(message)
+    assert await search() == []
+
+
+async def test_search_rides_cached_until_route_changes(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver, seats=1)
+    await create_ride(session, driver, arrival="Kazan")
+    params = {"departure": "Moscow", "arrival": "Tver"}
+    hits = ride_search_cache.hits
+
+    async def search(params):
+        response = await client.get(
+            app.url_path_for("search_rides"),
+            headers=default_user_headers,
+            params=params,
+        )
+        assert response.status_code == codes.OK
+        return [item["id"] for item in response.json()["items"]]
+
+    assert await search(params) == [ride.id]
+    assert await search(params) == [ride.id]
+    assert ride_search_cache.hits == hits + 1
+    assert ride_search_cache.stats()["hit_rate"] > 0
+
+    # booking of another route keeps the cached response
+    kazan_params = {"departure": "Moscow", "arrival": "Kazan"}
+    await search(kazan_params)
+    response = await client.post(
+        app.url_path_for("book_ride"),
+        headers=default_user_headers,
+        params={"ride_id": (await search(kazan_params))[0], "requested_seats": 1},
+    )
+    assert response.status_code == codes.OK
+    assert await search(params) == [ride.id]
+    assert ride_search_cache.hits == hits + 3
+
+    # the last free seat of the route ride is taken
+    response = await client.post(
+        app.url_path_for("book_ride"),
+        headers=default_user_headers,
+        params={"ride_id": ride.id, "requested_seats": 1},
+    )
+    assert response.status_code == codes.OK
+    assert await search(params) == []
+    assert ride_search_cache.hits == hits + 3
+
+    booking_id = response.json()["id"]
+    response = await client.delete(
+        app.url_path_for("cancel_the_booking", booking_id=booking_id),
+        headers=default_user_headers,
+    )
+    assert response.status_code == codes.NO_CONTENT
+    assert await search(params) == [ride.id]
+
+
+async def test_read_current_user_rides_by_period(
+    client: AsyncClient, session: AsyncSession
+):
+    driver = await create_driver(session)
+    headers = {
+        "Authorization": f"Bearer {create_jwt_token(driver.id, 60, refresh=False)[0]}"
+    }
+    now = datetime.now(tz=timezone.utc)
+    past = [
+        await create_ride(session, driver, departure_at=now - timedelta(days=i))
+        for i in range(1, 4)
+    ]
+    upcoming = [
+        await create_ride(session, driver, departure_at=now + timedelta(days=i))
+        for i in range(1, 4)
+    ]
+
+    for period, expected in [
+        ("upcoming", upcoming),
+        ("past", past),
+        (None, list(reversed(upcoming)) + past),
+    ]:
+        params = {"limit": 2}
+        if period is not None:
+            params["period"] = period
+        found = []
+        while True:
+            response = await client.get(
+                app.url_path_for("read_current_user_rides"),
+                headers=headers,
+                params=params,
+            )
+            assert response.status_code == codes.OK
+            result = response.json()
+            assert len(result["items"]) <= 2
+            found += [item["id"] for item in result["items"]]
+            if result["next_cursor"] is None:
+                break
+            params["cursor"] = result["next_cursor"]
+        assert found == [ride.id for ride in expected]
+
+
+async def test_create_rides_bulk(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    driver = await create_driver(session)
+    vehicle = Vehicle(
+        make="Lada",
+        model="Vesta",
+        color="white",
+        registration_date=date(2020, 1, 1),
+        type=VehicleType.SEDAN,
+        seats=4,
+        owner_id=driver.id,
+    )
+    session.add(vehicle)
+    await session.commit()
+    departure_at = datetime.now(tz=timezone.utc) + timedelta(days=1)
+    rides = [
+        {
+            "departure": "Moscow",
+            "arrival": arrival,
+            "departure_at": (departure_at + timedelta(hours=i)).isoformat(),
+            "arrival_at": (departure_at + timedelta(hours=i + 3)).isoformat(),
+            "seats": 3,
+            "price": 1000,
+            "vehicle_id": vehicle.id,
+        }
+        for i, arrival in enumerate(["Tver", "Klin", "Tver"])
+    ]
+
+    # vehicles of other users are rejected, nothing is created
+    response = await client.post(
+        app.url_path_for("create_rides"),
+        headers=default_user_headers,
+        json={"rides": rides},
+    )
+    assert response.status_code == codes.BAD_REQUEST
+
+    response = await client.post(
+        app.url_path_for("create_rides"),
+        headers={
+            "Authorization": f"Bearer {create_jwt_token(driver.id, 60, False)[0]}"
+        },
+        json={"rides": rides},
+    )
+    assert response.status_code == codes.OK
+    ids = response.json()["ids"]
+    created = (
+        await session.scalars(select(Ride).where(Ride.id.in_(ids)).order_by(Ride.id))
+    ).all()
+    assert [ride.id for ride in created] == ids
+    assert [ride.arrival for ride in created] == ["Tver", "Klin", "Tver"]
+    assert {(ride.driver_id, ride.seats_taken, ride.version) for ride in created} == {
+        (driver.id, 0, 1)
+    }
+
+
+async def test_create_scheduled_rides(
+    client: AsyncClient, default_user_headers, session: AsyncSession
+):
+    schedule = {
+        "departure": "Moscow",
+        "arrival": "Tver",
+        "departure_time": "08:00:00",
+        "duration_minutes": 150,
+        # Monday to Sunday
+        "start_date": "2100-03-01",
+        "end_date": "2100-03-07",
+        "weekdays": [1, 3, 5],
+        "time_zone": "Europe/Moscow",
+        "seats": 3,
+        "price": 500,
+    }
+    response = await client.post(
+        app.url_path_for("create_scheduled_rides"),
+        headers=default_user_headers,
+        json=schedule,
+    )
+    assert response.status_code == codes.OK
+    ids = response.json()["ids"]
+    created = (
+        await session.scalars(select(Ride).where(Ride.id.in_(ids)).order_by(Ride.id))
+    ).all()
+    assert [ride.departure_at for ride in created] == [
+        datetime(2100, 3, day, 5, tzinfo=timezone.utc) for day in [1, 3, 5]
+    ]
+    assert {ride.arrival_at - ride.departure_at for ride in created} == {
+        timedelta(minutes=150)
+    }
+
+    for changes in [
+        {"end_date": "2100-02-28"},
+        {"time_zone": "Mars/Olympus"},
+        {"start_date": "2000-01-01", "end_date": "2000-12-31"},
+        {"end_date": "2110-01-01"},
+    ]:
+        response = await client.post(
+            app.url_path_for("create_scheduled_rides"),
+            headers=default_user_headers,
+            json={**schedule, **changes},
+        )
+        assert response.status_code == codes.BAD_REQUEST
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+
+from httpx import AsyncClient, codes
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.check_ride_seats import main as check_ride_seats
+from app.core.security import create_jwt_token
+from app.main import app
+from app.models import Ride, User
+from app.tests.conftest import create_driver
+
+
+def headers(user: User) -> dict:
+    token = create_jwt_token(user.id, 60, refresh=False)[0]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def test_book_multi_stop_ride_segments(
+    client: AsyncClient, default_user, session: AsyncSession
+):
+    driver = await create_driver(session)
+    passengers = [
+        User(email=f"passenger{i}@example.com", first_name="P", last_name=str(i))
+        for i in range(2)
+    ]
+    session.add_all(passengers)
+    await session.commit()
+
+    departure_at = datetime.now(tz=timezone.utc) + timedelta(days=1)
+    ride_create = {
+        "departure": "Moscow",
+        "arrival": "St Petersburg",
+        "departure_at": departure_at.isoformat(),
+        "arrival_at": (departure_at + timedelta(hours=8)).isoformat(),
+        "seats": 2,
+        "price": 2000,
+        "with_approval": False,
+        "stops": [
+            {
+                "place": "Tver",
+                "departure_at": (departure_at + timedelta(hours=3)).isoformat(),
+            }
+        ],
+    }
+    response = await client.post(
+        app.url_path_for("create_ride"),
+        headers=headers(driver),
+        json={
+            **ride_create,
+            "stops": [{"place": "Tver", "departure_at": ride_create["arrival_at"]}],
+        },
+    )
+    assert response.status_code == codes.BAD_REQUEST
+    response = await client.post(
+        app.url_path_for("create_ride"), headers=headers(driver), json=ride_create
+    )
+    assert response.status_code == codes.OK
+    ride_id = response.json()["id"]
+    assert [stop["place"] for stop in response.json()["stops"]] == ["Tver"]
+
+    async def book(user: User, seats: int, from_stop: int, to_stop: int):
+        return await client.post(
+            app.url_path_for("book_ride"),
+            headers=headers(user),
+            params={
+                "ride_id": ride_id,
+                "requested_seats": seats,
+                "from_stop": from_stop,
+                "to_stop": to_stop,
+            },
+        )
+
+    # Moscow→Tver and Tver→St Petersburg seats are sold separately
+    response = await book(default_user, 2, 0, 1)
+    assert response.status_code == codes.OK
+    booking = response.json()
+    assert (booking["from_stop"], booking["to_stop"]) == (0, 1)
+    assert (await book(passengers[0], 2, 1, 2)).status_code == codes.OK
+    assert (await book(passengers[1], 1, 0, 2)).status_code == codes.BAD_REQUEST
+    assert (await book(passengers[1], 1, 1, 1)).status_code == codes.BAD_REQUEST
+    assert (await book(passengers[1], 1, 0, 3)).status_code == codes.BAD_REQUEST
+
+    response = await client.get(
+        app.url_path_for("read_ride_info", ride_id=ride_id),
+        headers=headers(passengers[1]),
+    )
+    assert response.status_code == codes.OK
+    assert response.json()["free_seats"] == 0
+    assert response.json()["segments_free_seats"] == [0, 0]
+    assert [stop["position"] for stop in response.json()["stops"]] == [1]
+
+    async def seats_taken() -> tuple:
+        query = select(Ride.seats_taken, Ride.segments_taken).where(Ride.id == ride_id)
+        return tuple((await session.execute(query)).one())
+
+    response = await client.delete(
+        app.url_path_for("cancel_the_booking", booking_id=booking["id"]),
+        headers=headers(default_user),
+    )
+    assert response.status_code == codes.NO_CONTENT
+    assert await seats_taken() == (2, [0, 2])
+    assert (await book(passengers[1], 1, 0, 1)).status_code == codes.OK
+    assert await seats_taken() == (2, [1, 2])
+    assert await check_ride_seats() == 0
+
+    response = await client.delete(
+        app.url_path_for("delete_current_user"), headers=headers(passengers[0])
+    )
+    assert response.status_code == codes.NO_CONTENT
+    assert await seats_taken() == (1, [1, 0])
+    assert await check_ride_seats() == 0
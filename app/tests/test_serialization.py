@@ -0,0 +1,124 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from httpx import AsyncClient, codes
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import JSONResponse
+
+from app.core.security import create_jwt_token
+from app.core.serialization import dump_json
+from app.main import app
+from app.models import Booking, Ride, User, Vehicle, VehicleType
+from app.schemas.base import DATETIME_FORMAT, convert_datetime_to_gmt
+from app.schemas.responses import (
+    BookingDetailedResponse,
+    RideDetailedResponse,
+    RidePageResponse,
+    RideResponse,
+)
+from app.tests.conftest import create_driver, create_ride
+
+
+async def default_render(annotation, content) -> bytes:
+    field = create_response_field(name="response", type_=annotation)
+    content = await serialize_response(field=field, response_content=content)
+    return JSONResponse(content).body
+
+
+@pytest.mark.parametrize(
+    "dt",
+    [
+        datetime(2023, 11, 5, 10, 0, 0, 123456, tzinfo=timezone.utc),
+        datetime(2023, 11, 5, 10, 0, 0, 123456),
+        datetime(2023, 11, 5, 10, 0, tzinfo=timezone(timedelta(hours=3))),
+        datetime(2023, 11, 5, 10, 0, tzinfo=timezone(-timedelta(hours=5, minutes=30))),
+        datetime(2023, 11, 5, 10, 0, tzinfo=timezone(timedelta(hours=1, seconds=5))),
+        datetime(999, 1, 1, tzinfo=timezone.utc),
+    ],
+)
+def test_convert_datetime_to_gmt(dt: datetime):
+    expected = (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).strftime(
+        DATETIME_FORMAT
+    )
+    assert convert_datetime_to_gmt(dt) == expected
+
+
+async def test_dump_json_same_as_default_response():
+    now = datetime.now(tz=timezone.utc)
+    driver = User(id=1, email="d@example.com", first_name="Йеннифэр", last_name="V")
+    passenger = User(id=2, email="p@example.com", first_name="P", last_name="Q")
+    passenger.rating = 4.75
+    vehicle = Vehicle(
+        id=1,
+        make="Lada",
+        model="Vesta",
+        color="white",
+        registration_date=date(2020, 1, 1),
+        type=VehicleType.SEDAN,
+        seats=4,
+        owner_id=1,
+    )
+    ride = Ride(
+        id=1,
+        created_at=now.replace(tzinfo=None),
+        departure="Москва",
+        arrival="Tver",
+        departure_at=now.astimezone(timezone(timedelta(hours=3))),
+        arrival_at=now + timedelta(hours=3),
+        seats=3,
+        seats_taken=1,
+        price=1000,
+        with_approval=False,
+        comment='"quoted" \\ comment',
+        driver=driver,
+        vehicle=vehicle,
+    )
+    bookings = [
+        Booking(
+            id=i,
+            ride_id=1,
+            passenger_id=2,
+            filled_at=now,
+            approved=bool(i % 2),
+            approved_at=now if i % 2 else None,
+            seats=1,
+            from_stop=0,
+            to_stop=1,
+            ride=ride,
+            passenger=passenger,
+        )
+        for i in range(3)
+    ]
+    detailed = RideDetailedResponse(
+        **vars(ride),
+        free_seats=ride.free_seats,
+        segments_free_seats=[ride.free_seats],
+    )
+
+    for annotation, content in [
+        (list[BookingDetailedResponse], bookings),
+        (list[RideResponse], [ride]),
+        (list[RideResponse], []),
+        (RideDetailedResponse, detailed),
+    ]:
+        assert dump_json(annotation, content) == await default_render(
+            annotation, content
+        )
+
+
+async def test_read_current_user_rides(client: AsyncClient, session: AsyncSession):
+    driver = await create_driver(session)
+    ride = await create_ride(session, driver)
+    await session.refresh(ride)
+    response = await client.get(
+        app.url_path_for("read_current_user_rides"),
+        headers={
+            "Authorization": f"Bearer {create_jwt_token(driver.id, 60, False)[0]}"
+        },
+    )
+    assert response.status_code == codes.OK
+    assert response.content == await default_render(
+        RidePageResponse, {"items": [ride], "next_cursor": None}
+    )
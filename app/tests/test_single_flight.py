@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.single_flight import single_flight
+
+
+async def test_concurrent_calls_share_one_execution():
+    calls = []
+    release = asyncio.Event()
+
+    @single_flight("ride_id")
+    async def load(ride_id: int, session: object = None) -> dict:
+        calls.append(ride_id)
+        await release.wait()
+        return {"id": ride_id}
+
+    tasks = [asyncio.create_task(load(1, session=object())) for _ in range(5)]
+    tasks.append(asyncio.create_task(load(2)))
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks)
+
+    assert sorted(calls) == [1, 2]
+    assert results[:5] == [{"id": 1}] * 5
+    assert all(result is results[0] for result in results[:5])
+
+    # nothing is kept after the call completes
+    assert await load(1) == {"id": 1}
+    assert calls.count(1) == 2
+
+
+async def test_exception_is_shared():
+    release = asyncio.Event()
+
+    @single_flight("ride_id")
+    async def load(ride_id: int) -> None:
+        await release.wait()
+        raise HTTPException(status_code=400, detail="not found")
+
+    tasks = [asyncio.create_task(load(1)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(result, HTTPException) for result in results)
+
+
+async def test_follower_runs_when_leader_is_cancelled():
+    calls = 0
+    release = asyncio.Event()
+
+    @single_flight("ride_id")
+    async def load(ride_id: int) -> int:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return calls
+
+    leader = asyncio.create_task(load(1))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(load(1))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await follower == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+def test_unknown_key_argument():
+    with pytest.raises(TypeError):
+
+        @single_flight("ride")
+        async def load(ride_id: int) -> None:
+            pass
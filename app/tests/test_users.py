@@ -2,11 +2,18 @@ from httpx import AsyncClient, codes
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import user_cache
+from app.core.events import event_hub
+from app.core.security import create_jwt_token
 from app.main import app
-from app.models import User
+from app.models import Booking, User
 from app.tests.conftest import (
+    create_driver,
+    create_ride,
     default_user_email,
+    default_user_first_name,
     default_user_id,
+    default_user_last_name,
     default_user_password_hash,
 )
 
@@ -19,6 +26,10 @@ async def test_read_current_user(client: AsyncClient, default_user_headers):
     assert response.json() == {
         "id": default_user_id,
         "email": default_user_email,
+        "first_name": default_user_first_name,
+        "last_name": default_user_last_name,
+        "rating": None,
+        "birthday": None,
     }
 
 
@@ -34,6 +45,38 @@ async def test_delete_current_user(
     assert user is None
 
 
+async def test_deleted_user_denied_by_other_workers(
+    client: AsyncClient, default_user_headers, monkeypatch
+):
+    response = await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    assert response.status_code == codes.OK
+    cached_user = user_cache.get(default_user_id)
+    assert cached_user is not None
+
+    # messages are held back and dispatched as by the backend of another
+    # worker, which still has the user cached
+    messages = []
+
+    async def publish(batch: list[str]) -> None:
+        messages.extend(batch)
+
+    monkeypatch.setattr(event_hub.backend, "publish", publish)
+    response = await client.delete(
+        app.url_path_for("delete_current_user"), headers=default_user_headers
+    )
+    assert response.status_code == codes.NO_CONTENT
+    user_cache.set(default_user_id, cached_user)
+    for message in messages:
+        event_hub._dispatch_message(message)
+
+    response = await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    assert response.status_code == codes.NOT_FOUND
+
+
 async def test_reset_current_user_password(
     client: AsyncClient, default_user_headers, session: AsyncSession
 ):
@@ -58,9 +101,79 @@ async def test_register_new_user(
         json={
             "email": "qwe@example.com",
             "password": "asdasdasd",
+            "first_name": "Qwe",
+            "last_name": "Asd",
         },
     )
     assert response.status_code == codes.OK
     result = await session.execute(select(User).where(User.email == "qwe@example.com"))
     user = result.scalars().first()
     assert user is not None
+
+
+async def test_read_current_user_cached(client: AsyncClient, default_user_headers):
+    hits = user_cache.hits
+    for _ in range(2):
+        response = await client.get(
+            app.url_path_for("read_current_user"), headers=default_user_headers
+        )
+        assert response.status_code == codes.OK
+    assert user_cache.hits == hits + 1
+    assert user_cache.get(default_user_id)["email"] == default_user_email
+
+
+async def test_update_current_user_info_invalidates_cache(
+    client: AsyncClient, default_user_headers
+):
+    await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    response = await client.patch(
+        app.url_path_for("update_current_user_info"),
+        headers=default_user_headers,
+        json={"first_name": "Ciri"},
+    )
+    assert response.status_code == codes.OK
+    assert user_cache.get(default_user_id) is None
+
+    response = await client.get(
+        app.url_path_for("read_current_user"), headers=default_user_headers
+    )
+    assert response.json()["first_name"] == "Ciri"
+
+
+async def test_read_user_info_of_ride_passenger(
+    client: AsyncClient, default_user: User, session: AsyncSession
+):
+    driver = await create_driver(session)
+    driver_headers = {
+        "Authorization": f"Bearer {create_jwt_token(driver.id, 60, refresh=False)[0]}"
+    }
+    stranger = User(email="stranger@example.com", first_name="S", last_name="S")
+    session.add(stranger)
+    await session.commit()
+
+    # neither has an active ride nor booked the driver's ride
+    response = await client.get(
+        app.url_path_for("read_user_info", user_id=default_user.id),
+        headers=driver_headers,
+    )
+    assert response.status_code == codes.BAD_REQUEST
+
+    ride = await create_ride(session, driver)
+    session.add(
+        Booking(ride_id=ride.id, passenger_id=default_user.id, approved=False, seats=1)
+    )
+    await session.commit()
+    response = await client.get(
+        app.url_path_for("read_user_info", user_id=default_user.id),
+        headers=driver_headers,
+    )
+    assert response.status_code == codes.OK
+    assert response.json()["id"] == default_user.id
+
+    response = await client.get(
+        app.url_path_for("read_user_info", user_id=stranger.id),
+        headers=driver_headers,
+    )
+    assert response.status_code == codes.BAD_REQUEST
@@ -0,0 +1,114 @@
+"""
+Booking contention benchmark.
+
+Creates a single ride and fires concurrent `POST /bookings` requests at it,
+one per passenger, through the ASGI app. Reports throughput and how many
+seats were sold over the ride capacity (must always be 0).
+
+It runs against the database from current settings (default database unless
+ENVIRONMENT=PYTEST) and removes everything it created when finished.
+
+python -m benchmarks.booking_contention --passengers 500 --seats 4
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from httpx import AsyncClient
+from sqlalchemy import delete, func, insert, select
+
+from app.core import security
+from app.core.session import async_session
+from app.main import app
+from app.models import Booking, Ride, User
+
+EMAIL_DOMAIN = "booking-contention.bench"
+
+
+async def setup(passengers: int, seats: int) -> tuple[int, list[int]]:
+    async with async_session() as session:
+        user_ids = await session.scalars(
+            insert(User).returning(User.id),
+            [
+                {
+                    "email": f"user{i}@{EMAIL_DOMAIN}",
+                    "first_name": "Bench",
+                    "last_name": str(i),
+                }
+                for i in range(passengers + 1)
+            ],
+        )
+        driver_id, *passenger_ids = user_ids.all()
+        departure_at = datetime.now(tz=timezone.utc) + timedelta(days=1)
+        ride = Ride(
+            departure="Moscow",
+            arrival="Tver",
+            departure_at=departure_at,
+            arrival_at=departure_at + timedelta(hours=3),
+            seats=seats,
+            price=1000,
+            with_approval=False,
+            driver_id=driver_id,
+        )
+        session.add(ride)
+        await session.commit()
+        return ride.id, passenger_ids
+
+
+async def teardown() -> None:
+    async with async_session() as session:
+        await session.execute(delete(User).where(User.email.endswith(EMAIL_DOMAIN)))
+        await session.commit()
+
+
+async def main(passengers: int, seats: int) -> None:
+    ride_id, passenger_ids = await setup(passengers, seats)
+    try:
+        tokens = [
+            security.create_jwt_token(passenger_id, 3600, refresh=False)[0]
+            for passenger_id in passenger_ids
+        ]
+        async with AsyncClient(app=app, base_url="http://localhost") as client:
+
+            async def book(token: str) -> int:
+                response = await client.post(
+                    app.url_path_for("book_ride"),
+                    params={"ride_id": ride_id, "requested_seats": 1},
+                    headers={"Authorization": f"Bearer {token}"},
+                )
+                return response.status_code
+
+            started = time.perf_counter()
+            statuses = await asyncio.gather(*(book(token) for token in tokens))
+            elapsed = time.perf_counter() - started
+
+        async with async_session() as session:
+            seats_taken = await session.scalar(
+                select(Ride.seats_taken).where(Ride.id == ride_id)
+            )
+            booked_seats = await session.scalar(
+                select(func.coalesce(func.sum(Booking.seats), 0)).where(
+                    Booking.ride_id == ride_id, Booking.approved.is_(True)
+                )
+            )
+    finally:
+        await teardown()
+
+    print(f"requests:      {len(statuses)}")
+    print(f"elapsed:       {elapsed:.3f}s")
+    print(f"throughput:    {len(statuses) / elapsed:.1f} req/s")
+    print(f"booked (200):  {statuses.count(200)}")
+    print(f"rejected(400): {statuses.count(400)}")
+    print(f"other:         {len(statuses) - statuses.count(200) - statuses.count(400)}")
+    print(f"seats:         {seats}, seats_taken: {seats_taken}, booked: {booked_seats}")
+    print(f"oversold:      {max(0, booked_seats - seats)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--passengers", type=int, default=300)
+    parser.add_argument("--seats", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.passengers, args.seats))
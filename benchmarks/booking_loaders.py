@@ -0,0 +1,177 @@
+"""
+Relationship loading benchmark of booking related endpoints.
+
+Seeds a passenger with a booking on every of `--rides` rides, each ride also
+has `--bookings` bookings of other passengers. For every endpoint reports
+SQL queries, ORM objects hydrated and latency of a single request.
+
+It runs against the database from current settings (default database unless
+ENVIRONMENT=PYTEST) and removes everything it created when finished.
+
+python -m benchmarks.booking_loaders --rides 200 --bookings 20
+"""
+
+import argparse
+import asyncio
+import math
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from httpx import AsyncClient
+from sqlalchemy import delete, event, insert
+
+from app.core import security
+from app.core.cache import user_cache
+from app.core.revocation import revoked_tokens
+from app.core.session import async_engine, async_session
+from app.main import app
+from app.models import Base, Booking, Ride, User
+
+EMAIL_DOMAIN = "booking-loaders.bench"
+REPEAT = 20
+
+counters = {"queries": 0, "objects": 0}
+
+
+def count_query(*args):
+    counters["queries"] += 1
+
+
+def count_object(*args):
+    counters["objects"] += 1
+
+
+async def setup(rides: int, bookings: int) -> tuple[int, int, list[int], list[int]]:
+    async with async_session() as session:
+        user_ids = (
+            await session.scalars(
+                insert(User).returning(User.id),
+                [
+                    {
+                        "email": f"user{i}@{EMAIL_DOMAIN}",
+                        "first_name": "Bench",
+                        "last_name": str(i),
+                    }
+                    for i in range(bookings + 2)
+                ],
+            )
+        ).all()
+        driver_id, passenger_id, *other_ids = user_ids
+        departure_at = datetime.now(tz=timezone.utc) + timedelta(days=1)
+        ride_ids = (
+            await session.scalars(
+                insert(Ride).returning(Ride.id),
+                [
+                    {
+                        "departure": "Moscow",
+                        "arrival": "Tver",
+                        "departure_at": departure_at,
+                        "arrival_at": departure_at + timedelta(hours=3),
+                        "seats": 4,
+                        "price": 1000,
+                        "with_approval": True,
+                        "driver_id": driver_id,
+                    }
+                    for _ in range(rides)
+                ],
+            )
+        ).all()
+        booking_ids = (
+            await session.scalars(
+                insert(Booking).returning(Booking.id),
+                [
+                    {
+                        "ride_id": ride_id,
+                        "passenger_id": user_id,
+                        "approved": False,
+                        "seats": 1,
+                    }
+                    for ride_id in ride_ids
+                    for user_id in [passenger_id, *other_ids]
+                ],
+            )
+        ).all()
+        await session.commit()
+        return driver_id, passenger_id, ride_ids, booking_ids
+
+
+async def teardown() -> None:
+    async with async_session() as session:
+        await session.execute(delete(User).where(User.email.endswith(EMAIL_DOMAIN)))
+        await session.commit()
+
+
+async def main(rides: int, bookings: int) -> None:
+    driver_id, passenger_id, ride_ids, booking_ids = await setup(rides, bookings)
+    driver = {
+        "Authorization": f"Bearer {security.create_jwt_token(driver_id, 3600, False)[0]}"
+    }
+    passenger = {
+        "Authorization": f"Bearer {security.create_jwt_token(passenger_id, 3600, False)[0]}"
+    }
+    ride_id, booking_id = ride_ids[0], booking_ids[0]
+    cases = [
+        ("GET /bookings", "GET", "read_current_user_bookings", {}, passenger),
+        (
+            "GET /rides/me/{id}/bookings",
+            "GET",
+            "read_current_user_ride_bookings",
+            {"ride_id": ride_id},
+            driver,
+        ),
+        (
+            "GET /rides/me/{id}/bookings/{id}",
+            "GET",
+            "read_current_user_ride_booking",
+            {"ride_id": ride_id, "booking_id": booking_id},
+            driver,
+        ),
+        ("GET /rides/{id}", "GET", "read_ride_info", {"ride_id": ride_id}, passenger),
+        ("POST /bookings (duplicate)", "POST", "book_ride", {}, passenger),
+    ]
+
+    # keep periodic revocation list sync out of the counted queries
+    revoked_tokens.sync_interval = math.inf
+    event.listen(async_engine.sync_engine, "after_cursor_execute", count_query)
+    event.listen(Base, "load", count_object, propagate=True)
+    try:
+        async with AsyncClient(app=app, base_url="http://localhost") as client:
+            print(
+                f"{'endpoint':<34}{'status':>7}{'queries':>9}{'objects':>9}{'p50':>10}"
+            )
+            for name, method, route, path_params, headers in cases:
+                params = (
+                    {"ride_id": ride_id, "requested_seats": 1}
+                    if route == "book_ride"
+                    else None
+                )
+                latencies = []
+                for _ in range(REPEAT):
+                    user_cache.clear()
+                    counters.update(queries=0, objects=0)
+                    started = time.perf_counter()
+                    response = await client.request(
+                        method,
+                        app.url_path_for(route, **path_params),
+                        params=params,
+                        headers=headers,
+                    )
+                    latencies.append(time.perf_counter() - started)
+                print(
+                    f"{name:<34}{response.status_code:>7}{counters['queries']:>9}"
+                    f"{counters['objects']:>9}"
+                    f"{statistics.median(latencies) * 1000:>8.1f}ms"
+                )
+    finally:
+        event.remove(async_engine.sync_engine, "after_cursor_execute", count_query)
+        event.remove(Base, "load", count_object)
+        await teardown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rides", type=int, default=200)
+    parser.add_argument("--bookings", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rides, args.bookings))
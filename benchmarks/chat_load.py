@@ -0,0 +1,191 @@
+"""
+WebSocket chat load benchmark.
+
+Creates rides with a driver and an approved passenger each, connects all of
+them to `WS /messages/ws` of a running server and has every passenger send
+messages to its driver. Reports messages/sec persisted and delivered and the
+delivery latency from send to the driver receiving `message.created`.
+
+Unlike other benchmarks it needs a server, with several workers to measure
+fan-out across them, and `websockets` client (installed with
+uvicorn[standard]). Raise open files limit (`ulimit -n`) for thousands of
+connections. It runs against the database from current settings and removes
+everything it created when finished.
+
+uvicorn app.main:app --workers 4
+python -m benchmarks.chat_load --rides 2000 --messages 20
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+import websockets
+from sqlalchemy import delete, insert
+
+from app.core import security
+from app.core.session import async_session
+from app.models import Booking, Ride, User
+
+EMAIL_DOMAIN = "chat-load.bench"
+
+
+async def setup(rides: int) -> list[tuple[int, int, int]]:
+    """Returns (ride_id, driver_id, passenger_id) of created rides"""
+    async with async_session() as session:
+        user_ids = (
+            await session.scalars(
+                insert(User).returning(User.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "email": f"user{i}@{EMAIL_DOMAIN}",
+                        "first_name": "Bench",
+                        "last_name": str(i),
+                    }
+                    for i in range(rides * 2)
+                ],
+            )
+        ).all()
+        departure_at = datetime.now(tz=timezone.utc) + timedelta(days=1)
+        ride_ids = (
+            await session.scalars(
+                insert(Ride).returning(Ride.id, sort_by_parameter_order=True),
+                [
+                    {
+                        "departure": "Moscow",
+                        "arrival": "Tver",
+                        "departure_at": departure_at,
+                        "arrival_at": departure_at + timedelta(hours=3),
+                        "seats": 1,
+                        "seats_taken": 1,
+                        "price": 1000,
+                        "with_approval": True,
+                        "driver_id": driver_id,
+                    }
+                    for driver_id in user_ids[::2]
+                ],
+            )
+        ).all()
+        await session.execute(
+            insert(Booking),
+            [
+                {
+                    "ride_id": ride_id,
+                    "passenger_id": passenger_id,
+                    "seats": 1,
+                    "approved": True,
+                }
+                for ride_id, passenger_id in zip(ride_ids, user_ids[1::2])
+            ],
+        )
+        await session.commit()
+    return list(zip(ride_ids, user_ids[::2], user_ids[1::2]))
+
+
+async def teardown() -> None:
+    # rides, bookings and messages are deleted by cascades
+    async with async_session() as session:
+        await session.execute(delete(User).where(User.email.endswith(EMAIL_DOMAIN)))
+        await session.commit()
+
+
+def connect(url: str, user_id: int):
+    token = security.create_jwt_token(user_id, 3600, refresh=False)[0]
+    return websockets.connect(f"{url}/messages/ws?token={token}", max_queue=None)
+
+
+async def run_driver(
+    url: str, driver_id: int, messages: int, latencies: list[float], ready
+) -> None:
+    async with connect(url, driver_id) as websocket:
+        ready.release()
+        received = 0
+        while received < messages:
+            event = json.loads(await websocket.recv())
+            if event["type"] == "message.created":
+                sent_at = float(event["data"]["message_text"])
+                latencies.append(time.perf_counter() - sent_at)
+                received += 1
+
+
+async def run_passenger(
+    url: str, ride_id: int, driver_id: int, passenger_id: int, messages: int, ready, go
+) -> int:
+    async with connect(url, passenger_id) as websocket:
+        ready.release()
+        await go.wait()
+        for i in range(messages):
+            await websocket.send(
+                json.dumps(
+                    {
+                        "type": "message.send",
+                        "client_id": str(i),
+                        "ride_id": ride_id,
+                        "recipient_id": driver_id,
+                        "message_text": repr(time.perf_counter()),
+                    }
+                )
+            )
+        # own message.created and message.sent of every message
+        acked = 0
+        for _ in range(messages * 2):
+            event = json.loads(await websocket.recv())
+            acked += event["type"] == "message.sent"
+        return acked
+
+
+def report(name: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<10} n={len(latencies):<7} "
+        f"p50={statistics.median(latencies) * 1000:8.1f}ms "
+        f"p99={p99 * 1000:8.1f}ms max={latencies[-1] * 1000:8.1f}ms"
+    )
+
+
+async def main(url: str, rides: int, messages: int) -> None:
+    participants = await setup(rides)
+    try:
+        latencies: list[float] = []
+        ready = asyncio.Semaphore(0)
+        go = asyncio.Event()
+        drivers = [
+            asyncio.create_task(run_driver(url, driver_id, messages, latencies, ready))
+            for _, driver_id, _ in participants
+        ]
+        passengers = [
+            asyncio.create_task(run_passenger(url, *ride, messages, ready, go))
+            for ride in participants
+        ]
+        started = time.perf_counter()
+        for _ in range(rides * 2):
+            await ready.acquire()
+        print(f"connected {rides * 2} sockets in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        go.set()
+        acked = sum(await asyncio.gather(*passengers))
+        persisted = time.perf_counter() - started
+        await asyncio.gather(*drivers)
+        delivered = time.perf_counter() - started
+    finally:
+        await teardown()
+
+    total = rides * messages
+    print(f"messages: {total}, acknowledged: {acked}")
+    print(f"persisted: {total / persisted:10.0f} messages/s")
+    print(f"delivered: {total / delivered:10.0f} messages/s")
+    report("latency", latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("--rides", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.rides, args.messages))
@@ -0,0 +1,254 @@
+"""
+Itinerary search benchmark.
+
+Generates a synthetic network of rides between cities of Zipf-like
+popularity, so a few hubs get most of the traffic, over `--days` days.
+
+First it joins candidate legs of random city pairs in memory, by
+`join_legs` and by a naive cross product, to compare the join alone. Then
+it copies the rides into the database and measures `GET /rides/itineraries`
+latency through the ASGI app, candidate index scans included.
+
+It runs against the database from current settings (default database unless
+ENVIRONMENT=PYTEST) and removes everything it created when finished.
+
+python -m benchmarks.itinerary_search --rides 1000000 --cities 300 [--no-db]
+"""
+
+import argparse
+import asyncio
+import heapq
+import random
+import statistics
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from httpx import AsyncClient
+from sqlalchemy import delete, text
+
+from app.core import security
+from app.core.itineraries import join_legs
+from app.core.places import place_index
+from app.core.session import async_engine, async_session
+from app.main import app
+from app.models import Place, Ride, User
+
+EMAIL = "driver@itinerary-search.bench"
+MIN_LAYOVER = timedelta(minutes=15)
+MAX_LAYOVER = timedelta(hours=4)
+LIMIT = 10
+
+
+# cities are numbered, "City {number}" in the database
+class Leg(NamedTuple):
+    id: int
+    departure_place_id: int
+    arrival_place_id: int
+    departure_at: datetime
+    arrival_at: datetime
+    price: int
+
+
+def generate(rides: int, cities: int, days: int, start: datetime) -> list[Leg]:
+    rng = random.Random(42)
+    weights = [1 / (i + 1) for i in range(cities)]
+    legs = []
+    for i in range(rides):
+        departure, arrival = rng.choices(range(cities), weights, k=2)
+        while arrival == departure:
+            arrival = rng.choices(range(cities), weights)[0]
+        departure_at = start + timedelta(minutes=rng.randrange(0, days * 24 * 60, 5))
+        minutes = rng.randrange(60, 8 * 60, 5)
+        legs.append(
+            Leg(
+                i,
+                departure,
+                arrival,
+                departure_at,
+                departure_at + timedelta(minutes=minutes),
+                minutes * 5,
+            )
+        )
+    return legs
+
+
+def naive_join(first_legs: list[Leg], second_legs: list[Leg]) -> list[tuple]:
+    pairs = [
+        (
+            second.arrival_at - first.departure_at,
+            first.price + second.price,
+            first.id,
+            second.id,
+        )
+        for first in first_legs
+        for second in second_legs
+        if second.departure_place_id == first.arrival_place_id
+        and MIN_LAYOVER <= second.departure_at - first.arrival_at <= MAX_LAYOVER
+    ]
+    return heapq.nsmallest(LIMIT, pairs)
+
+
+def report(name: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<14} n={len(latencies):<5} "
+        f"p50={statistics.median(latencies) * 1000:8.2f}ms "
+        f"p99={p99 * 1000:8.2f}ms max={latencies[-1] * 1000:8.2f}ms"
+    )
+
+
+def bench_join(legs: list[Leg], queries: list[tuple], window: timedelta) -> None:
+    # what the two index range scans of the endpoint return
+    by_departure: dict[int, list[Leg]] = defaultdict(list)
+    by_arrival: dict[int, list[Leg]] = defaultdict(list)
+    for leg in sorted(legs, key=lambda leg: leg.departure_at):
+        by_departure[leg.departure_place_id].append(leg)
+        by_arrival[leg.arrival_place_id].append(leg)
+
+    joined, naive, candidates = [], [], []
+    for departure, arrival, departure_from in queries:
+        city_legs = by_departure[departure]
+        start = bisect_left([leg.departure_at for leg in city_legs], departure_from)
+        first_legs = [
+            leg
+            for leg in city_legs[start:]
+            if leg.departure_at < departure_from + window
+            and leg.arrival_place_id != arrival
+        ]
+        if not first_legs:
+            continue
+        hubs = {leg.arrival_place_id for leg in first_legs}
+        earliest = min(leg.arrival_at for leg in first_legs) + MIN_LAYOVER
+        latest = max(leg.arrival_at for leg in first_legs) + MAX_LAYOVER
+        second_legs = [
+            leg
+            for leg in by_arrival[arrival]
+            if leg.departure_place_id in hubs and earliest <= leg.departure_at <= latest
+        ]
+        candidates.append(len(first_legs) + len(second_legs))
+
+        started = time.perf_counter()
+        found = join_legs(first_legs, second_legs, MIN_LAYOVER, MAX_LAYOVER, LIMIT)
+        joined.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        expected = naive_join(first_legs, second_legs)
+        naive.append(time.perf_counter() - started)
+        assert [(item.first.id, item.second.id) for item in found] == [
+            pair[2:] for pair in expected
+        ]
+
+    print(f"candidate legs per query: median {statistics.median(candidates):.0f}")
+    report("join_legs", joined)
+    report("cross product", naive)
+
+
+async def bench_endpoint(legs: list[Leg], queries: list[tuple]) -> None:
+    async with async_session() as session:
+        driver = User(email=EMAIL, first_name="Bench", last_name="Itinerary")
+        session.add(driver)
+        await session.commit()
+    names = [
+        f"City {i}"
+        for i in range(
+            max(max(leg.departure_place_id, leg.arrival_place_id) for leg in legs) + 1
+        )
+    ]
+    place_ids = await place_index.get_or_create(names)
+    try:
+        started = time.perf_counter()
+        async with async_engine.connect() as connection:
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                Ride.__tablename__,
+                records=(
+                    (
+                        names[leg.departure_place_id],
+                        names[leg.arrival_place_id],
+                        place_ids[names[leg.departure_place_id]],
+                        place_ids[names[leg.arrival_place_id]],
+                        leg.departure_at,
+                        leg.arrival_at,
+                        4,
+                        leg.price,
+                        False,
+                        driver.id,
+                    )
+                    for leg in legs
+                ),
+                columns=[
+                    "departure",
+                    "arrival",
+                    "departure_place_id",
+                    "arrival_place_id",
+                    "departure_at",
+                    "arrival_at",
+                    "seats",
+                    "price",
+                    "with_approval",
+                    "driver_id",
+                ],
+            )
+            await connection.execute(text(f"ANALYZE {Ride.__tablename__}"))
+            await connection.commit()
+        print(f"copied {len(legs)} rides in {time.perf_counter() - started:.1f}s")
+
+        token = security.create_jwt_token(driver.id, 3600, refresh=False)[0]
+        headers = {"Authorization": f"Bearer {token}"}
+        latencies, found = [], 0
+        async with AsyncClient(app=app, base_url="http://localhost") as client:
+            for departure, arrival, departure_from in queries:
+                started = time.perf_counter()
+                response = await client.get(
+                    app.url_path_for("search_itineraries"),
+                    headers=headers,
+                    params={
+                        "departure": names[departure],
+                        "arrival": names[arrival],
+                        "departure_from": departure_from.isoformat(),
+                    },
+                )
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.text
+                found += bool(response.json()["items"])
+        print(f"queries with itineraries: {found} of {len(queries)}")
+        report("endpoint", latencies)
+    finally:
+        async with async_session() as session:
+            await session.execute(delete(Ride).where(Ride.driver_id == driver.id))
+            await session.execute(delete(User).where(User.id == driver.id))
+            await session.execute(delete(Place).where(Place.id.in_(place_ids.values())))
+            await session.commit()
+
+
+async def main(rides: int, cities: int, days: int, queries: int, db: bool) -> None:
+    start = datetime.now(tz=timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    ) + timedelta(days=1)
+    started = time.perf_counter()
+    legs = generate(rides, cities, days, start)
+    print(f"generated {rides} rides in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(7)
+    pairs = [rng.sample(range(max(2, cities // 10)), 2) for _ in range(queries)]
+    searches = [
+        (departure, arrival, start + timedelta(days=rng.randrange(days - 1)))
+        for departure, arrival in pairs
+    ]
+    bench_join(legs, searches, timedelta(days=1))
+    if db:
+        await bench_endpoint(legs, searches)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rides", type=int, default=1000000)
+    parser.add_argument("--cities", type=int, default=300)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--no-db", dest="db", action="store_false")
+    args = parser.parse_args()
+    asyncio.run(main(args.rides, args.cities, args.days, args.queries, args.db))
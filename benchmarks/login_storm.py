@@ -0,0 +1,114 @@
+"""
+Login storm benchmark.
+
+Fires concurrent `POST /auth/access-token` requests and meanwhile polls
+`GET /users/me` to measure how much the storm slows down other endpoints
+served by the same event loop. Run with `--inline` to verify passwords on
+the event loop, as it was done before the password pool.
+
+It runs against the database from current settings (default database unless
+ENVIRONMENT=PYTEST) and removes everything it created when finished.
+
+python -m benchmarks.login_storm --logins 50 [--inline]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from httpx import AsyncClient
+from sqlalchemy import delete
+
+from app.core import security
+from app.core.session import async_session
+from app.main import app
+from app.models import User
+
+EMAIL = "user@login-storm.bench"
+PASSWORD = "login-storm"
+
+
+async def verify_password_inline(plain_password: str, hashed_password: str) -> bool:
+    return security.verify_password(plain_password, hashed_password)
+
+
+async def probe_latencies(client: AsyncClient, headers: dict, stop: asyncio.Event):
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(app.url_path_for("read_current_user"), headers=headers)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+def report(name: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<14} n={len(latencies):<5} "
+        f"p50={statistics.median(latencies) * 1000:8.1f}ms "
+        f"p99={p99 * 1000:8.1f}ms max={latencies[-1] * 1000:8.1f}ms"
+    )
+
+
+async def main(logins: int, inline: bool) -> None:
+    if inline:
+        security.verify_password_async = verify_password_inline
+
+    async with async_session() as session:
+        user = User(
+            email=EMAIL,
+            first_name="Bench",
+            last_name="Login",
+            hashed_password=security.get_password_hash(PASSWORD),
+        )
+        session.add(user)
+        await session.commit()
+    headers = {
+        "Authorization": f"Bearer {security.create_jwt_token(user.id, 3600, False)[0]}"
+    }
+
+    try:
+        async with AsyncClient(app=app, base_url="http://localhost") as client:
+            stop = asyncio.Event()
+            idle_probe = asyncio.create_task(probe_latencies(client, headers, stop))
+            await asyncio.sleep(1)
+            stop.set()
+            idle = await idle_probe
+
+            async def login() -> int:
+                response = await client.post(
+                    app.url_path_for("login_access_token"),
+                    data={"username": EMAIL, "password": PASSWORD},
+                )
+                return response.status_code
+
+            stop = asyncio.Event()
+            storm_probe = asyncio.create_task(probe_latencies(client, headers, stop))
+            started = time.perf_counter()
+            statuses = await asyncio.gather(*(login() for _ in range(logins)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            storm = await storm_probe
+    finally:
+        async with async_session() as session:
+            await session.execute(delete(User).where(User.email == EMAIL))
+            await session.commit()
+
+    print(f"mode: {'inline' if inline else 'password pool'}")
+    print(
+        f"logins: {logins} in {elapsed:.2f}s, "
+        f"ok: {statuses.count(200)}, rejected (503): {statuses.count(503)}"
+    )
+    report("/users/me idle", idle)
+    report("/users/me storm", storm)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=50)
+    parser.add_argument("--inline", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.logins, args.inline))
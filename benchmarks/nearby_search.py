@@ -0,0 +1,200 @@
+"""
+Proximity search benchmark.
+
+Generates rides departing from points scattered around cities of Zipf-like
+popularity over `--days` days, copies them into the database and measures
+`GET /rides/nearby` latency through the ASGI app for points near the cities.
+
+The same searches are then run as SQL without the geohash cells condition,
+ranking every ride of the departure window by distance, to compare with a
+search without the spatial index. Results of both must match.
+
+It runs against the database from current settings (default database unless
+ENVIRONMENT=PYTEST) and removes everything it created when finished.
+
+python -m benchmarks.nearby_search --rides 1000000 --cities 300
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from httpx import AsyncClient
+from sqlalchemy import delete, select, text
+
+from app.core import geo, security
+from app.core.session import async_engine, async_session
+from app.main import app
+from app.models import Ride, User
+
+EMAIL = "driver@nearby-search.bench"
+RADIUS_KM = 10
+# spread of departure points around a city center
+CITY_SIGMA_KM = 15
+
+
+def scatter(rng: random.Random, center: tuple[float, float]) -> tuple[float, float]:
+    lat, lon = center
+    north_km, east_km = rng.gauss(0, CITY_SIGMA_KM), rng.gauss(0, CITY_SIGMA_KM)
+    return (
+        lat + north_km / geo.KM_PER_DEGREE,
+        lon + east_km / (geo.KM_PER_DEGREE * math.cos(math.radians(lat))),
+    )
+
+
+def generate(
+    rides: int, cities: list[tuple[float, float]], days: int, start: datetime
+) -> list[tuple]:
+    rng = random.Random(42)
+    weights = [1 / (i + 1) for i in range(len(cities))]
+    records = []
+    for i in range(rides):
+        departure, arrival = rng.choices(range(len(cities)), weights, k=2)
+        departure_lat, departure_lon = scatter(rng, cities[departure])
+        arrival_lat, arrival_lon = scatter(rng, cities[arrival])
+        departure_at = start + timedelta(minutes=rng.randrange(0, days * 24 * 60, 5))
+        records.append(
+            (
+                f"City {departure}",
+                f"City {arrival}",
+                departure_at,
+                departure_at + timedelta(hours=3),
+                4,
+                1000,
+                False,
+                departure_lat,
+                departure_lon,
+                geo.encode(departure_lat, departure_lon),
+                arrival_lat,
+                arrival_lon,
+                geo.encode(arrival_lat, arrival_lon),
+            )
+        )
+    return records
+
+
+def report(name: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<14} n={len(latencies):<5} "
+        f"p50={statistics.median(latencies) * 1000:8.2f}ms "
+        f"p99={p99 * 1000:8.2f}ms max={latencies[-1] * 1000:8.2f}ms"
+    )
+
+
+async def main(rides: int, cities: int, days: int, queries: int) -> None:
+    rng = random.Random(7)
+    centers = [(rng.uniform(44, 64), rng.uniform(28, 60)) for _ in range(cities)]
+    start = datetime.now(tz=timezone.utc).replace(
+        minute=0, second=0, microsecond=0
+    ) + timedelta(hours=1)
+    started = time.perf_counter()
+    records = generate(rides, centers, days, start)
+    print(f"generated {rides} rides in {time.perf_counter() - started:.1f}s")
+
+    async with async_session() as session:
+        driver = User(email=EMAIL, first_name="Bench", last_name="Nearby")
+        session.add(driver)
+        await session.commit()
+    try:
+        started = time.perf_counter()
+        async with async_engine.connect() as connection:
+            raw = await connection.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                Ride.__tablename__,
+                records=(record + (driver.id,) for record in records),
+                columns=[
+                    "departure",
+                    "arrival",
+                    "departure_at",
+                    "arrival_at",
+                    "seats",
+                    "price",
+                    "with_approval",
+                    "departure_lat",
+                    "departure_lon",
+                    "departure_geohash",
+                    "arrival_lat",
+                    "arrival_lon",
+                    "arrival_geohash",
+                    "driver_id",
+                ],
+            )
+            await connection.execute(text(f"ANALYZE {Ride.__tablename__}"))
+            await connection.commit()
+        print(f"copied {rides} rides in {time.perf_counter() - started:.1f}s")
+
+        # points near popular cities, where candidates are the most
+        searches = [
+            (
+                *scatter(rng, centers[rng.randrange(max(1, cities // 10))]),
+                start + timedelta(days=rng.randrange(max(1, days - 3))),
+            )
+            for _ in range(queries)
+        ]
+        token = security.create_jwt_token(driver.id, 3600, refresh=False)[0]
+        headers = {"Authorization": f"Bearer {token}"}
+        latencies, found = [], []
+        async with AsyncClient(app=app, base_url="http://localhost") as client:
+            for lat, lon, departure_from in searches:
+                started = time.perf_counter()
+                response = await client.get(
+                    app.url_path_for("search_nearby_rides"),
+                    headers=headers,
+                    params={
+                        "lat": lat,
+                        "lon": lon,
+                        "radius_km": RADIUS_KM,
+                        "departure_from": departure_from.isoformat(),
+                    },
+                )
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.text
+                found.append([item["id"] for item in response.json()["items"]])
+        print(f"rides found per query: median {statistics.median(map(len, found))}")
+        report("endpoint", latencies)
+
+        window = timedelta(hours=72)
+        scans = []
+        async with async_session() as session:
+            for (lat, lon, departure_from), ids in zip(searches, found):
+                distance = geo.distance_km_sql(
+                    Ride.departure_lat, Ride.departure_lon, lat, lon
+                )
+                query = (
+                    select(Ride.id)
+                    .where(
+                        Ride.departure_lat.is_not(None),
+                        Ride.departure_at >= departure_from,
+                        Ride.departure_at < departure_from + window,
+                        Ride.free_seats >= 1,
+                        distance <= RADIUS_KM,
+                    )
+                    .order_by(distance, Ride.departure_at, Ride.id)
+                    .limit(20)
+                )
+                started = time.perf_counter()
+                expected = (await session.scalars(query)).all()
+                scans.append(time.perf_counter() - started)
+                assert expected == ids
+        report("no cells", scans)
+    finally:
+        async with async_session() as session:
+            await session.execute(delete(Ride).where(Ride.driver_id == driver.id))
+            await session.execute(delete(User).where(User.id == driver.id))
+            await session.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rides", type=int, default=1000000)
+    parser.add_argument("--cities", type=int, default=300)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.rides, args.cities, args.days, args.queries))
@@ -0,0 +1,84 @@
+"""
+Place autocomplete benchmark.
+
+Fills an in-memory places dictionary with `--places` synthetic names built
+of syllables, then measures suggestions for prefixes of random names as
+they are typed, one keystroke after another, with a typo in some of them.
+Suggestions are served by `PlaceIndex.suggest` without database queries,
+so no database is needed.
+
+python -m benchmarks.place_autocomplete --places 100000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.core.places import PlaceIndex, normalize_place
+
+SYLLABLES = [
+    "ka", "zan", "mo", "skva", "tver", "rostov", "no", "vo", "gorod", "sk",
+    "pe", "ter", "burg", "ya", "ro", "slavl", "ni", "zhny", "sa", "ma",
+    "ra", "ur", "al", "chel", "ya", "bi", "om", "kras", "dar", "ir", "kut",
+]  # fmt: skip
+
+
+def generate(places: int) -> list[str]:
+    rng = random.Random(42)
+    names = set()
+    while len(names) < places:
+        words = [
+            "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).capitalize()
+            for _ in range(rng.choice([1, 1, 1, 2]))
+        ]
+        names.add(" ".join(words))
+    return sorted(names)
+
+
+def typo(rng: random.Random, text: str) -> str:
+    i = rng.randrange(len(text))
+    return text[:i] + rng.choice("abcdefghijklmnopqrstuvwxyz") + text[i + 1 :]
+
+
+def report(name: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<14} n={len(latencies):<6} "
+        f"p50={statistics.median(latencies) * 1000:8.3f}ms "
+        f"p99={p99 * 1000:8.3f}ms max={latencies[-1] * 1000:8.3f}ms"
+    )
+
+
+def main(places: int, queries: int) -> None:
+    names = generate(places)
+    index = PlaceIndex(sync_interval=0)
+    started = time.perf_counter()
+    for place_id, name in enumerate(names, start=1):
+        index._add(normalize_place(name), place_id, name)
+    print(f"indexed {places} places in {time.perf_counter() - started:.1f}s")
+
+    rng = random.Random(7)
+    typed = {"exact": [], "typo": []}
+    for _ in range(queries):
+        name = rng.choice(names)
+        for end in range(1, min(len(name), 12) + 1):
+            typed["exact"].append(name[:end])
+            if end >= 4:
+                typed["typo"].append(typo(rng, name[:end]))
+    for kind, prefixes in typed.items():
+        latencies = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            index.suggest(prefix, 5)
+            latencies.append(time.perf_counter() - started)
+        report(kind, latencies)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--places", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.places, args.queries)
@@ -0,0 +1,109 @@
+"""
+Microbenchmark of response rendering: FastAPI `response_model` path
+(validation, json mode dump, `JSONResponse`) vs `FastJSONResponse`.
+
+Renders in memory ORM objects shaped like `GET /bookings` and `GET /rides/me`
+results, no database is needed.
+
+python -m benchmarks.serialization --items 200
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from starlette.responses import JSONResponse
+
+from app.core.serialization import FastJSONResponse
+from app.models import Booking, Ride, User
+from app.schemas.responses import BookingDetailedResponse, RideResponse
+
+REPEAT = 50
+
+
+def make_rides(count: int) -> list[Ride]:
+    now = datetime.now(tz=timezone.utc)
+    driver = User(id=1, email="driver@example.com", first_name="D", last_name="D")
+    return [
+        Ride(
+            id=i,
+            created_at=now,
+            departure="Moscow",
+            arrival="Tver",
+            departure_at=now + timedelta(days=1, minutes=i),
+            arrival_at=now + timedelta(days=1, hours=3, minutes=i),
+            seats=3,
+            seats_taken=0,
+            price=1000,
+            with_approval=False,
+            comment=None,
+            driver=driver,
+        )
+        for i in range(count)
+    ]
+
+
+def make_bookings(count: int) -> list[Booking]:
+    now = datetime.now(tz=timezone.utc)
+    passenger = User(id=2, email="p@example.com", first_name="P", last_name="P")
+    return [
+        Booking(
+            id=i,
+            ride_id=ride.id,
+            passenger_id=passenger.id,
+            filled_at=now,
+            approved=True,
+            approved_at=now,
+            seats=1,
+            ride=ride,
+            passenger=passenger,
+        )
+        for i, ride in enumerate(make_rides(count))
+    ]
+
+
+async def render_default(field, content) -> bytes:
+    return JSONResponse(
+        await serialize_response(field=field, response_content=content)
+    ).body
+
+
+async def measure(name: str, annotation, content) -> None:
+    field = create_response_field(name="response", type_=annotation)
+    assert await render_default(field, content) == (
+        FastJSONResponse(content, annotation).body
+    )
+
+    timings = {}
+    for path in ("default", "fast"):
+        started = time.perf_counter()
+        for _ in range(REPEAT):
+            if path == "default":
+                await render_default(field, content)
+            else:
+                FastJSONResponse(content, annotation)
+        timings[path] = (time.perf_counter() - started) / REPEAT * 1000
+    print(
+        f"{name:<26}{timings['default']:>10.2f}ms{timings['fast']:>10.2f}ms"
+        f"{timings['default'] / timings['fast']:>9.1f}x"
+    )
+
+
+async def main(items: int) -> None:
+    print(f"{'content':<26}{'default':>12}{'fast':>12}{'speedup':>9}")
+    await measure(
+        f"{items} bookings (detailed)",
+        list[BookingDetailedResponse],
+        make_bookings(items),
+    )
+    await measure(f"{items} rides", list[RideResponse], make_rides(items))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.items))